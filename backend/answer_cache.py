@@ -0,0 +1,177 @@
+# answer_cache.py
+# -------------------------------------------------
+# Semantic answer cache: (question, retrieved context) -> answer
+# -------------------------------------------------
+#
+# Exact hits: same normalized question + same retrieved context.
+# Near hits:  same context and a question whose query embedding is
+#             within ANSWER_CACHE_SIMILARITY (cosine) of a cached one.
+#
+# The context key hashes every source's uid AND text, so a uid that is
+# reused after a reset can never serve an answer built from old text.
+# New documents need no invalidation either: a question they answer
+# better retrieves different chunks, i.e. a different context key.
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "4096"))
+ANSWER_CACHE_TTL_SECONDS = float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600"))
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95"))
+
+
+def _normalize_question(question: str) -> str:
+    return " ".join(question.lower().split())
+
+
+def context_key(sources: list) -> str:
+    """
+    Order matters: it is the order the excerpts appear in the prompt.
+    """
+    h = hashlib.sha1()
+    for s in sources:
+        h.update(str(s.get("uid", s.get("chunk_id"))).encode("utf-8"))
+        h.update(b"\0")
+        h.update((s.get("text") or s.get("content") or "").encode("utf-8"))
+        h.update(b"\1")
+    return h.hexdigest()
+
+
+class _Entry:
+    __slots__ = ("answer", "embedding", "expires_at")
+
+    def __init__(self, answer, embedding, expires_at):
+        self.answer = answer
+        self.embedding = embedding
+        self.expires_at = expires_at
+
+
+class AnswerCache:
+    def __init__(self, max_entries: int = ANSWER_CACHE_SIZE,
+                 ttl_seconds: float = ANSWER_CACHE_TTL_SECONDS,
+                 similarity: float = ANSWER_CACHE_SIMILARITY):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity = similarity
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # (question, context) -> _Entry
+        self._by_context = {}           # context -> {question, ...}
+        self.hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    # -------------------------------------------------
+    # 🔍 Lookup
+    # -------------------------------------------------
+    def get(self, question: str, sources: list,
+            embedding: Optional[np.ndarray] = None) -> Optional[str]:
+        if not sources:
+            return None
+        question = _normalize_question(question)
+        context = context_key(sources)
+        now = time.time()
+
+        with self._lock:
+            entry = self._live(question, context, now)
+            if entry is not None:
+                self.hits += 1
+                return entry.answer
+
+            if embedding is not None:
+                best = self._nearest(context, embedding, now)
+                if best is not None:
+                    self.near_hits += 1
+                    return best.answer
+
+            self.misses += 1
+            return None
+
+    def _live(self, question: str, context: str, now: float) -> Optional[_Entry]:
+        key = (question, context)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            self._drop(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _nearest(self, context: str, embedding: np.ndarray, now: float) -> Optional[_Entry]:
+        """
+        Most similar cached question for the SAME context (usually a
+        handful), if it clears the similarity threshold.
+        """
+        query = np.asarray(embedding, dtype="float32")
+        query = query / (np.linalg.norm(query) or 1.0)
+
+        best, best_sim = None, self.similarity
+        for question in list(self._by_context.get(context, ())):
+            entry = self._live(question, context, now)
+            if entry is None or entry.embedding is None:
+                continue
+            sim = float(np.dot(entry.embedding, query))
+            if sim >= best_sim:
+                best, best_sim = entry, sim
+        return best
+
+    # -------------------------------------------------
+    # 💾 Store
+    # -------------------------------------------------
+    def put(self, question: str, sources: list, answer: str,
+            embedding: Optional[np.ndarray] = None):
+        if not sources or not answer:
+            return
+        question = _normalize_question(question)
+        context = context_key(sources)
+
+        if embedding is not None:
+            embedding = np.asarray(embedding, dtype="float32")
+            embedding = embedding / (np.linalg.norm(embedding) or 1.0)
+
+        with self._lock:
+            key = (question, context)
+            self._entries[key] = _Entry(answer, embedding, time.time() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            self._by_context.setdefault(context, set()).add(question)
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+
+    def _drop(self, key: tuple):
+        self._entries.pop(key, None)
+        question, context = key
+        questions = self._by_context.get(context)
+        if questions is not None:
+            questions.discard(question)
+            if not questions:
+                del self._by_context[context]
+
+    # -------------------------------------------------
+    # 🧹 Invalidation
+    # -------------------------------------------------
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+
+    # -------------------------------------------------
+    # 📊 Stats
+    # -------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.near_hits + self.misses
+            return {
+                "hits": self.hits,
+                "near_hits": self.near_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "ttl_seconds": self.ttl_seconds,
+                "similarity": self.similarity,
+            }
@@ -1,13 +1,18 @@
-from llm_config import init_gemini
 import re
-from typing import List
-import google.generativeai as genai
+import time
+from typing import Iterator, List, Optional
 
+# 🔐 Gemini (or the offline stub) is initialized lazily, on first use
+from llm_backends import get_backend
+from context_builder import pack_context
+from metrics import observe, span
 
-# =====================================================
-# 🔐 Initialize Gemini ONCE
-# =====================================================
-init_gemini()   # 🔥 THIS WAS MISSING (critical)
+
+# Returned (never raised) when Gemini fails; callers must not cache it
+LLM_UNAVAILABLE_MESSAGE = (
+    "The answer could not be generated at this time "
+    "due to system limits. Please try again shortly."
+)
 
 
 # =====================================================
@@ -26,21 +31,79 @@ def clean_answer(text: str) -> str:
     return text.strip()
 
 
+class StreamCleaner:
+    """
+    clean_answer applied incrementally to streamed text.
+
+    Asterisks are dropped as they arrive; a trailing whitespace run is
+    held back until the next visible character (it may grow into a
+    newline run to collapse, or turn out to be trailing and stripped).
+    The concatenated output equals clean_answer(full text).
+    """
+
+    def __init__(self):
+        self._started = False
+        self._pending = ""
+
+    def feed(self, delta: str) -> str:
+        text = self._pending + delta.replace("*", "")
+        if not self._started:
+            text = text.lstrip()
+            if not text:
+                self._pending = ""
+                return ""
+            self._started = True
+
+        body = text.rstrip()
+        self._pending = text[len(body):]
+        return re.sub(r"\n{3,}", "\n\n", body)
+
+
 # =====================================================
 # 🧠 Generate Legal Answer
 # =====================================================
-def generate_answer(question: str, sources: List[dict]) -> str:
+def generate_answer(question: str, sources: List[dict], context_stats: Optional[dict] = None) -> str:
     """
     Generates a clean, structured legal answer
     using Gemini with strong safety checks
+    (`context_stats` receives the context packing numbers)
     """
 
     if not sources:
         return "Answer not found in the provided documents."
 
+    prompt = build_prompt(question, sources, context_stats)
+
+    try:
+        # ✅ Shared client, concurrency-capped, 429s retried with backoff
+        with span("llm_generate"):
+            response = get_backend().generate(prompt)
+
+        # -------------------------------------------------
+        # 🛡 Safe extraction
+        # -------------------------------------------------
+        if hasattr(response, "text") and response.text:
+            return clean_answer(response.text)
+
+        # Fallback (older SDK response structure)
+        if getattr(response, "candidates", None):
+            parts = response.candidates[0].content.parts
+            if parts and hasattr(parts[0], "text"):
+                return clean_answer(parts[0].text)
+
+        return "Answer could not be generated from the provided documents."
+
+    except Exception as e:
+        # 🚨 NEVER crash FastAPI
+        return LLM_UNAVAILABLE_MESSAGE
+
+
+def build_prompt(question: str, sources: List[dict], context_stats: Optional[dict] = None) -> str:
     # -------------------------------------------------
-    # 📚 Build context
+    # 📚 Build context (merged, de-overlapped, token-budgeted)
     # -------------------------------------------------
+    with span("context_pack"):
+        sources = pack_context(sources, stats=context_stats)
     #context = "\n\n".join(
        #f"Document: {s['document']} | Page {s['page']}:\n{s['content']}"
        #for s in sources
@@ -70,30 +133,53 @@ Question:
 Document Excerpts:
 {context}
 """
+    return prompt
+
 
+# =====================================================
+# 📡 Streamed Legal Answer
+# =====================================================
+def _chunk_text(chunk) -> str:
     try:
-        # ✅ Use STABLE model
-        model = genai.GenerativeModel("gemini-3-flash-preview")
+        return chunk.text or ""
+    except (ValueError, AttributeError):
+        # chunks without text parts (e.g. safety / finish metadata)
+        return ""
 
-        response = model.generate_content(prompt)
 
-        # -------------------------------------------------
-        # 🛡 Safe extraction
-        # -------------------------------------------------
-        if hasattr(response, "text") and response.text:
-            return clean_answer(response.text)
+def stream_answer(question: str, sources: List[dict],
+                  context_stats: Optional[dict] = None) -> Iterator[str]:
+    """
+    Same answer as generate_answer, yielded as cleaned text deltas
+    while the LLM streams it (blocking iterator: run it off the
+    event loop, e.g. with iterate_in_threadpool).
+    """
 
-        # Fallback (older SDK response structure)
-        if response.candidates:
-            parts = response.candidates[0].content.parts
-            if parts and hasattr(parts[0], "text"):
-                return clean_answer(parts[0].text)
+    if not sources:
+        yield "Answer not found in the provided documents."
+        return
 
-        return "Answer could not be generated from the provided documents."
+    prompt = build_prompt(question, sources, context_stats)
+    cleaner = StreamCleaner()
+    emitted = False
+    t0 = time.perf_counter()
 
-    except Exception as e:
+    try:
+        for chunk in get_backend().stream(prompt):
+            delta = cleaner.feed(_chunk_text(chunk))
+            if delta:
+                if not emitted:
+                    observe("llm_first_token", time.perf_counter() - t0)
+                emitted = True
+                yield delta
+        observe("llm_stream", time.perf_counter() - t0)
+
+    except Exception:
+        if emitted:
+            raise   # half an answer: let the caller report it, never cache it
         # 🚨 NEVER crash FastAPI
-        return (
-            "The answer could not be generated at this time "
-            "due to system limits. Please try again shortly."
-        )
\ No newline at end of file
+        yield LLM_UNAVAILABLE_MESSAGE
+        return
+
+    if not emitted:
+        yield "Answer could not be generated from the provided documents."
\ No newline at end of file
@@ -0,0 +1,67 @@
+# bench_chunker.py
+# -------------------------------------------------
+# chunk_text (per-page sentences) vs chunk_text_structured
+# (clause-aware, pages joined) on a synthetic contract.
+#
+#   python benchmarks/bench_chunker.py --pages 1000
+# -------------------------------------------------
+
+import argparse
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_docs import page_records  # noqa: E402
+from text_chunker import chunk_text, chunk_text_structured, _UNIT_START  # noqa: E402
+
+
+def _stats(fn, pages) -> dict:
+    t0 = time.perf_counter()
+    chunks = fn(pages, "synthetic.pdf")
+    elapsed = time.perf_counter() - t0
+
+    sizes = [len(c["text"]) for c in chunks]
+    clause_aligned = sum(1 for c in chunks if _UNIT_START.match(". " + c["text"]) or c["chunk_id"] == 0)
+    return {
+        "seconds": round(elapsed, 4),
+        "chunks": len(chunks),
+        "mean_chars": round(statistics.mean(sizes), 1) if sizes else 0,
+        "max_chars": max(sizes, default=0),
+        "chunks_starting_at_clause_pct": round(100 * clause_aligned / max(1, len(chunks)), 1),
+        "cross_page_chunks": sum(1 for c in chunks if c.get("page_end", c["page"]) != c["page"]),
+    }
+
+
+def run(n_pages: int) -> dict:
+    pages = page_records(1, n_pages)
+    results = {
+        "pages": len(pages),
+        "corpus_mb": round(sum(len(p["text"]) for p in pages) / 1024 ** 2, 2),
+        "sentence": _stats(chunk_text, pages),
+        "structure": _stats(chunk_text_structured, pages),
+    }
+    results["speedup"] = round(
+        results["sentence"]["seconds"] / max(results["structure"]["seconds"], 1e-9), 2
+    )
+    print(json.dumps(results, indent=2))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sentence vs clause-aware chunking")
+    parser.add_argument("--pages", type=int, default=1000, help="synthetic document length")
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args()
+
+    results = run(args.pages)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# bench_embed.py
+# -------------------------------------------------
+# Chunks/sec of encode_texts (length buckets + memory-sized batches)
+# vs a single default model.encode call, on chunk_text output of
+# synthetic contracts (headings, clauses, full 800-char chunks).
+#
+#   python benchmarks/bench_embed.py --chunks 5000
+#   EMBED_BACKEND=onnx python benchmarks/bench_embed.py
+#
+# Needs the embedding model (downloaded on first run).
+# -------------------------------------------------
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from synthetic_docs import page_records  # noqa: E402
+from text_chunker import chunk_text  # noqa: E402
+from text_embedder import model, encode_texts, embedding_stats  # noqa: E402
+
+_PAGES_PER_DOC = 20
+
+
+def synthetic_chunks(n: int, seed: int = 0) -> list:
+    """
+    chunk_text over synthetic_docs contracts: headings, short clauses
+    and full ~800-char chunks in the mix real contracts produce.
+    """
+    texts, doc = [], 0
+    while len(texts) < n:
+        pages = page_records(1, _PAGES_PER_DOC, seed=seed + doc)
+        texts.extend(c["text"] for c in chunk_text(pages, "synthetic.pdf"))
+        doc += 1
+    return texts[:n]
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource   # POSIX only
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _timed(fn, texts) -> tuple:
+    t0 = time.perf_counter()
+    out = fn(texts)
+    return out, time.perf_counter() - t0
+
+
+def run(n_chunks: int) -> dict:
+    texts = synthetic_chunks(n_chunks)
+    encode_texts(texts[:32])   # warm-up (lazy init, thread pools)
+
+    baseline, base_s = _timed(
+        lambda t: model.encode(t, convert_to_numpy=True, normalize_embeddings=True,
+                               show_progress_bar=False), texts
+    )
+    (embeddings, _), engine_s = _timed(encode_texts, texts)
+
+    results = {
+        "chunks": n_chunks,
+        "baseline": {"seconds": round(base_s, 3), "chunks_per_sec": round(n_chunks / base_s, 1)},
+        "engine": {"seconds": round(engine_s, 3), "chunks_per_sec": round(n_chunks / engine_s, 1)},
+        "speedup": round(base_s / max(engine_s, 1e-9), 2),
+        # int8 / reordered batches must still give the same vectors
+        "min_cosine_vs_baseline": round(float((baseline * embeddings).sum(axis=1).min()), 4),
+        "peak_rss_mb": _peak_rss_mb(),
+        "stats": embedding_stats(),
+    }
+    print(json.dumps(results, indent=2))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embedding throughput")
+    parser.add_argument("--chunks", type=int, default=5000, help="number of synthetic chunks")
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args()
+
+    results = run(args.chunks)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
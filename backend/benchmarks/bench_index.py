@@ -0,0 +1,121 @@
+# bench_index.py
+# -------------------------------------------------
+# Recall vs latency of the ANN index backends against the exact
+# flat baseline, on synthetic clustered embeddings (fully offline).
+#
+#   python benchmarks/bench_index.py --n 200000 --dim 384
+# -------------------------------------------------
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from vector_index import IncrementalIndex  # noqa: E402
+
+SWEEPS = {
+    "flat": [None],
+    "flat_fp16": [None],
+    "ivfpq": [1, 4, 16, 64],        # nprobe
+    "hnsw": [16, 32, 64, 128],      # efSearch
+}
+
+
+def synthetic_embeddings(n: int, dim: int, clusters: int = 256, rank: int = 16,
+                         seed: int = 0) -> np.ndarray:
+    """
+    Normalized gaussian-mixture vectors, each cluster spread along
+    `rank` directions (low intrinsic dimension, like real sentence
+    embeddings). Isotropic noise in `dim` dimensions would make every
+    in-cluster neighbour equidistant and every ANN look bad.
+    """
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim)).astype("float32")
+    bases = rng.standard_normal((clusters, rank, dim)).astype("float32") / np.sqrt(rank)
+    labels = rng.integers(0, clusters, n)
+    x = centers[labels]
+    x += 0.6 * np.einsum("nr,nrd->nd", rng.standard_normal((n, rank)).astype("float32"), bases[labels])
+    x += 0.05 * rng.standard_normal((n, dim)).astype("float32")
+    x /= np.linalg.norm(x, axis=1, keepdims=True)
+    return x
+
+
+def _latencies_ms(vi: IncrementalIndex, queries: np.ndarray, k: int):
+    ids, times = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, row = vi.search(q[None, :], k)
+        times.append((time.perf_counter() - t0) * 1000)
+        ids.append(row[0])
+    return np.array(ids), np.array(times)
+
+
+def run(n: int, dim: int, n_queries: int, k: int, backends: list) -> dict:
+    # queries are held-out draws from the SAME mixture as the data
+    # (other centres would measure off-distribution recall)
+    points = synthetic_embeddings(n + n_queries, dim)
+    data, queries = points[:n], points[n:]
+    ids = np.arange(n, dtype="int64")
+
+    results = {"n": n, "dim": dim, "queries": n_queries, "k": k, "backends": []}
+    truth = None
+
+    for backend in ["flat"] + [b for b in backends if b != "flat"]:
+        vi = IncrementalIndex(backend, train_threshold=1)
+        t0 = time.perf_counter()
+        vi.add_embeddings(data, ids)
+        build_s = time.perf_counter() - t0
+        size_mb = faiss.serialize_index(vi.index).nbytes / 1024 ** 2
+
+        for param in SWEEPS[backend]:
+            if backend == "ivfpq":
+                vi.nprobe = param
+            elif backend == "hnsw":
+                vi.ef_search = param
+
+            found, lat = _latencies_ms(vi, queries, k)
+            if truth is None:
+                truth = found
+            recall = np.mean([
+                len(set(f) & set(t)) / k for f, t in zip(found, truth)
+            ])
+
+            row = {
+                "backend": backend,
+                "param": param,
+                "build_s": round(build_s, 3),
+                "index_mb": round(size_mb, 2),
+                f"recall@{k}": round(float(recall), 4),
+                "p50_ms": round(float(np.percentile(lat, 50)), 3),
+                "p95_ms": round(float(np.percentile(lat, 95)), 3),
+            }
+            results["backends"].append(row)
+            print(json.dumps(row))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="ANN index recall vs latency")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--backends", default="flat,flat_fp16,ivfpq,hnsw")
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args()
+
+    results = run(args.n, args.dim, args.queries, args.k, args.backends.split(","))
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+# bench_risk.py
+# -------------------------------------------------
+# detect_risks throughput (MB/s) on a synthetic contract corpus,
+# compared with the original chunk x rule x keyword substring loop
+# (which also "finds" exit in existing and fine in defined).
+#
+#   python benchmarks/bench_risk.py --mb 20
+# -------------------------------------------------
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from risk_detector import detect_risks, extract_clean_sentence  # noqa: E402
+from risk_rules import current_ruleset  # noqa: E402
+from synthetic_docs import page_records  # noqa: E402
+from text_chunker import chunk_text  # noqa: E402
+
+_PAGES_PER_DOC = 50
+
+
+def synthetic_pages(total_mb: float, seed: int = 0) -> list:
+    """
+    synthetic_docs contracts, one document at a time, until the
+    corpus reaches total_mb.
+    """
+    pages, size, target = [], 0, int(total_mb * 1024 * 1024)
+    while size < target:
+        for page in page_records(1, _PAGES_PER_DOC, seed=seed + len(pages) // _PAGES_PER_DOC):
+            pages.append({"page": len(pages) + 1, "text": page["text"]})
+            size += len(page["text"]) + 1
+            if size >= target:
+                break
+    return pages
+
+
+def legacy_detect_risks(chunks: list) -> list:
+    """
+    The original nested-loop substring implementation (baseline).
+    """
+    detected = []
+    for chunk in chunks:
+        text = chunk["text"]
+        for rule in current_ruleset()["risk_rules"]:
+            for kw in (k.rstrip("*") for k in rule.get("keywords", [])):
+                if kw.lower() in text.lower():
+                    detected.append({
+                        "risk_type": rule["risk_type"],
+                        "severity": rule["severity"],
+                        "page": chunk.get("page"),
+                        "snippet": extract_clean_sentence(text, kw)
+                    })
+                    break
+    return detected
+
+
+def _throughput(fn, chunks, mb):
+    t0 = time.perf_counter()
+    out = fn(chunks)
+    elapsed = time.perf_counter() - t0
+    return out, {"seconds": round(elapsed, 3), "mb_per_s": round(mb / elapsed, 2)}
+
+
+def run(total_mb: float) -> dict:
+    chunks = chunk_text(synthetic_pages(total_mb), "synthetic.pdf")
+    mb = sum(len(c["text"]) for c in chunks) / 1024 ** 2
+
+    new_out, new_stats = _throughput(detect_risks, chunks, mb)
+    old_out, old_stats = _throughput(legacy_detect_risks, chunks, mb)
+
+    results = {
+        "corpus_mb": round(mb, 2),
+        "chunks": len(chunks),
+        "risks": len(new_out),
+        "legacy_risks": len(old_out),
+        "compiled": new_stats,
+        "legacy": old_stats,
+        "speedup": round(old_stats["seconds"] / new_stats["seconds"], 2),
+    }
+    print(json.dumps(results, indent=2))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Risk detection throughput")
+    parser.add_argument("--mb", type=float, default=10.0, help="corpus size in MB")
+    parser.add_argument("--out", help="write JSON results here")
+    args = parser.parse_args()
+
+    results = run(args.mb)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
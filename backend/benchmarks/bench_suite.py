@@ -0,0 +1,318 @@
+# bench_suite.py
+# -------------------------------------------------
+# End-to-end benchmark suite on synthetic legal PDFs, fully offline
+# on CPU (stub LLM, cached embedding model, throwaway store):
+#
+#   ingest       docs/min through POST /ingest/bulk (text + scanned)
+#   chunking     chunks/sec of chunk_text / chunk_text_structured
+#   embedding    chunks/sec of embed_chunks
+#   risks        detect_risks chunks/sec, MB/s and peak Python memory
+#   ask          /ask p50 / p95 latency (cold and answer-cache hits)
+#
+#   python benchmarks/bench_suite.py --docs 40 --pages 20
+#   python benchmarks/bench_suite.py --compare benchmarks/results/<old>.json
+#
+# Results go to benchmarks/results/<commit>.json (compare across
+# commits). The embedding model must already be in the local
+# Hugging Face cache (run once online, or pass --allow-download).
+# -------------------------------------------------
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from synthetic_docs import corpus, page_records  # noqa: E402
+
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+_QUESTION_TEMPLATES = [
+    "What are the termination rights under the {}?",
+    "Is there a penalty for late payment in the {}?",
+    "Who must indemnify whom under the {}?",
+    "Which governing law applies to the {}?",
+    "Are liquidated damages capped in the {}?",
+    "Can the licensee sublicense intellectual property under the {}?",
+    "What notice period applies in the {}?",
+    "What are the payment terms of the {}?",
+]
+_QUESTION_SUBJECTS = [
+    "agreement", "contract", "services agreement", "lease", "share purchase agreement",
+    "non-disclosure agreement", "master agreement", "deed",
+]
+
+
+def _mb(n_bytes: float) -> float:
+    return round(n_bytes / 1024 ** 2, 2)
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource   # POSIX only
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024, 1)
+
+
+def _percentiles(samples: list) -> dict:
+    ordered = sorted(samples)
+    pick = lambda q: ordered[min(len(ordered) - 1, int(round(q * (len(ordered) - 1))))]
+    return {
+        "n": len(samples),
+        "p50_ms": round(pick(0.50) * 1000, 1),
+        "p95_ms": round(pick(0.95) * 1000, 1),
+        "mean_ms": round(statistics.mean(samples) * 1000, 1),
+        "max_ms": round(ordered[-1] * 1000, 1),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, text=True,
+            stderr=subprocess.DEVNULL
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+# =====================================================
+# ⚙ Environment (before any backend module is imported)
+# =====================================================
+def _configure(work_dir: str, args):
+    os.environ["DD_STORE_DIR"] = os.path.join(work_dir, "store")
+    os.environ["DOC_CACHE_DIR"] = os.path.join(work_dir, "doc_cache")
+    os.environ["UPLOAD_SPOOL_DIR"] = os.path.join(work_dir, "spool")
+    os.makedirs(os.environ["UPLOAD_SPOOL_DIR"], exist_ok=True)
+    os.environ["LLM_BACKEND"] = "stub"
+    os.environ["LLM_STUB_LATENCY_MS"] = str(args.llm_latency_ms)
+    if not args.allow_download:
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    if "POPPLER_PATH" not in os.environ and shutil.which("pdftoppm"):
+        os.environ["POPPLER_PATH"] = ""   # use poppler from PATH
+
+
+# =====================================================
+# 🧪 Sections
+# =====================================================
+def bench_ingest(client, docs: list, use_ocr: bool) -> dict:
+    files = [("files", (name, data, "application/pdf")) for name, data in docs]
+    t0 = time.perf_counter()
+    response = client.post(
+        "/ingest/bulk", params={"use_ocr": str(use_ocr).lower()}, files=files
+    )
+    elapsed = time.perf_counter() - t0
+    body = response.json()
+    if response.status_code != 200:
+        return {"error": body.get("error", response.status_code)}
+
+    stages = {}
+    for f in body["files"]:
+        for stage, seconds in f["timings"].items():
+            stages.setdefault(stage, []).append(seconds)
+
+    pages = sum(f["progress"].get("ocr_pages_done", 0) for f in body["files"])
+    return {
+        "docs": len(docs),
+        "input_mb": _mb(sum(len(d) for _, d in docs)),
+        "indexed": body["indexed"],
+        "failed": body["failed"],
+        "errors": sorted({f["error"] for f in body["files"] if f["error"]})[:5],
+        "chunks": body["chunks"],
+        "seconds": round(elapsed, 3),
+        "docs_per_min": round(len(docs) / elapsed * 60, 1),
+        **({"ocr_pages": pages, "ocr_pages_per_min": round(pages / elapsed * 60, 1)} if use_ocr else {}),
+        "stage_median_s": {s: round(statistics.median(v), 4) for s, v in stages.items()},
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def bench_chunking(pages: list) -> dict:
+    from text_chunker import chunk_text, chunk_text_structured
+
+    results = {}
+    for name, fn in (("sentence", chunk_text), ("structure", chunk_text_structured)):
+        t0 = time.perf_counter()
+        chunks = fn(pages, "bench.pdf")
+        elapsed = time.perf_counter() - t0
+        results[name] = {
+            "chunks": len(chunks),
+            "seconds": round(elapsed, 4),
+            "chunks_per_sec": round(len(chunks) / elapsed, 1),
+        }
+    return results
+
+
+def bench_embedding(texts: list) -> dict:
+    from text_embedder import embed_chunks, embedding_stats
+
+    embed_chunks(texts[:16])   # warm-up
+    t0 = time.perf_counter()
+    embed_chunks(texts)
+    elapsed = time.perf_counter() - t0
+    stats = embedding_stats()
+    return {
+        "chunks": len(texts),
+        "seconds": round(elapsed, 3),
+        "chunks_per_sec": round(len(texts) / elapsed, 1),
+        "backend": stats["backend"],
+        "threads": stats["threads"],
+        "padding_ratio": stats["padding_ratio"],
+    }
+
+
+def bench_risks(chunks: list) -> dict:
+    from risk_detector import detect_risks
+
+    detect_risks(chunks[:50])   # warm-up (compiles the rule engine)
+    mb = sum(len(c["text"]) for c in chunks) / 1024 ** 2
+
+    tracemalloc.start()
+    t0 = time.perf_counter()
+    risks = detect_risks(chunks)
+    elapsed = time.perf_counter() - t0
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "chunks": len(chunks),
+        "risks": len(risks),
+        "seconds": round(elapsed, 4),
+        "chunks_per_sec": round(len(chunks) / elapsed, 1),
+        "mb_per_sec": round(mb / elapsed, 2),
+        "peak_python_mb": _mb(peak),
+    }
+
+
+def bench_ask(client, n_questions: int, repeats: int) -> dict:
+    questions = [
+        t.format(s) for s in _QUESTION_SUBJECTS for t in _QUESTION_TEMPLATES
+    ][:n_questions]
+
+    def timed(question):
+        t0 = time.perf_counter()
+        response = client.post("/ask", json={"question": question})
+        response.raise_for_status()
+        return time.perf_counter() - t0
+
+    timed("warm up the query encoder")
+    cold = [timed(q) for q in questions]
+    cached = [timed(q) for q in questions[:repeats]]
+    return {"cold": _percentiles(cold), "answer_cache_hit": _percentiles(cached) if cached else None}
+
+
+# =====================================================
+# 🏁 Suite
+# =====================================================
+def run(args) -> dict:
+    work_dir = tempfile.mkdtemp(prefix="dd_bench_")
+    _configure(work_dir, args)
+    try:
+        results = {
+            "meta": {
+                "commit": _git_commit(),
+                "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "cpus": os.cpu_count(),
+                "args": vars(args),
+            }
+        }
+
+        # Pure functions first (no app state)
+        pages = page_records(args.docs, args.pages)
+        results["chunking"] = bench_chunking(pages)
+
+        from text_chunker import chunk_text
+        chunks = chunk_text(pages, "bench.pdf")
+        results["risks"] = bench_risks(chunks)
+        results["embedding"] = bench_embedding([c["text"] for c in chunks])
+
+        # Then the app, end to end (throwaway store, stub LLM)
+        from fastapi.testclient import TestClient
+        import main
+
+        with TestClient(main.app) as client:
+            results["ingest_text"] = bench_ingest(client, corpus(args.docs, args.pages), use_ocr=False)
+
+            if args.scanned_docs:
+                if not (shutil.which("tesseract") and shutil.which("pdftoppm")):
+                    results["ingest_scanned"] = {"skipped": "tesseract / poppler not installed"}
+                else:
+                    scanned = corpus(args.scanned_docs, args.scanned_pages, scanned=True, seed=10 ** 5)
+                    results["ingest_scanned"] = bench_ingest(client, scanned, use_ocr=True)
+
+            results["ask"] = bench_ask(client, args.questions, args.cached_repeats)
+
+        results["peak_rss_mb"] = _peak_rss_mb()
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def _flatten(tree, prefix="") -> dict:
+    flat = {}
+    for key, value in tree.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old: dict, new: dict) -> dict:
+    """
+    {metric: [old, new, new / old]} for every numeric result both share.
+    """
+    old_flat = _flatten({k: v for k, v in old.items() if k != "meta"})
+    new_flat = _flatten({k: v for k, v in new.items() if k != "meta"})
+    return {
+        key: [old_flat[key], new_flat[key], round(new_flat[key] / old_flat[key], 3) if old_flat[key] else None]
+        for key in sorted(old_flat.keys() & new_flat.keys())
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline benchmark suite")
+    parser.add_argument("--docs", type=int, default=20, help="text PDFs to ingest")
+    parser.add_argument("--pages", type=int, default=20, help="pages per text PDF")
+    parser.add_argument("--scanned-docs", type=int, default=2, help="scanned PDFs (0 = skip OCR)")
+    parser.add_argument("--scanned-pages", type=int, default=3, help="pages per scanned PDF")
+    parser.add_argument("--questions", type=int, default=50, help="distinct /ask questions")
+    parser.add_argument("--cached-repeats", type=int, default=10, help="questions re-asked (cache hits)")
+    parser.add_argument("--llm-latency-ms", type=float, default=50, help="stub LLM latency")
+    parser.add_argument("--allow-download", action="store_true", help="let the model download")
+    parser.add_argument("--out", help="JSON path (default benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", help="previous results JSON to diff against")
+    args = parser.parse_args()
+
+    results = run(args)
+
+    out = args.out or os.path.join(RESULTS_DIR, f"{results['meta']['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(results, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    if args.compare:
+        with open(args.compare) as f:
+            print(json.dumps({"compare": compare(json.load(f), results)}, indent=2))
+    print(f"results written to {out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# synthetic_docs.py
+# -------------------------------------------------
+# Deterministic synthetic legal PDFs for the benchmark suite:
+# text PDFs (real text layer) and scanned PDFs (page images only).
+# Written as raw PDF objects - no PDF library needed.
+# -------------------------------------------------
+
+import io
+import random
+import textwrap
+import zlib
+
+_WORDS = (
+    "the supplier shall deliver goods services purchaser pay consideration "
+    "within thirty days receipt valid invoice subject terms conditions party "
+    "agreement notice writing obligations liability reasonable efforts"
+).split()
+
+# Phrases the default risk rules (risk_rules.json) react to, and one
+# the old substring matching misread ("exit" in existing, "fine" in defined)
+_RISK_SENTENCES = [
+    "Either party may terminate this agreement upon ninety days written notice.",
+    "A penalty of two percent per month shall apply to late payments.",
+    "The supplier shall indemnify the purchaser against all third party claims.",
+    "This agreement is subject to the governing law of India.",
+    "Liquidated damages shall not exceed ten percent of the contract value.",
+    "The licensee may not sublicense the intellectual property without consent.",
+    "The courts of Mumbai shall have exclusive jurisdiction.",
+    "Any dispute shall be referred to arbitration in Singapore.",
+    "Existing obligations survive the defined term of the licence.",
+]
+
+DOC_TYPES = ["Master Services Agreement", "Non-Disclosure Agreement", "Lease Deed", "Share Purchase Agreement"]
+
+PAGE_WIDTH, PAGE_HEIGHT = 612, 792   # US Letter, points
+CHARS_PER_LINE = 95
+LINES_PER_PAGE = 58
+
+
+def contract_pages(n_pages: int, seed: int = 0, risk_rate: float = 0.15) -> list:
+    """
+    ["page text", ...]: numbered articles and clauses of filler
+    sentences, with a risk sentence in ~risk_rate of clauses.
+    """
+    rng = random.Random(seed)
+    title = rng.choice(DOC_TYPES)
+    lines = [title.upper(), ""]
+    article = 0
+    while len(lines) < n_pages * LINES_PER_PAGE:
+        article += 1
+        lines.append(f"Article {article} General Provisions.")
+        for clause in range(1, rng.randint(3, 8)):
+            sentences = [
+                " ".join(rng.choices(_WORDS, k=rng.randint(10, 24))).capitalize() + "."
+                for _ in range(rng.randint(1, 6))
+            ]
+            if rng.random() < risk_rate:
+                sentences.insert(rng.randint(0, len(sentences)), rng.choice(_RISK_SENTENCES))
+            lines.extend(textwrap.wrap(f"{article}.{clause} " + " ".join(sentences), CHARS_PER_LINE))
+        lines.append("")
+
+    return [
+        "\n".join(lines[i:i + LINES_PER_PAGE])
+        for i in range(0, n_pages * LINES_PER_PAGE, LINES_PER_PAGE)
+    ]
+
+
+def page_records(n_docs: int, pages_per_doc: int, seed: int = 0, risk_rate: float = 0.15) -> list:
+    """
+    [{"page", "text"}] for n_docs contracts back to back, whitespace
+    collapsed like text_cleaner output (clauses still cross pages).
+    """
+    pages = []
+    for i in range(n_docs):
+        pages.extend(
+            {"page": len(pages) + 1, "text": " ".join(text.split())}
+            for text in contract_pages(pages_per_doc, seed=seed + i, risk_rate=risk_rate)
+        )
+    return pages
+
+
+# =====================================================
+# 🧾 Minimal PDF writer
+# =====================================================
+def _pdf(objects: list) -> bytes:
+    """
+    objects[i] is the body of object i + 1; object 1 must be the catalog.
+    """
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(
+        b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    )
+    return out.getvalue()
+
+
+def _stream(data: bytes, extra: bytes = b"") -> bytes:
+    return b"<< /Length %d %s>>\nstream\n" % (len(data), extra) + data + b"\nendstream"
+
+
+def _escape(line: str) -> str:
+    return line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _page_tree(page_bodies: list) -> list:
+    """
+    [catalog, pages, font, then (page, content, [image]) per page].
+    `page_bodies` = [(content bytes, image object body or None)].
+    """
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for content, image in page_bodies:
+        page_no = len(objects) + 1
+        kids.append(page_no)
+        resources = b"/Font << /F1 3 0 R >>"
+        if image is not None:
+            resources += b" /XObject << /Im1 %d 0 R >>" % (page_no + 2)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] /Contents %d 0 R /Resources << %s >> >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, page_no + 1, resources)
+        )
+        objects.append(_stream(zlib.compress(content), b"/Filter /FlateDecode "))
+        if image is not None:
+            objects.append(image)
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), len(kids)
+    )
+    return objects
+
+
+def text_pdf(pages: list) -> bytes:
+    """
+    One page per text, Helvetica 9pt: PyPDF2 extracts it directly.
+    """
+    bodies = []
+    for text in pages:
+        ops = ["BT /F1 9 Tf 11 TL 50 750 Td"]
+        ops.extend(f"({_escape(line)}) Tj T*" for line in text.split("\n"))
+        ops.append("ET")
+        bodies.append(("\n".join(ops).encode("latin-1", "replace"), None))
+    return _pdf(_page_tree(bodies))
+
+
+def scanned_pdf(pages: list, dpi: int = 150) -> bytes:
+    """
+    Each page is ONLY a grayscale JPEG of its text (no text layer), so
+    ingestion has to OCR it. Needs Pillow - which pytesseract and
+    pdf2image require anyway.
+    """
+    from PIL import Image, ImageDraw, ImageFont
+
+    scale = dpi / 72
+    width, height = int(PAGE_WIDTH * scale), int(PAGE_HEIGHT * scale)
+    size = int(9 * scale)
+    try:
+        font = ImageFont.truetype("DejaVuSans.ttf", size)
+    except OSError:
+        font = ImageFont.load_default()
+
+    bodies = []
+    for text in pages:
+        image = Image.new("L", (width, height), 255)
+        draw = ImageDraw.Draw(image)
+        y = int(42 * scale)
+        for line in text.split("\n"):
+            draw.text((int(50 * scale), y), line, fill=0, font=font)
+            y += int(11 * scale)
+        jpeg = io.BytesIO()
+        image.save(jpeg, "JPEG", quality=80)
+        image_obj = _stream(
+            jpeg.getvalue(),
+            b"/Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+            b"/BitsPerComponent 8 /Filter /DCTDecode " % (width, height)
+        )
+        content = b"q %d 0 0 %d 0 0 cm /Im1 Do Q" % (PAGE_WIDTH, PAGE_HEIGHT)
+        bodies.append((content, image_obj))
+    return _pdf(_page_tree(bodies))
+
+
+def corpus(n_docs: int, pages_per_doc: int, scanned: bool = False, seed: int = 0) -> list:
+    """
+    [(file name, pdf bytes)], each document with its own seed.
+    """
+    docs = []
+    for i in range(n_docs):
+        pages = contract_pages(pages_per_doc, seed=seed + i)
+        kind = "scanned" if scanned else "text"
+        data = scanned_pdf(pages) if scanned else text_pdf(pages)
+        docs.append((f"{kind}_{i:04d}.pdf", data))
+    return docs
@@ -0,0 +1,216 @@
+# bm25_index.py
+# -------------------------------------------------
+# Sparse BM25 inverted index over chunks (built incrementally
+# alongside the FAISS index, keyed by the same global chunk uid)
+# -------------------------------------------------
+
+import math
+import re
+import threading
+from collections import Counter
+
+import numpy as np
+
+# Keeps clause numbers and defined terms intact: "14.2", "co-op", "s/he"
+_TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.\-/][a-z0-9]+)*")
+
+# Very common words carry no signal and dominate posting-list size
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in is it its of on or that the
+this to was were which will with shall such any all other not be been
+""".split())
+
+
+def tokenize(text: str) -> list:
+    return [t for t in _TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+class _Posting:
+    """
+    Growable pair of packed arrays (uint32 uid, uint16 tf).
+    ~6 bytes per posting; slicing returns zero-copy views.
+    """
+    __slots__ = ("uids", "tfs", "n")
+
+    def __init__(self):
+        self.uids = np.empty(4, dtype="uint32")
+        self.tfs = np.empty(4, dtype="uint16")
+        self.n = 0
+
+    def extend(self, uids: list, tfs: list):
+        end = self.n + len(uids)
+        if end > self.uids.shape[0]:
+            capacity = max(end, self.uids.shape[0] * 2)
+            self.uids = np.resize(self.uids, capacity)
+            self.tfs = np.resize(self.tfs, capacity)
+        self.uids[self.n:end] = uids
+        self.tfs[self.n:end] = np.minimum(tfs, 65535)
+        self.n = end
+
+    @classmethod
+    def view(cls, uids: np.ndarray, tfs: np.ndarray) -> "_Posting":
+        """
+        A full posting over existing arrays (no copy); the first
+        extend() reallocates, so the arrays are never written to.
+        """
+        posting = cls.__new__(cls)
+        posting.uids, posting.tfs, posting.n = uids, tfs, uids.shape[0]
+        return posting
+
+
+class BM25Index:
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self._clear()
+
+    def _clear(self):
+        self._postings = {}
+        self._doc_len = np.zeros(1024, dtype="uint32")
+        self._size = 0              # next uid == number of chunks seen
+        self._total_len = 0
+        self._scratch = np.zeros(1024, dtype="float32")
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+
+    def __len__(self) -> int:
+        return self._size
+
+    # -------------------------------------------------
+    # ➕ Append
+    # -------------------------------------------------
+    def add_chunks(self, chunks: list, first_uid: int):
+        """
+        Indexes `chunks` as uids first_uid, first_uid + 1, ...
+        Uids must arrive in increasing order (append-only).
+        """
+        with self._lock:
+            if first_uid < self._size:
+                raise ValueError("BM25 index is append-only")
+
+            end = first_uid + len(chunks)
+            if end > self._doc_len.shape[0]:
+                capacity = max(end, self._doc_len.shape[0] * 2)
+                self._doc_len = np.resize(self._doc_len, capacity)
+                self._doc_len[self._size:] = 0
+                self._scratch = np.zeros(capacity, dtype="float32")
+
+            # Group per term first, then one vectorized append per term
+            batch = {}
+            for offset, chunk in enumerate(chunks):
+                uid = first_uid + offset
+                tokens = tokenize(chunk.get("text") or "")
+                self._doc_len[uid] = len(tokens)
+                self._total_len += len(tokens)
+                for term, tf in Counter(tokens).items():
+                    entry = batch.get(term)
+                    if entry is None:
+                        entry = batch[term] = ([], [])
+                    entry[0].append(uid)
+                    entry[1].append(tf)
+
+            for term, (uids, tfs) in batch.items():
+                posting = self._postings.get(term)
+                if posting is None:
+                    posting = self._postings[term] = _Posting()
+                posting.extend(uids, tfs)
+
+            self._size = end
+
+    # -------------------------------------------------
+    # 💾 Persistence (see vector_store.py)
+    # -------------------------------------------------
+    def snapshot(self) -> dict:
+        """
+        The whole index as flat arrays (postings concatenated in term
+        order), so a restart loads it instead of re-tokenizing.
+        """
+        with self._lock:
+            terms = list(self._postings)
+            postings = [self._postings[t] for t in terms]
+            return {
+                "terms": np.frombuffer("\n".join(terms).encode("utf-8"), dtype="uint8"),
+                "counts": np.array([p.n for p in postings], dtype="int64"),
+                "uids": np.concatenate([p.uids[:p.n] for p in postings] or [np.empty(0, "uint32")]),
+                "tfs": np.concatenate([p.tfs[:p.n] for p in postings] or [np.empty(0, "uint16")]),
+                "doc_len": self._doc_len[:self._size].copy(),
+                "totals": np.array([self._size, self._total_len], dtype="int64"),
+            }
+
+    def restore(self, arrays: dict):
+        """
+        Replaces the index with a snapshot(); postings are views into
+        the loaded arrays.
+        """
+        counts = arrays["counts"]
+        terms = bytes(arrays["terms"]).decode("utf-8").split("\n") if counts.size else []
+        ends = np.cumsum(counts)
+        uids, tfs = arrays["uids"], arrays["tfs"]
+        size, total_len = (int(v) for v in arrays["totals"])
+
+        with self._lock:
+            self._clear()
+            self._postings = {
+                term: _Posting.view(uids[start:end], tfs[start:end])
+                for term, start, end in zip(terms, (ends - counts).tolist(), ends.tolist())
+            }
+            capacity = max(size, self._doc_len.shape[0])
+            self._doc_len = np.zeros(capacity, dtype="uint32")
+            self._doc_len[:size] = arrays["doc_len"]
+            self._scratch = np.zeros(capacity, dtype="float32")
+            self._size = size
+            self._total_len = total_len
+
+    # -------------------------------------------------
+    # 🔍 Search
+    # -------------------------------------------------
+    def search(self, query: str, top_k: int = 10, allowed: np.ndarray = None) -> list:
+        """
+        Returns [(uid, score), ...] best first.
+        `allowed` optionally restricts results to these uids.
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return []
+
+        with self._lock:
+            n_docs = self._size
+            if n_docs == 0:
+                return []
+            avgdl = self._total_len / n_docs or 1.0
+            scores = self._scratch
+            touched = []
+
+            for term in terms:
+                posting = self._postings.get(term)
+                if posting is None:
+                    continue
+                uids = posting.uids[:posting.n]
+                tfs = posting.tfs[:posting.n]
+                df = posting.n
+                if allowed is not None:
+                    # postings are sorted by uid -> cheap intersection
+                    keep = np.isin(uids, allowed, assume_unique=True)
+                    uids, tfs = uids[keep], tfs[keep]
+                tfs = tfs.astype("float32")
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * self._doc_len[uids] / avgdl)
+                scores[uids] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+                touched.append(uids)
+
+            if not touched:
+                return []
+
+            candidates = np.unique(np.concatenate(touched)) if len(touched) > 1 else touched[0]
+            cand_scores = scores[candidates].copy()
+            scores[candidates] = 0.0   # reset scratch for the next query
+
+        if candidates.size > top_k:
+            top = np.argpartition(-cand_scores, top_k)[:top_k]
+            candidates, cand_scores = candidates[top], cand_scores[top]
+
+        order = np.argsort(-cand_scores, kind="stable")
+        return [(int(candidates[i]), float(cand_scores[i])) for i in order]
@@ -0,0 +1,186 @@
+# context_builder.py
+# -------------------------------------------------
+# Packs retrieved chunks into the LLM context:
+# merge neighbours, drop overlapping text, fit a token budget
+# -------------------------------------------------
+
+import os
+import re
+import threading
+from typing import List, Optional
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+# tiktoken BPE for exact counts (empty = chars / 4). Loaded on first
+# use: get_encoding() may download the BPE file, which must not happen
+# at import (offline / stub mode) - any failure falls back to chars / 4.
+CONTEXT_TOKENIZER = os.getenv("CONTEXT_TOKENIZER", "cl100k_base")
+
+# text_chunker carries up to `overlap` (150) chars into the next chunk
+MAX_OVERLAP_CHARS = 400
+MIN_OVERLAP_CHARS = 8
+
+_SENTENCE_END = re.compile(r"[.!?](?=\s)")
+
+
+_ENCODING = None
+_ENCODING_TRIED = False
+_ENCODING_LOCK = threading.Lock()
+
+
+def _encoding():
+    global _ENCODING, _ENCODING_TRIED
+    if not _ENCODING_TRIED:
+        with _ENCODING_LOCK:
+            if not _ENCODING_TRIED:
+                if CONTEXT_TOKENIZER:
+                    try:
+                        import tiktoken   # optional
+                        _ENCODING = tiktoken.get_encoding(CONTEXT_TOKENIZER)
+                    except Exception:
+                        _ENCODING = None
+                _ENCODING_TRIED = True
+    return _ENCODING
+
+
+def tokenizer_name() -> str:
+    return CONTEXT_TOKENIZER if _encoding() is not None else "chars/4"
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text, disallowed_special=()))
+    return (len(text) + 3) // 4
+
+
+def _overlap(left: str, right: str) -> int:
+    """
+    Length of the longest suffix of `left` that is a prefix of `right`.
+    """
+    limit = min(len(left), len(right), MAX_OVERLAP_CHARS)
+    for k in range(limit, MIN_OVERLAP_CHARS - 1, -1):
+        if left.endswith(right[:k]):
+            return k
+    return 0
+
+
+def _text(source: dict) -> str:
+    return (source.get("content") or source.get("text") or "").strip()
+
+
+def merge_adjacent(sources: List[dict]) -> List[dict]:
+    """
+    Consecutive chunk_ids of the same document page become one block
+    with the repeated overlap removed. Each block keeps the best
+    (lowest) rank of its chunks. Returned best block first.
+    """
+    seen = set()
+    items = []
+    for rank, s in enumerate(sources):
+        key = s.get("uid", (s.get("doc_name"), s.get("chunk_id")))
+        if key in seen:
+            continue   # same chunk retrieved twice
+        seen.add(key)
+        items.append((rank, s))
+
+    groups = {}
+    for rank, s in items:
+        doc = s.get("doc_id", s.get("doc_name"))
+        groups.setdefault((doc, s.get("page")), []).append((rank, s))
+
+    blocks = []
+    for (_, page), members in groups.items():
+        members.sort(key=lambda m: (m[1].get("chunk_id") is None, m[1].get("chunk_id") or 0))
+        current = None
+        for rank, s in members:
+            text = _text(s)
+            chunk_id = s.get("chunk_id")
+            if (
+                current is not None
+                and chunk_id is not None
+                and current["last_chunk_id"] is not None
+                and chunk_id == current["last_chunk_id"] + 1
+            ):
+                cut = _overlap(current["parts"][-1], text)
+                rest = text[cut:].lstrip()
+                if rest:
+                    current["parts"].append(rest)
+                current["last_chunk_id"] = chunk_id
+                current["rank"] = min(current["rank"], rank)
+                continue
+
+            current = {
+                "doc_name": s.get("doc_name"),
+                "page": page,
+                "rank": rank,
+                "last_chunk_id": chunk_id,
+                "parts": [text],
+            }
+            blocks.append(current)
+
+    blocks.sort(key=lambda b: b["rank"])
+    return [
+        {
+            "doc_name": b["doc_name"],
+            "page": b["page"],
+            "text": " ".join(p for p in b["parts"] if p),
+        }
+        for b in blocks
+    ]
+
+
+def _truncate(text: str, max_tokens: int) -> str:
+    """
+    Longest prefix ending at a sentence boundary that fits `max_tokens`
+    (falls back to a word boundary).
+    """
+    approx = text[:max_tokens * 4]
+    while approx and count_tokens(approx) > max_tokens:
+        approx = approx[:int(len(approx) * 0.9)]
+    ends = [m.end() for m in _SENTENCE_END.finditer(approx + " ")]
+    if ends:
+        return approx[:ends[-1]]
+    return approx.rsplit(" ", 1)[0] if " " in approx else approx
+
+
+def pack_context(sources: List[dict], budget_tokens: int = CONTEXT_TOKEN_BUDGET,
+                 stats: Optional[dict] = None) -> List[dict]:
+    """
+    Returns prompt-ready excerpts [{"doc_name", "page", "text"}]:
+    merged, de-overlapped and cut to `budget_tokens`, highest ranked
+    first. `stats`, if given, receives packed vs raw token counts.
+    """
+    if not sources:
+        return []
+
+    raw_tokens = sum(count_tokens(_text(s)) for s in sources)
+    packed, used = [], 0
+
+    for block in merge_adjacent(sources):
+        tokens = count_tokens(block["text"])
+        if used + tokens <= budget_tokens:
+            packed.append(block)
+            used += tokens
+            continue
+
+        # Partial block only if a meaningful slice still fits
+        remaining = budget_tokens - used
+        if remaining >= 32:
+            text = _truncate(block["text"], remaining)
+            if text:
+                packed.append({**block, "text": text})
+                used += count_tokens(text)
+        break
+
+    if stats is not None:
+        stats.update({
+            "chunks": len(sources),
+            "excerpts": len(packed),
+            "raw_tokens": raw_tokens,
+            "packed_tokens": used,
+            "packing_ratio": round(used / raw_tokens, 3) if raw_tokens else 1.0,
+            "budget_tokens": budget_tokens,
+            "tokenizer": tokenizer_name(),
+        })
+    return packed
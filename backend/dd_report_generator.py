@@ -1,11 +1,67 @@
 # dd_report_generator.py
+import io
+import re
+from xml.sax.saxutils import escape
+
 from docx import Document
+from docx.oxml import parse_xml
+from docx.oxml.ns import nsdecls
+
+HEAT_MAP_COLUMNS = ("Page", "Severity", "Risk Type", "Snippet")
+
+# Severity cell shading (the "heat")
+_SEVERITY_FILL = {"High": "F4CCCC", "Medium": "FCE5CD", "Low": "D9EAD3"}
+
+# XML 1.0 forbids most control chars; OCR text can contain them
+_INVALID_XML = re.compile(r"[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]")
+
+
+def _cell(text, fill: str = None, bold: bool = False) -> str:
+    text = escape(_INVALID_XML.sub("", "" if text is None else str(text)))
+    shading = f'<w:tcPr><w:shd w:val="clear" w:color="auto" w:fill="{fill}"/></w:tcPr>' if fill else ""
+    run_props = "<w:rPr><w:b/></w:rPr>" if bold else ""
+    return (
+        f'<w:tc>{shading}<w:p><w:r>{run_props}'
+        f'<w:t xml:space="preserve">{text}</w:t></w:r></w:p></w:tc>'
+    )
+
+
+def _heat_map_table(rows: list):
+    """
+    The whole table as ONE XML string parsed once; python-docx's
+    add_table / cell.text is per-cell DOM work and takes minutes at
+    10k rows.
+    """
+    parts = [
+        f"<w:tbl {nsdecls('w')}>"
+        '<w:tblPr><w:tblStyle w:val="TableGrid"/><w:tblW w:w="5000" w:type="pct"/></w:tblPr>'
+        "<w:tblGrid>"
+        '<w:gridCol w:w="700"/><w:gridCol w:w="1100"/><w:gridCol w:w="1700"/><w:gridCol w:w="5500"/>'
+        "</w:tblGrid>",
+        # header row repeats on every page
+        "<w:tr><w:trPr><w:tblHeader/></w:trPr>"
+        + "".join(_cell(c, bold=True) for c in HEAT_MAP_COLUMNS)
+        + "</w:tr>",
+    ]
+    for r in rows:
+        severity = r.get("severity")
+        parts.append(
+            "<w:tr>"
+            + _cell(r.get("page") or "-")
+            + _cell(severity, fill=_SEVERITY_FILL.get(severity))
+            + _cell(r.get("risk_type"))
+            + _cell(r.get("snippet"))
+            + "</w:tr>"
+        )
+    parts.append("</w:tbl>")
+    return parse_xml("".join(parts))
+
 
-def generate_dd_report(dd_summary: dict, output_file: str):
+def generate_dd_report(dd_summary: dict, output_file):
     """
-    Generates a basic Due Diligence report (DOCX).
-    SAFE placeholder implementation.
-    Does NOT change any schemas or logic.
+    Generates the Due Diligence report (DOCX): per-document summary
+    and its heat-map table. `output_file` is a path or a binary
+    file-like object.
     """
 
     doc = Document()
@@ -16,6 +72,10 @@ def generate_dd_report(dd_summary: dict, output_file: str):
         doc.save(output_file)
         return
 
+    heat_rows = {}
+    for row in dd_summary.get("heat_map", []):
+        heat_rows.setdefault(row.get("document"), []).append(row)
+
     # Document summaries
     documents = dd_summary.get("documents", {})
     for doc_name, data in documents.items():
@@ -31,4 +91,19 @@ def generate_dd_report(dd_summary: dict, output_file: str):
             f"Total: {data.get('total_risks', 0)}"
         )
 
+        rows = heat_rows.get(doc_name)
+        if rows:
+            doc.add_heading("Risk Heat Map", level=3)
+            anchor = doc.add_paragraph()
+            anchor._p.addprevious(_heat_map_table(rows))
+
     doc.save(output_file)
+
+
+def render_dd_report(dd_summary: dict) -> bytes:
+    """
+    The report as DOCX bytes (in memory, nothing written to disk).
+    """
+    buffer = io.BytesIO()
+    generate_dd_report(dd_summary, buffer)
+    return buffer.getvalue()
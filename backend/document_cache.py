@@ -0,0 +1,170 @@
+# document_cache.py
+# -------------------------------------------------
+# Content-addressed on-disk cache of processed documents
+# -------------------------------------------------
+#
+# Layout: <cache_dir>/<key>/
+#   meta.json        pages, doc_profile, chunks, risks, rules_version
+#   embeddings.npy   float32 vectors (memory-mapped on load)
+#   rows.npy         chunk position of every embedding row
+#
+# key = sha256(file bytes) + chunker / embedding model versions, so
+# any pipeline change naturally misses. Risks carry the rule-set
+# version they were detected with and are re-detected on mismatch.
+
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+DOC_CACHE_DIR = os.getenv("DOC_CACHE_DIR", os.path.join(os.path.dirname(__file__), ".doc_cache"))
+DOC_CACHE_MAX_BYTES = int(os.getenv("DOC_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+
+
+def cache_key(file_sha256: str, *versions) -> str:
+    parts = [file_sha256] + [str(v) for v in versions]
+    return hashlib.sha256("|".join(parts).encode("utf-8")).hexdigest()
+
+
+def _dir_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(path, name))
+        for name in os.listdir(path)
+    )
+
+
+class DocumentCache:
+    """
+    LRU, size-bounded cache. Recency is the entry directory's mtime,
+    so it survives restarts without a separate index file.
+    """
+
+    def __init__(self, cache_dir: str = DOC_CACHE_DIR, max_bytes: int = DOC_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = {}   # key -> [size_bytes, last_access]
+
+        os.makedirs(cache_dir, exist_ok=True)
+        for key in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, key)
+            if key.startswith(".") or not os.path.isdir(path):
+                continue
+            self._entries[key] = [_dir_size(path), os.path.getmtime(path)]
+
+    # -------------------------------------------------
+    # 🔍 Lookup
+    # -------------------------------------------------
+    def get(self, key: str) -> Optional[dict]:
+        path = os.path.join(self.cache_dir, key)
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            now = time.time()
+            self._entries[key][1] = now
+
+        try:
+            os.utime(path, (now, now))
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                entry = json.load(f)
+            entry["embeddings"] = np.load(os.path.join(path, "embeddings.npy"), mmap_mode="r")
+            entry["valid_rows"] = np.load(os.path.join(path, "rows.npy"))
+            return entry
+        except (OSError, ValueError):
+            # Corrupt / half-evicted entry -> treat as a miss
+            with self._lock:
+                self._entries.pop(key, None)
+                self.hits -= 1
+                self.misses += 1
+            shutil.rmtree(path, ignore_errors=True)
+            return None
+
+    # -------------------------------------------------
+    # 💾 Store
+    # -------------------------------------------------
+    def put(self, key: str, pages: list, doc_profile: dict, chunks: list,
+            embeddings: np.ndarray, valid_rows: np.ndarray, risks: list,
+            rules_version: Optional[str] = None):
+        final_path = os.path.join(self.cache_dir, key)
+        tmp_path = os.path.join(self.cache_dir, f".tmp-{key}-{threading.get_ident()}")
+        os.makedirs(tmp_path, exist_ok=True)
+
+        try:
+            with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump({
+                    "pages": pages,
+                    "doc_profile": doc_profile,
+                    "chunks": chunks,
+                    "risks": risks,
+                    "rules_version": rules_version,
+                }, f)
+            np.save(os.path.join(tmp_path, "embeddings.npy"), np.asarray(embeddings, dtype="float32"))
+            np.save(os.path.join(tmp_path, "rows.npy"), np.asarray(valid_rows, dtype="int64"))
+            size = _dir_size(tmp_path)
+
+            with self._lock:
+                if key in self._entries:
+                    shutil.rmtree(tmp_path, ignore_errors=True)
+                    return
+                os.replace(tmp_path, final_path)
+                self._entries[key] = [size, time.time()]
+                self._evict()
+        except OSError:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+    def update_risks(self, key: str, risks: list, rules_version: str):
+        """
+        Re-detected risks for an existing entry, so the next hit under
+        the same rule set skips detection.
+        """
+        path = os.path.join(self.cache_dir, key)
+        meta_path = os.path.join(path, "meta.json")
+        tmp_meta = os.path.join(path, f".meta-{threading.get_ident()}.json")
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                entry = json.load(f)
+            entry["risks"] = risks
+            entry["rules_version"] = rules_version
+            with open(tmp_meta, "w", encoding="utf-8") as f:
+                json.dump(entry, f)
+            os.replace(tmp_meta, meta_path)
+            with self._lock:
+                if key in self._entries:
+                    self._entries[key][0] = _dir_size(path)
+        except (OSError, ValueError):
+            # evicted meanwhile -> nothing to update
+            if os.path.exists(tmp_meta):
+                os.remove(tmp_meta)
+
+    def _evict(self):
+        total = sum(size for size, _ in self._entries.values())
+        for key, (size, _) in sorted(self._entries.items(), key=lambda kv: kv[1][1]):
+            if total <= self.max_bytes:
+                break
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            del self._entries[key]
+            total -= size
+
+    # -------------------------------------------------
+    # 📊 Stats
+    # -------------------------------------------------
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": sum(size for size, _ in self._entries.values()),
+                "max_bytes": self.max_bytes,
+            }
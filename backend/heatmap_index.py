@@ -0,0 +1,159 @@
+# heatmap_index.py
+# -------------------------------------------------
+# Indexed heat-map rows for paginated / filtered / sorted reads
+# (in-memory SQLite, maintained by RiskAggregator)
+# -------------------------------------------------
+
+import base64
+import json
+import sqlite3
+import threading
+
+# sort key -> column; every page is a keyset range scan on its index
+SORT_COLUMNS = {
+    "document": "document",
+    "doc_type": "doc_type",
+    "page": "page_key",
+    "severity": "severity_rank",   # Low < Medium < High
+    "risk_type": "risk_type",
+}
+DEFAULT_SORT = "document"
+FILTER_FIELDS = ("severity", "doc_type", "risk_type", "document")
+MAX_PAGE_SIZE = 500
+
+_SEVERITY_RANK = {"Low": 1, "Medium": 2, "High": 3}
+
+_SCHEMA = """
+CREATE TABLE heat (
+    doc_id         INTEGER NOT NULL,
+    seq            INTEGER NOT NULL,
+    document       TEXT,
+    doc_type       TEXT,
+    page           INTEGER,
+    page_key       INTEGER NOT NULL,   -- page, NULL -> 0 (keyset needs no NULLs)
+    severity       TEXT,
+    severity_rank  INTEGER,
+    risk_type      TEXT,
+    snippet        TEXT,
+    PRIMARY KEY (doc_id, seq)
+);
+"""
+
+_FIELDS = ("document", "doc_type", "page", "severity", "risk_type", "snippet")
+
+
+class HeatMapIndex:
+    """
+    Heat-map rows keyed by (doc_id, seq) with one (column, doc_id, seq)
+    index per sort key, plus filter-first indexes for the common
+    "severity = X ordered by Y" dashboard queries.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        for name, column in SORT_COLUMNS.items():
+            self._conn.execute(f"CREATE INDEX heat_{name} ON heat ({column}, doc_id, seq)")
+            if name != "severity":
+                self._conn.execute(
+                    f"CREATE INDEX heat_sev_{name} ON heat (severity, {column}, doc_id, seq)"
+                )
+
+    # -------------------------------------------------
+    # ✍ Updates
+    # -------------------------------------------------
+    def replace_document(self, doc_id: int, heat_rows: list):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM heat WHERE doc_id = ?", (doc_id,))
+            self._conn.executemany(
+                "INSERT INTO heat VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (doc_id, seq, r["document"] or "", r["doc_type"] or "", r["page"],
+                     r["page"] or 0, r["severity"], _SEVERITY_RANK.get(r["severity"], 1),
+                     r["risk_type"] or "", r["snippet"])
+                    for seq, r in enumerate(heat_rows)
+                ]
+            )
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM heat")
+
+    # -------------------------------------------------
+    # 📄 Pages
+    # -------------------------------------------------
+    def page(self, limit: int = 100, cursor: str = None, sort: str = DEFAULT_SORT,
+             order: str = "asc", filters: dict = None) -> dict:
+        """
+        filters = {"severity": [...], "doc_type": [...], "risk_type": [...],
+        "document": [...]} (each optional, values OR-ed, fields AND-ed).
+        Returns {"items": [...], "next_cursor": str | None}.
+        """
+        if sort not in SORT_COLUMNS:
+            raise ValueError(f"sort must be one of {sorted(SORT_COLUMNS)}")
+        if order not in ("asc", "desc"):
+            raise ValueError("order must be asc or desc")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        column = SORT_COLUMNS[sort]
+
+        where, params = [], []
+        for field, values in (filters or {}).items():
+            if field not in FILTER_FIELDS:
+                raise ValueError(f"Unknown filter: {field}")
+            if values:
+                where.append(f"{field} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+
+        if cursor:
+            after = _decode_cursor(cursor, sort, order)
+            op = ">" if order == "asc" else "<"
+            where.append(f"({column}, doc_id, seq) {op} (?, ?, ?)")
+            params.extend(after)
+
+        # Walk the sort index (no temp B-tree, stops after limit + 1 rows);
+        # one severity -> its (severity, column) index is an exact range
+        index = f"heat_{sort}"
+        if sort != "severity" and len((filters or {}).get("severity") or ()) == 1:
+            index = f"heat_sev_{sort}"
+
+        direction = "ASC" if order == "asc" else "DESC"
+        sql = (
+            f"SELECT {column}, doc_id, seq, {', '.join(_FIELDS)} FROM heat INDEXED BY {index}"
+            + (f" WHERE {' AND '.join(where)}" if where else "")
+            + f" ORDER BY {column} {direction}, doc_id {direction}, seq {direction}"
+            + " LIMIT ?"
+        )
+        params.append(limit + 1)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = _encode_cursor(rows[-1][:3], sort, order)
+
+        return {
+            "items": [dict(zip(_FIELDS, row[3:])) for row in rows],
+            "next_cursor": next_cursor,
+        }
+
+
+# -------------------------------------------------
+# 🔖 Opaque cursors: last (sort value, doc_id, seq) + sort signature
+# -------------------------------------------------
+def _encode_cursor(key: tuple, sort: str, order: str) -> str:
+    raw = json.dumps([sort, order, *key]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_cursor(cursor: str, sort: str, order: str) -> list:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        c_sort, c_order, *key = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+    if (c_sort, c_order) != (sort, order) or len(key) != 3:
+        raise ValueError("Cursor was issued for a different sort order")
+    return key
@@ -0,0 +1,82 @@
+# ingestion.py
+# -------------------------------------------------
+# CPU-bound document pipeline stages.
+#
+# Everything here is a plain top-level function so it can run
+# inside a worker PROCESS. Do NOT import text_embedder (or anything
+# that loads a model) from this module.
+# -------------------------------------------------
+
+import mmap
+from typing import Iterator, Optional
+
+import PyPDF2
+
+from text_cleaner import clean_text
+from text_chunker import chunk_pages
+from document_classifier import classify_document
+
+
+def iter_pdf_pages(pdf_path: str) -> Iterator[dict]:
+    """
+    Yields {"page": n, "text": cleaned text} one page at a time, with
+    text "" for pages without a text layer (or that fail to parse).
+
+    Memory stays flat in the file size: the PDF is memory-mapped
+    (PdfReader(path) would read it whole into a BytesIO), and after
+    each page the reader's object cache - which would otherwise keep
+    every scanned image stream it touched - and the mapped pages are
+    released.
+    """
+    with open(pdf_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        reader = PyPDF2.PdfReader(data)
+        for i in range(len(reader.pages)):
+            try:
+                text = reader.pages[i].extract_text() or ""
+            except Exception:
+                text = ""   # broken page: left to OCR, the rest still parse
+            reader.resolved_objects.clear()   # re-read from the map on demand
+            if hasattr(mmap, "MADV_DONTNEED"):   # Linux / macOS
+                data.madvise(mmap.MADV_DONTNEED)
+            yield {"page": i + 1, "text": clean_text(text) if text.strip() else ""}
+
+
+def parse_pdf(pdf_path: str) -> tuple:
+    """
+    Extracts embedded text with PyPDF2 from the PDF at `pdf_path`.
+    Returns (pages, page_count) where pages = [{"page": 1, "text": "..."}]
+    for pages that had text. page_count is 0 if the PDF could not be read.
+    """
+    pages = []
+    page_count = 0
+    try:
+        for page in iter_pdf_pages(pdf_path):
+            page_count = page["page"]
+            if page["text"]:
+                pages.append(page)
+    except Exception:
+        pass   # unreadable: page_count 0 -> missing_pages() OCRs everything
+
+    return pages, page_count
+
+
+def missing_pages(pages: list, page_count: int) -> Optional[list]:
+    """
+    Page numbers PyPDF2 found no text on (None = unknown, OCR everything).
+    """
+    if not page_count:
+        return None
+    have = {p["page"] for p in pages}
+    return [n for n in range(1, page_count + 1) if n not in have]
+
+
+def chunk_document(pages: list, doc_name: str) -> dict:
+    """
+    Classifies the document and splits it into chunks.
+    """
+    doc_profile = classify_document(doc_name, pages)
+    chunks = chunk_pages(pages, doc_name)
+    for c in chunks:
+        c["doc_type"] = doc_profile["doc_type"]
+
+    return {"doc_profile": doc_profile, "chunks": chunks}
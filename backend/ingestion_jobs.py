@@ -0,0 +1,371 @@
+# ingestion_jobs.py
+# -------------------------------------------------
+# Background ingestion queue with per-stage status
+# -------------------------------------------------
+
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+
+import numpy as np
+
+from ingestion import parse_pdf, missing_pages, chunk_document
+import ocr_engine
+from risk_detector import detect_risks
+from risk_rules import current_ruleset
+from text_chunker import CHUNKER_VERSION
+from text_embedder import encode_texts, EMBEDDING_MODEL_ID
+from document_cache import DocumentCache, cache_key
+from upload_spool import file_sha256
+import metrics
+
+STAGES = ["parsed", "ocr", "chunked", "embedded", "risks"]
+
+# Finished jobs kept for polling before the oldest are dropped
+MAX_FINISHED_JOBS = 1000
+
+
+def _remove(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class IngestJob:
+    def __init__(self, doc_id: int, doc_name: str):
+        self.job_id = uuid.uuid4().hex
+        self.doc_id = doc_id
+        self.doc_name = doc_name
+        self.status = "queued"   # queued | running | done | failed | discarded
+        self.stages = {s: "pending" for s in STAGES}
+        self.progress = {}
+        self.timings = {}   # stage -> seconds
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "doc_id": self.doc_id,
+            "doc_name": self.doc_name,
+            "status": self.status,
+            "stages": dict(self.stages),
+            "progress": dict(self.progress),
+            "timings": dict(self.timings),
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs uploads off the event loop.
+
+    - Parsing, OCR, chunking and risk detection -> process pool
+    - Embedding -> ONE thread (the model lives in this process)
+    - Orchestration -> small thread pool, one job per thread
+
+    `commit` is called with (job, result) once every stage is done;
+    it owns all writes to the shared corpus state (run_bulk takes a
+    batch variant).
+
+    With a `cache`, a byte-identical re-upload skips every stage
+    (only risk detection re-runs if the rule set changed since).
+    """
+
+    def __init__(self, commit: Callable, max_workers: Optional[int] = None,
+                 cache: Optional[DocumentCache] = None):
+        self._commit = commit
+        self.cache = cache
+        self._max_workers = max_workers or max(1, (os.cpu_count() or 2) - 1)
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._cpu_pool = None
+        self._embed_pool = None
+        self._runner = None
+
+    def _ensure_pools(self):
+        if self._runner is None:
+            self._cpu_pool = ProcessPoolExecutor(
+                max_workers=self._max_workers, mp_context=ocr_engine.MP_CONTEXT
+            )
+            self._embed_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+            self._runner = ThreadPoolExecutor(max_workers=self._max_workers, thread_name_prefix="ingest")
+
+    # -------------------------------------------------
+    # 📥 Submit / Poll
+    # -------------------------------------------------
+    def submit(self, doc_id: int, doc_name: str, pdf_path: str, use_ocr: bool,
+               sha256: Optional[str] = None, **context) -> IngestJob:
+        """
+        `pdf_path` is a spooled upload; the job takes ownership and
+        deletes it when finished. `sha256` (computed while spooling)
+        saves re-reading the file for the cache key.
+        """
+        job = IngestJob(doc_id, doc_name)
+        with self._lock:
+            self._ensure_pools()
+            self._jobs[job.job_id] = job
+            self._prune()
+        self._runner.submit(self._run, job, pdf_path, use_ocr, sha256, context)
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def list_jobs(self) -> list:
+        return [j.to_dict() for j in list(self._jobs.values())]
+
+    def _prune(self):
+        finished = [j for j in self._jobs.values() if j.finished_at is not None]
+        overflow = len(finished) - MAX_FINISHED_JOBS
+        for j in sorted(finished, key=lambda j: j.finished_at)[:max(0, overflow)]:
+            self._jobs.pop(j.job_id, None)
+
+    # -------------------------------------------------
+    # ⚙ Pipeline
+    # -------------------------------------------------
+    @staticmethod
+    @contextmanager
+    def _stage(job: IngestJob, name: str):
+        job.stages[name] = "running"
+        t0 = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - t0
+        metrics.observe(f"ingest_{name}", elapsed)
+        job.timings[name] = round(elapsed, 3)
+        job.stages[name] = "done"
+
+    @staticmethod
+    def _fail(job: IngestJob, error: Exception):
+        job.status = "failed"
+        job.error = str(error) or error.__class__.__name__
+        for stage, state in job.stages.items():
+            if state == "running":
+                job.stages[stage] = "failed"
+
+    def _prepare(self, job: IngestJob, pdf_path: str, use_ocr: bool,
+                 sha256: Optional[str], ruleset: dict) -> tuple:
+        """
+        Every stage except embedding and commit. Returns (cache key,
+        result); a cache hit already carries "embeddings".
+        """
+        key = None
+        if self.cache is not None:
+            # rule set is NOT part of the key: rules change -> re-detect only
+            key = cache_key(
+                sha256 or file_sha256(pdf_path), bool(use_ocr),
+                CHUNKER_VERSION, EMBEDDING_MODEL_ID
+            )
+            cached = self.cache.get(key)
+            if cached is not None:
+                job.stages = {s: "cached" for s in STAGES}
+                # same bytes, maybe a new name: cite the CURRENT upload
+                for c in cached["chunks"]:
+                    c["doc_name"] = job.doc_name
+                if cached.get("rules_version") != ruleset["version"]:
+                    with self._stage(job, "risks"):
+                        cached["risks"] = self._cpu_pool.submit(
+                            detect_risks, cached["chunks"], ruleset
+                        ).result()
+                    cached["rules_version"] = ruleset["version"]
+                    self.cache.update_risks(key, cached["risks"], ruleset["version"])
+                job.progress["chunks"] = len(cached["chunks"])
+                return key, cached
+
+        with self._stage(job, "parsed"):
+            # workers open the file themselves; only the path is pickled
+            pages, page_count = self._cpu_pool.submit(parse_pdf, pdf_path).result()
+
+        todo = missing_pages(pages, page_count)
+        if (not pages or use_ocr) and todo != []:
+            # ✅ OCR only pages without a text layer, streamed per batch
+            with self._stage(job, "ocr"):
+                job.progress["ocr_pages_total"] = len(todo) if todo is not None else None
+                job.progress["ocr_pages_done"] = 0
+                for page in ocr_engine.ocr_pages(pdf_path, todo):
+                    if page["text"]:
+                        pages.append(page)
+                    job.progress["ocr_pages_done"] += 1
+                pages.sort(key=lambda p: p["page"])
+        else:
+            job.stages["ocr"] = "skipped"
+        _remove(pdf_path)   # free the spool as early as possible
+
+        if not pages:
+            raise ValueError("No readable text found")
+
+        with self._stage(job, "chunked"):
+            doc = self._cpu_pool.submit(chunk_document, pages, job.doc_name).result()
+        job.progress["chunks"] = len(doc["chunks"])
+
+        with self._stage(job, "risks"):
+            risks = self._cpu_pool.submit(detect_risks, doc["chunks"], ruleset).result()
+
+        return key, {
+            "pages": pages,
+            "doc_profile": doc["doc_profile"],
+            "chunks": doc["chunks"],
+            "risks": risks,
+            "rules_version": ruleset["version"],
+        }
+
+    def _cache_put(self, key: Optional[str], result: dict):
+        if key is not None:
+            self.cache.put(
+                key, result["pages"], result["doc_profile"], result["chunks"],
+                result["embeddings"], result["valid_rows"], result["risks"],
+                result["rules_version"]
+            )
+
+    def _run(self, job: IngestJob, pdf_path: str, use_ocr: bool, sha256: Optional[str], context: dict):
+        job.status = "running"
+        try:
+            key, result = self._prepare(job, pdf_path, use_ocr, sha256, current_ruleset())
+            if "embeddings" not in result:
+                with self._stage(job, "embedded"):
+                    texts = [c["text"] for c in result["chunks"]]
+                    result["embeddings"], result["valid_rows"] = (
+                        self._embed_pool.submit(encode_texts, texts).result()
+                    )
+                self._cache_put(key, result)
+
+            committed = self._commit(job, {**result, **context})
+            job.status = "done" if committed else "discarded"
+
+        except Exception as e:
+            self._fail(job, e)
+
+        finally:
+            _remove(pdf_path)
+            job.finished_at = time.time()
+
+    # -------------------------------------------------
+    # 📦 Bulk (one embedding pass, one commit)
+    # -------------------------------------------------
+    def run_bulk(self, files: list, use_ocr: bool, commit_many: Callable, **context) -> list:
+        """
+        `files` = [(doc_id, doc_name, pdf_path, sha256), ...]; the spooled
+        files are owned (and deleted) here. Documents are parsed, OCRed,
+        chunked and risk-scanned concurrently; then every new chunk is
+        embedded in ONE batched pass and `commit_many([(job, result),
+        ...])` publishes them all at once. Blocks until done and returns
+        one IngestJob per file (failures included).
+        """
+        jobs = []
+        with self._lock:
+            self._ensure_pools()
+            for doc_id, doc_name, _, _ in files:
+                job = IngestJob(doc_id, doc_name)
+                self._jobs[job.job_id] = job
+                jobs.append(job)
+            self._prune()
+        ruleset = current_ruleset()
+
+        def prepare(job, pdf_path, sha256):
+            job.status = "running"
+            try:
+                return self._prepare(job, pdf_path, use_ocr, sha256, ruleset)
+            except Exception as e:
+                self._fail(job, e)
+                return None
+            finally:
+                _remove(pdf_path)
+
+        futures = [
+            self._runner.submit(prepare, job, pdf_path, sha256)
+            for job, (_, _, pdf_path, sha256) in zip(jobs, files)
+        ]
+        ready = []
+        for job, future in zip(jobs, futures):
+            prepared = future.result()
+            if prepared is not None:
+                ready.append((job, *prepared))
+
+        try:
+            fresh = [(job, key, result) for job, key, result in ready if "embeddings" not in result]
+            if fresh:
+                self._embed_together(fresh)
+
+            committed = commit_many([(job, {**result, **context}) for job, _, result in ready])
+            for job, _, _ in ready:
+                job.status = "done" if committed else "discarded"
+
+        except Exception as e:
+            for job, _, _ in ready:
+                self._fail(job, e)
+
+        finally:
+            for job in jobs:
+                job.finished_at = time.time()
+
+        return jobs
+
+    def _embed_together(self, fresh: list):
+        """
+        One encode_texts call over the chunks of every (job, key, result)
+        in `fresh`, split back per document by row offset.
+        """
+        texts, offsets = [], []
+        for job, _, result in fresh:
+            offsets.append(len(texts))
+            texts.extend(c["text"] for c in result["chunks"])
+            job.stages["embedded"] = "running"
+
+        t0 = time.perf_counter()
+        embeddings, valid = self._embed_pool.submit(encode_texts, texts).result()
+        metrics.observe("ingest_embedded", time.perf_counter() - t0)
+        elapsed = round(time.perf_counter() - t0, 3)
+
+        # valid rows are in input order -> each document is one slice
+        bounds = np.searchsorted(valid, offsets + [len(texts)])
+        for i, (job, key, result) in enumerate(fresh):
+            lo, hi = bounds[i], bounds[i + 1]
+            result["embeddings"] = embeddings[lo:hi]
+            result["valid_rows"] = valid[lo:hi] - offsets[i]
+            job.stages["embedded"] = "done"
+            job.timings["embedded"] = elapsed   # the shared batch
+            self._cache_put(key, result)
+
+    # -------------------------------------------------
+    # ⚖ Risk re-scan (rule set changed)
+    # -------------------------------------------------
+    def rescan_risks(self, documents: Iterable, ruleset: dict):
+        """
+        Re-runs ONLY detect_risks over already-stored chunks.
+        `documents` yields (doc_id, chunks); yields (doc_id, risks) in
+        the same order, with documents spread across the process pool
+        (at most 2x workers in flight, so the corpus is streamed).
+        """
+        with self._lock:
+            self._ensure_pools()
+
+        pending = deque()
+        for doc_id, chunks in documents:
+            # only what detect_risks reads crosses the process boundary
+            slim = [{"text": c["text"], "page": c.get("page")} for c in chunks]
+            pending.append((doc_id, self._cpu_pool.submit(detect_risks, slim, ruleset)))
+            if len(pending) >= 2 * self._max_workers:
+                doc_id, future = pending.popleft()
+                yield doc_id, future.result()
+
+        while pending:
+            doc_id, future = pending.popleft()
+            yield doc_id, future.result()
+
+    # -------------------------------------------------
+    # 🛑 Shutdown
+    # -------------------------------------------------
+    def shutdown(self):
+        for pool in (self._runner, self._embed_pool, self._cpu_pool):
+            if pool is not None:
+                pool.shutdown(wait=False, cancel_futures=True)
+        ocr_engine.shutdown()
@@ -0,0 +1,218 @@
+# llm_backends.py
+# -------------------------------------------------
+# Pluggable LLM backends (LLM_BACKEND=gemini | stub)
+# -------------------------------------------------
+#
+# Every backend exposes generate(prompt) -> str and
+# stream(prompt) -> iterator of raw text deltas. Each backend caps its
+# own in-flight calls; Gemini additionally retries 429s with backoff.
+
+import os
+import random
+import re
+import threading
+import time
+from typing import Iterator
+
+LLM_BACKEND = os.getenv("LLM_BACKEND", "gemini")
+
+GEMINI_MODEL_NAME = os.getenv("GEMINI_MODEL_NAME", "gemini-3-flash-preview")
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "4"))
+LLM_BACKOFF_BASE_SECONDS = float(os.getenv("LLM_BACKOFF_BASE_SECONDS", "1.0"))
+LLM_BACKOFF_MAX_SECONDS = float(os.getenv("LLM_BACKOFF_MAX_SECONDS", "20"))
+
+LLM_STUB_LATENCY_MS = float(os.getenv("LLM_STUB_LATENCY_MS", "50"))      # before the first token
+LLM_STUB_TOKEN_MS = float(os.getenv("LLM_STUB_TOKEN_MS", "0"))           # between streamed tokens
+LLM_STUB_CONCURRENCY = int(os.getenv("LLM_STUB_CONCURRENCY", "64"))
+
+
+_END = object()   # exhausted-stream sentinel
+
+
+class LLMBackend:
+    name = "base"
+
+    def __init__(self, max_concurrency: int):
+        self.max_concurrency = max_concurrency
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        raise NotImplementedError
+
+    def _slotted(self, open_stream) -> Iterator:
+        """
+        Iterates open_stream() holding a concurrency slot only while
+        the next chunk is produced, never across a yield: a consumer
+        that stops early (SSE client gone) cannot keep a slot taken
+        until the generator is garbage-collected.
+        """
+        with self._slots:
+            chunks = iter(open_stream())
+            chunk = next(chunks, _END)
+        while chunk is not _END:
+            yield chunk
+            with self._slots:
+                chunk = next(chunks, _END)
+
+
+# =====================================================
+# ♊ Gemini (one configured client, reused)
+# =====================================================
+def _is_rate_limited(error: Exception) -> bool:
+    # google.api_core.exceptions.ResourceExhausted / TooManyRequests,
+    # matched by name so the SDK's exception module is not imported
+    return (
+        type(error).__name__ in ("ResourceExhausted", "TooManyRequests")
+        or getattr(error, "code", None) == 429
+        or "429" in str(error)
+    )
+
+
+class GeminiBackend(LLMBackend):
+    name = "gemini"
+
+    def __init__(self, model_name: str = GEMINI_MODEL_NAME,
+                 max_concurrency: int = GEMINI_MAX_CONCURRENCY,
+                 max_retries: int = LLM_MAX_RETRIES):
+        super().__init__(max_concurrency)
+        self.model_name = model_name
+        self.max_retries = max_retries
+        self._model = None
+        self._init_lock = threading.Lock()
+
+    def _client(self):
+        """
+        Configured on first use (not at import), then shared by
+        every request; the SDK keeps its connections alive.
+        """
+        if self._model is None:
+            with self._init_lock:
+                if self._model is None:
+                    from llm_config import init_gemini
+                    self._model = init_gemini(self.model_name)
+        return self._model
+
+    def _backoff(self, attempt: int):
+        delay = min(LLM_BACKOFF_MAX_SECONDS, LLM_BACKOFF_BASE_SECONDS * 2 ** attempt)
+        time.sleep(delay * random.uniform(0.5, 1.0))   # jitter: no retry stampede
+
+    def generate(self, prompt: str):
+        """
+        Returns the SDK response (answer_generator extracts the text).
+        """
+        model = self._client()
+        for attempt in range(self.max_retries + 1):
+            try:
+                with self._slots:
+                    return model.generate_content(prompt)
+            except Exception as e:
+                if attempt == self.max_retries or not _is_rate_limited(e):
+                    raise
+            self._backoff(attempt)   # outside the slot: others may proceed
+
+    def stream(self, prompt: str):
+        """
+        Yields SDK response chunks. A 429 is retried only before the
+        first chunk (a half-sent answer cannot be replayed).
+        """
+        model = self._client()
+        for attempt in range(self.max_retries + 1):
+            started = False
+            try:
+                for chunk in self._slotted(lambda: model.generate_content(prompt, stream=True)):
+                    started = True
+                    yield chunk
+                return
+            except Exception as e:
+                if started or attempt == self.max_retries or not _is_rate_limited(e):
+                    raise
+            self._backoff(attempt)
+
+
+# =====================================================
+# 🧪 Stub (offline, deterministic)
+# =====================================================
+_EXCERPT_HEADER = re.compile(r"^Page [^:\n]*:$", re.MULTILINE)
+
+
+class StubResponse:
+    """
+    Mimics the Gemini response / stream-chunk shape (.text).
+    """
+    __slots__ = ("text",)
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class StubBackend(LLMBackend):
+    """
+    Answers from the prompt itself (the first excerpt sentences), so
+    /ask can be load-tested end to end without network or quota.
+    Same prompt -> same answer; latency is configurable.
+    """
+    name = "stub"
+
+    def __init__(self, latency_ms: float = LLM_STUB_LATENCY_MS,
+                 token_ms: float = LLM_STUB_TOKEN_MS,
+                 max_concurrency: int = LLM_STUB_CONCURRENCY):
+        super().__init__(max_concurrency)
+        self.latency_ms = latency_ms
+        self.token_ms = token_ms
+
+    @staticmethod
+    def answer_for(prompt: str) -> str:
+        _, _, excerpts = prompt.partition("Document Excerpts:")
+        text = " ".join(_EXCERPT_HEADER.sub(" ", excerpts).split())
+        if not text:
+            return "The provided documents do not address this question."
+        sentences = re.split(r"(?<=[.!?])\s+", text)
+        return "Based on the provided excerpts, " + " ".join(sentences[:2])
+
+    def generate(self, prompt: str):
+        with self._slots:
+            time.sleep(self.latency_ms / 1000)
+            return StubResponse(self.answer_for(prompt))
+
+    def stream(self, prompt: str):
+        def words():
+            time.sleep(self.latency_ms / 1000)
+            for i, word in enumerate(self.answer_for(prompt).split(" ")):
+                if i and self.token_ms:
+                    time.sleep(self.token_ms / 1000)
+                yield StubResponse(word if i == 0 else " " + word)
+
+        return self._slotted(words)
+
+
+# =====================================================
+# 🔌 Selection
+# =====================================================
+BACKENDS = {"gemini": GeminiBackend, "stub": StubBackend}
+
+_BACKEND = None
+_BACKEND_LOCK = threading.Lock()
+
+
+def get_backend() -> LLMBackend:
+    global _BACKEND
+    if _BACKEND is None:
+        with _BACKEND_LOCK:
+            if _BACKEND is None:
+                if LLM_BACKEND not in BACKENDS:
+                    raise ValueError(f"LLM_BACKEND must be one of {sorted(BACKENDS)}")
+                _BACKEND = BACKENDS[LLM_BACKEND]()
+    return _BACKEND
+
+
+def set_backend(backend: LLMBackend):
+    """
+    Swap the backend at runtime (benchmarks).
+    """
+    global _BACKEND
+    with _BACKEND_LOCK:
+        _BACKEND = backend
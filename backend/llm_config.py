@@ -4,13 +4,13 @@ import google.generativeai as genai
 
 load_dotenv()
 
-def init_gemini():
+def init_gemini(model_name: str = "gemini-3-flash-preview"):
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key:
         raise RuntimeError("GOOGLE_API_KEY not found in environment")
 
     genai.configure(api_key=api_key)
-    return genai.GenerativeModel("gemini-3-flash-preview")
+    return genai.GenerativeModel(model_name)
     
 
 
@@ -1,33 +1,46 @@
-from fastapi import FastAPI, UploadFile, File, Query
+from fastapi import FastAPI, UploadFile, File, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse
-from typing import Optional
-from io import BytesIO
-from pydantic import BaseModel
-
-import PyPDF2
-import pytesseract
-from pdf2image import convert_from_bytes
-
-from dd_report_generator import generate_dd_report
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from fastapi.concurrency import run_in_threadpool, iterate_in_threadpool
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
+import asyncio
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+
+from dd_report_generator import render_dd_report
 
 # ==========================
 # Internal modules
 # ==========================
-from text_cleaner import clean_text
-from text_chunker import chunk_text
-from text_embedder import embed_chunks, model
-from semantic_search import search_chunks
-from answer_generator import generate_answer
-from document_classifier import classify_document
+from text_embedder import model, embedding_stats
+from vector_index import IncrementalIndex
+from vector_store import VectorStore, ChunkStore
+from bm25_index import BM25Index
+from semantic_search import search_chunks, search_chunks_batch, encode_queries, QUERY_CACHE_STATS
+from answer_generator import generate_answer, stream_answer, LLM_UNAVAILABLE_MESSAGE
+from answer_cache import AnswerCache
+from reranker import rerank_within_budget, RERANK_BUDGET_MS, RERANK_CANDIDATES, MAX_RERANK_CANDIDATES
+from risk_aggregator import RiskAggregator
+from heatmap_index import DEFAULT_SORT, MAX_PAGE_SIZE
 from risk_detector import detect_risks
-from risk_aggregator import aggregate_risks
+from risk_rules import current_ruleset, reload_ruleset
+from ingestion_jobs import JobManager
+from document_cache import DocumentCache
+from upload_spool import spool_upload, is_zip, expand_zip
+import metrics
 
 # =====================================================
 # 🚀 App Init
 # =====================================================
 app = FastAPI(title="AI Legal Due Diligence Engine")
 
+logger = logging.getLogger("main")
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -35,155 +48,838 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-POPPLER_PATH = r"C:\Users\narik\Downloads\Release-25.12.0-0\poppler-25.12.0\Library\bin"
+
+@app.middleware("http")
+async def record_latency(request: Request, call_next):
+    # route template (not the raw path) keeps label cardinality bounded;
+    # streamed responses are timed to their first byte
+    t0 = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.labels(
+        request.method, route.path if route is not None else "unmatched"
+    ).observe(time.perf_counter() - t0)
+    return response
 
 # =====================================================
-# 🧠 GLOBAL STATE (IN-MEMORY)
+# 🧠 GLOBAL STATE (persisted in STORE, survives restarts)
 # =====================================================
-VECTOR_INDEX = None
-ALL_CHUNKS = []
-DOC_COUNTER = 0
+STORE = VectorStore()
+
+VECTOR_INDEX = IncrementalIndex()   # chunk-id aware, append-only
+STORE.load_index(VECTOR_INDEX)
+ALL_CHUNKS = ChunkStore(STORE)      # list-like, backed by SQLite
+BM25_INDEX = BM25Index()            # sparse side of hybrid search (same uids)
+
+DOCUMENTS, DOCUMENT_RISKS, DOC_COUNTER = STORE.load_documents()
+RISKS_RULES_VERSION = STORE.get_meta("rules_version")   # rules behind DOCUMENT_RISKS
+
+# ✅ SINGLE SOURCE OF TRUTH FOR SUMMARY + REPORT (updated per document)
+RISK_AGG = RiskAggregator()
+RISK_AGG.rebuild(DOCUMENT_RISKS, DOCUMENTS)
+
+# 🔒 Guards every write above (ingestion runs in background threads)
+STATE_LOCK = threading.RLock()
+CORPUS_GENERATION = 0   # bumped on reset; stale jobs are discarded
+
+
+def _catch_up_bm25(batch_size: int = 10_000):
+    """
+    Brings the in-memory BM25 index up to ALL_CHUNKS: the saved
+    postings first (startup, or after the writer reset the corpus),
+    then tokenizes only chunks newer than that snapshot (a read-only
+    worker picking up new documents).
+    """
+    if len(BM25_INDEX) > len(ALL_CHUNKS):
+        BM25_INDEX.reset()   # the writer reset the corpus
+    if len(BM25_INDEX) == 0:
+        STORE.load_bm25(BM25_INDEX, max_chunks=len(ALL_CHUNKS))
+
+    batch = []
+    first = start = len(BM25_INDEX)
+    for chunk in ALL_CHUNKS.iter_from(start):
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            BM25_INDEX.add_chunks(batch, start)
+            start += len(batch)
+            batch = []
+    if batch:
+        BM25_INDEX.add_chunks(batch, start)
+
+    if len(BM25_INDEX) > first and not STORE.read_only:
+        STORE.save_bm25(BM25_INDEX)   # a store saved before bm25.npz existed
+
+
+_catch_up_bm25()
+
+
+def _commit_document(job, result: dict) -> bool:
+    """
+    Publishes a fully processed document into the global state.
+    Called from the ingestion worker once every stage has finished.
+    """
+    return _commit_documents([(job, result)])
+
+
+def _commit_documents(items: list) -> bool:
+    """
+    Publishes [(job, result), ...] under ONE lock hold with ONE index
+    save (bulk ingestion); all-or-nothing on a concurrent reset.
+    The answer cache needs no invalidation here: its context_key hashes
+    the retrieved chunks, so new chunks in the top-k mean a new key.
+    """
+    with STATE_LOCK:
+        if any(result["generation"] != CORPUS_GENERATION for _, result in items):
+            return False   # a reset happened while these jobs were running
+
+        with metrics.span("ingest_commit"):
+            for job, result in items:
+                _publish_document(job, result)
+            if items:
+                STORE.save_index(VECTOR_INDEX, BM25_INDEX)
+
+    return True
+
+
+def _publish_document(job, result: dict):
+    """
+    Adds one document to memory + store (caller holds STATE_LOCK and
+    saves the vector index).
+    """
+    global RISKS_RULES_VERSION
+
+    doc_id = job.doc_id
+    doc_profile = result["doc_profile"]
+    chunks = result["chunks"]
+
+    ruleset = current_ruleset()
+    if result.get("rules_version") != ruleset["version"]:
+        # rules were reloaded while this job ran
+        result["risks"] = detect_risks(chunks, ruleset)
+
+    first_uid = len(ALL_CHUNKS)
+    for i, c in enumerate(chunks):
+        c["uid"] = first_uid + i   # ✅ global id == position in ALL_CHUNKS
+        c["doc_id"] = doc_id
+
+    DOCUMENTS[doc_id] = {
+        "doc_id": doc_id,
+        "doc_name": job.doc_name,
+        "doc_type": doc_profile["doc_type"],
+        "classification_confidence": doc_profile["confidence"]
+    }
+
+    DOCUMENT_RISKS[doc_id] = result["risks"]
+
+    # ✅ Append ONLY the new document's vectors
+    ALL_CHUNKS.extend(chunks)
+    BM25_INDEX.add_chunks(chunks, first_uid)
+    valid = result["valid_rows"]
+    VECTOR_INDEX.add_embeddings(
+        result["embeddings"], valid + first_uid,
+        doc_ids=doc_id, pages=[chunks[i]["page"] for i in valid]
+    )
+
+    # 💾 Persist (chunks are already written by ALL_CHUNKS.extend)
+    if len(DOCUMENTS) == 1:
+        RISKS_RULES_VERSION = ruleset["version"]   # first document of a corpus
+    STORE.save_document(
+        DOCUMENTS[doc_id], DOCUMENT_RISKS[doc_id], DOC_COUNTER,
+        rules_version=RISKS_RULES_VERSION
+    )
+
+    RISK_AGG.add_document(doc_id, DOCUMENTS[doc_id], DOCUMENT_RISKS[doc_id])
+
+
+def _sync_from_store():
+    """
+    Read-only workers: pick up documents committed by the writer.
+    """
+    global DOCUMENTS, DOCUMENT_RISKS, DOC_COUNTER, RISKS_RULES_VERSION
+
+    if not STORE.read_only:
+        return
+
+    rules_version = STORE.get_meta("rules_version")
+    if not STORE.is_stale() and rules_version == RISKS_RULES_VERSION:
+        return   # neither new documents nor re-scanned risks
+
+    with STATE_LOCK:
+        STORE.load_index(VECTOR_INDEX)
+        ALL_CHUNKS.refresh()
+        _catch_up_bm25()
+        DOCUMENTS, DOCUMENT_RISKS, DOC_COUNTER = STORE.load_documents()
+        RISKS_RULES_VERSION = rules_version
+        RISK_AGG.rebuild(DOCUMENT_RISKS, DOCUMENTS)
+
 
-DOCUMENTS = {}
-DOCUMENT_RISKS = {}
+DOC_CACHE = DocumentCache()
+ANSWER_CACHE = AnswerCache()
+JOBS = JobManager(commit=_commit_document, cache=DOC_CACHE)
 
-# ✅ SINGLE SOURCE OF TRUTH FOR REPORT
-DD_SUMMARY_CACHE = None
 
+@app.on_event("shutdown")
+def shutdown_workers():
+    JOBS.shutdown()
+
+# =====================================================
+# ⚖ Risk rule re-scan (no re-parse, no re-embed)
 # =====================================================
-# 📤 Upload & Index PDF
+_RESCAN_LOCK = threading.Lock()
+
+# > 0: poll the rule file every N seconds and re-scan on change
+RISK_RULES_POLL_SECONDS = float(os.getenv("RISK_RULES_POLL_SECONDS", "0"))
+
+
+def _rescan_risks(ruleset: dict) -> dict:
+    """
+    Re-detects risks for every stored document with `ruleset`,
+    reading the persisted chunks grouped by document.
+    """
+    global RISKS_RULES_VERSION
+
+    with _RESCAN_LOCK:
+        t0 = time.perf_counter()
+        with STATE_LOCK:
+            generation = CORPUS_GENERATION
+            n_chunks = len(ALL_CHUNKS)
+
+        def by_document():
+            # a document's chunks are contiguous uids (committed together)
+            chunks = itertools.islice(ALL_CHUNKS.iter_from(0), n_chunks)
+            for doc_id, group in itertools.groupby(chunks, key=lambda c: c["doc_id"]):
+                yield doc_id, list(group)
+
+        new_risks = dict(JOBS.rescan_risks(by_document(), ruleset))
+
+        with STATE_LOCK:
+            if generation != CORPUS_GENERATION:
+                return {"status": "discarded", "rules_version": ruleset["version"]}
+
+            new_risks = {d: r for d, r in new_risks.items() if d in DOCUMENTS}
+            DOCUMENT_RISKS.update(new_risks)
+            STORE.save_risks(new_risks, ruleset["version"])
+            RISKS_RULES_VERSION = ruleset["version"]
+            for doc_id, risks in new_risks.items():
+                RISK_AGG.add_document(doc_id, DOCUMENTS[doc_id], risks)
+
+        return {
+            "status": "rescanned",
+            "rules_version": ruleset["version"],
+            "documents": len(new_risks),
+            "seconds": round(time.perf_counter() - t0, 3)
+        }
+
+
+def _watch_risk_rules():
+    while True:
+        time.sleep(RISK_RULES_POLL_SECONDS)
+        try:
+            ruleset, changed = reload_ruleset()
+        except Exception as e:
+            logger.warning("Risk rules not reloaded: %s", e)
+            continue
+        if changed:
+            _rescan_risks(ruleset)
+
+
+if not STORE.read_only:
+    # Rule file edited while the server was down -> bring risks up to date
+    if DOCUMENTS and RISKS_RULES_VERSION != current_ruleset()["version"]:
+        threading.Thread(
+            target=_rescan_risks, args=(current_ruleset(),), daemon=True
+        ).start()
+    if RISK_RULES_POLL_SECONDS > 0:
+        threading.Thread(target=_watch_risk_rules, daemon=True).start()
+
 # =====================================================
+# 📤 Upload & Index PDF (background job)
+# =====================================================
+def _reset_corpus():
+    """
+    Caller holds STATE_LOCK.
+    """
+    global DOC_COUNTER, CORPUS_GENERATION, RISKS_RULES_VERSION
+    global DOCUMENTS, DOCUMENT_RISKS
+
+    STORE.reset()
+    VECTOR_INDEX.reset()
+    ALL_CHUNKS.clear()
+    BM25_INDEX.reset()
+    DOCUMENTS = {}
+    DOCUMENT_RISKS = {}
+    RISKS_RULES_VERSION = None
+    RISK_AGG.reset()
+    ANSWER_CACHE.clear()
+    DOC_COUNTER = 0
+    CORPUS_GENERATION += 1
+
+
 @app.post("/extract_pdf_text/")
 async def extract_pdf_text(
     file: UploadFile = File(...),
     use_ocr: Optional[bool] = False,
     reset: bool = Query(False)
 ):
-    global VECTOR_INDEX, ALL_CHUNKS, DOC_COUNTER
-    global DOCUMENTS, DOCUMENT_RISKS, DD_SUMMARY_CACHE
+    global DOC_COUNTER
 
-    if reset:
-        VECTOR_INDEX = None
-        ALL_CHUNKS = []
-        DOCUMENTS = {}
-        DOCUMENT_RISKS = {}
-        DD_SUMMARY_CACHE = None
-        DOC_COUNTER = 0
+    if STORE.read_only:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "This worker is read-only; upload to the writer"}
+        )
 
-    DOC_COUNTER += 1
-    doc_id = DOC_COUNTER
-    doc_name = file.filename
+    # ✅ Spooled to disk in chunks (hashed on the way), never held whole
+    pdf_path, sha256, _ = await spool_upload(file)
 
-    contents = await file.read()
-    pages = []
-    ocr_used = False
+    with STATE_LOCK:
+        if reset:
+            _reset_corpus()
 
-    try:
-        reader = PyPDF2.PdfReader(BytesIO(contents))
-        for i, page in enumerate(reader.pages):
-            text = page.extract_text() or ""
-            if text.strip():
-                pages.append({"page": i + 1, "text": clean_text(text)})
-    except:
-        pass
-
-    if not pages or use_ocr:
-        images = convert_from_bytes(contents, dpi=300, poppler_path=POPPLER_PATH)
-        for i, image in enumerate(images):
-            text = pytesseract.image_to_string(image)
-            if text.strip():
-                pages.append({"page": i + 1, "text": clean_text(text)})
-                ocr_used = True
-
-    if not pages:
-        return {"error": "No readable text found"}
-
-    doc_profile = classify_document(doc_name, pages)
-
-    chunks = chunk_text(pages, doc_name)
-    for c in chunks:
-        c["doc_id"] = doc_id
-        c["doc_type"] = doc_profile["doc_type"]
+        DOC_COUNTER += 1
+        doc_id = DOC_COUNTER
+        generation = CORPUS_GENERATION
 
-    risks = detect_risks(chunks)
+    job = JOBS.submit(
+        doc_id, file.filename, pdf_path, bool(use_ocr),
+        sha256=sha256, generation=generation,
+    )
 
-    DOCUMENTS[doc_id] = {
+    return {
+        "status": "queued",
+        "job_id": job.job_id,
         "doc_id": doc_id,
-        "doc_name": doc_name,
-        "doc_type": doc_profile["doc_type"],
-        "classification_confidence": doc_profile["confidence"]
+        "doc_name": file.filename
     }
 
-    DOCUMENT_RISKS[doc_id] = risks
+# =====================================================
+# 📦 Bulk Ingestion (ZIP data room or many PDFs)
+# =====================================================
+BULK_MAX_FILES = int(os.getenv("BULK_MAX_FILES", "2000"))
+
 
-    ALL_CHUNKS.extend(chunks)
-    texts = [c["text"] for c in ALL_CHUNKS]
-    VECTOR_INDEX, _ = embed_chunks(texts)
+def _remove_spooled(paths: list):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+@app.post("/ingest/bulk")
+async def ingest_bulk(
+    files: List[UploadFile] = File(...),
+    use_ocr: Optional[bool] = False,
+    reset: bool = Query(False)
+):
+    """
+    Accepts ZIP archives and / or PDFs in one multipart request.
+    Documents are processed concurrently, embedded in one batched pass
+    and committed together; returns a per-file manifest once indexed.
+    """
+    global DOC_COUNTER
+
+    if STORE.read_only:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "This worker is read-only; upload to the writer"}
+        )
+
+    t0 = time.perf_counter()
+    pdfs, skipped = [], []   # pdfs: (name, spooled path, sha256)
+    try:
+        for upload in files:
+            path, sha256, _ = await spool_upload(upload)
+            if not await run_in_threadpool(is_zip, path):
+                pdfs.append((upload.filename, path, sha256))
+                continue
+            try:
+                members, bad = await run_in_threadpool(expand_zip, path)
+            except Exception as e:
+                skipped.append({"file": upload.filename, "reason": str(e)})
+                continue
+            finally:
+                os.remove(path)
+            pdfs.extend(members)
+            skipped.extend({"file": f"{upload.filename}/{name}", "reason": reason} for name, reason in bad)
+
+        if len(pdfs) > BULK_MAX_FILES:
+            raise ValueError(f"At most {BULK_MAX_FILES} documents per request")
+    except ValueError as e:
+        _remove_spooled([path for _, path, _ in pdfs])
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except BaseException:
+        _remove_spooled([path for _, path, _ in pdfs])
+        raise
+    spooled = time.perf_counter() - t0
+
+    with STATE_LOCK:
+        if reset:
+            _reset_corpus()
+        first_id = DOC_COUNTER + 1
+        DOC_COUNTER += len(pdfs)
+        generation = CORPUS_GENERATION
+
+    jobs = await run_in_threadpool(
+        JOBS.run_bulk,
+        [(first_id + i, name, path, sha256) for i, (name, path, sha256) in enumerate(pdfs)],
+        bool(use_ocr), _commit_documents,
+        generation=generation,
+    )
+
+    manifest = [job.to_dict() for job in jobs]
+    return {
+        "status": "done",
+        "documents": len(manifest),
+        "indexed": sum(1 for j in manifest if j["status"] == "done"),
+        "failed": sum(1 for j in manifest if j["status"] == "failed"),
+        "chunks": sum(j["progress"].get("chunks", 0) for j in manifest if j["status"] == "done"),
+        "spool_seconds": round(spooled, 3),
+        "seconds": round(time.perf_counter() - t0, 3),
+        "files": manifest,
+        "skipped": skipped
+    }
+
+# =====================================================
+# 🔄 Ingestion Job Status
+# =====================================================
+@app.get("/jobs/{job_id}")
+def job_status(job_id: str):
+    job = JOBS.get(job_id)
+    if not job:
+        return JSONResponse(status_code=404, content={"error": "Unknown job id"})
+    return job.to_dict()
+
+
+@app.get("/jobs")
+def list_jobs():
+    return {"jobs": JOBS.list_jobs()}
+
+# =====================================================
+# 🗄 Cache Stats
+# =====================================================
+@app.get("/cache/stats")
+def cache_stats():
+    return {
+        "document_cache": DOC_CACHE.stats(),
+        "query_embedding_cache": dict(QUERY_CACHE_STATS),
+        "answer_cache": ANSWER_CACHE.stats(),
+        "embedding": embedding_stats()
+    }
+
+# =====================================================
+# 📈 Metrics (Prometheus text format)
+# =====================================================
+def _cache_lookups() -> dict:
+    values = {}
+    for cache, stats in (
+        ("query_embedding", QUERY_CACHE_STATS),
+        ("answer", ANSWER_CACHE.stats()),
+        ("document", DOC_CACHE.stats()),
+    ):
+        for result in ("hits", "near_hits", "misses"):
+            if result in stats:
+                values[(cache, result)] = stats[result]
+    return values
+
+
+metrics.register_callback(
+    "counter", "dd_cache_lookups", "Cache lookups by cache and result",
+    ["cache", "result"], _cache_lookups
+)
+metrics.register_callback(
+    "gauge", "dd_index_vectors", "Vectors in the FAISS index", [],
+    lambda: {(): VECTOR_INDEX.ntotal}
+)
+metrics.register_callback(
+    "gauge", "dd_documents", "Indexed documents", [], lambda: {(): len(DOCUMENTS)}
+)
+metrics.register_callback(
+    "gauge", "dd_chunks", "Indexed chunks", [], lambda: {(): len(ALL_CHUNKS)}
+)
+
+
+@app.get("/metrics")
+def metrics_endpoint():
+    _sync_from_store()
+    body, content_type = metrics.render()
+    return Response(content=body, media_type=content_type)
+
+# =====================================================
+# ⚖ Risk Rules
+# =====================================================
+@app.get("/risk-rules")
+def risk_rules_info():
+    ruleset = current_ruleset()
+    return {
+        "rules_version": ruleset["version"],
+        "path": ruleset["path"],
+        "risk_rules": ruleset["risk_rules"],
+        "flag_rules": ruleset["flag_rules"],
+        "documents_rules_version": RISKS_RULES_VERSION
+    }
+
+
+@app.post("/risk-rules/reload")
+async def reload_risk_rules(force: bool = Query(False)):
+    """
+    Reloads the rule file (if its mtime changed, or `force`) and
+    re-runs ONLY risk detection over the stored chunks.
+    """
+    if STORE.read_only:
+        return JSONResponse(
+            status_code=503,
+            content={"error": "This worker is read-only; reload rules on the writer"}
+        )
+
+    try:
+        ruleset, changed = reload_ruleset(force)
+    except Exception as e:
+        return JSONResponse(status_code=400, content={"error": f"Invalid rule file: {e}"})
+
+    if not changed and (RISKS_RULES_VERSION == ruleset["version"] or not DOCUMENTS):
+        return {"status": "unchanged", "rules_version": ruleset["version"]}
 
-    return {"status": "indexed", "doc_name": doc_name}
+    return await run_in_threadpool(_rescan_risks, ruleset)
 
 # =====================================================
 # ❓ Ask Question
 # =====================================================
 class QuestionRequest(BaseModel):
     question: str
+    # "dense" = FAISS top-5 | "rerank" = FAISS over-fetch + cross-encoder
+    mode: Literal["dense", "rerank"] = "dense"
+    rerank_budget_ms: float = Field(RERANK_BUDGET_MS, ge=0)
+    candidates: int = Field(RERANK_CANDIDATES, ge=1, le=MAX_RERANK_CANDIDATES)
+    # Fuse FAISS with BM25 (exact clause numbers, party names, defined terms)
+    hybrid: bool = True
+    # 🎯 Optional scope (pre-filtered inside the index)
+    doc_ids: Optional[List[int]] = None
+    doc_names: Optional[List[str]] = None
+    doc_types: Optional[List[str]] = None
+    page_min: Optional[int] = None
+    page_max: Optional[int] = None
+    # 📡 Stream the answer as Server-Sent Events instead of one JSON body
+    stream: bool = False
+
+
+def _resolve_filters(payload) -> Optional[dict]:
+    """
+    Turns document / doc_type / page filters into index filters.
+    doc_names and doc_types are resolved to doc_ids (intersected).
+    """
+    doc_ids = None
+    if payload.doc_ids is not None:
+        doc_ids = set(payload.doc_ids)
+    if payload.doc_names is not None:
+        names = set(payload.doc_names)
+        matched = {d for d, meta in DOCUMENTS.items() if meta["doc_name"] in names}
+        doc_ids = matched if doc_ids is None else doc_ids & matched
+    if payload.doc_types is not None:
+        types = {t.upper() for t in payload.doc_types}
+        matched = {d for d, meta in DOCUMENTS.items() if meta["doc_type"] in types}
+        doc_ids = matched if doc_ids is None else doc_ids & matched
+
+    if doc_ids is None and payload.page_min is None and payload.page_max is None:
+        return None
+
+    return {
+        "doc_ids": sorted(doc_ids) if doc_ids is not None else None,
+        "page_min": payload.page_min,
+        "page_max": payload.page_max,
+    }
+
+
+def _retrieve(question: str, mode: str, budget_ms: float, candidates: int,
+              hybrid: bool = True, filters: Optional[dict] = None, top_k: int = 5):
+    """
+    Sync retrieval (run it in the threadpool – encoding and the
+    cross-encoder are CPU-bound).
+    """
+    bm25 = BM25_INDEX if hybrid else None
+
+    if mode == "rerank":
+        first_stage = search_chunks(
+            question, model, VECTOR_INDEX, ALL_CHUNKS, top_k=candidates,
+            bm25=bm25, filters=filters
+        )
+        with metrics.span("rerank"):
+            return rerank_within_budget(question, first_stage, top_k=top_k, budget_ms=budget_ms)
+
+    return search_chunks(
+        question, model, VECTOR_INDEX, ALL_CHUNKS, bm25=bm25, filters=filters
+    )[:top_k]
+
+
+def _cached_answer(question: str, sources: list, context: Optional[dict] = None) -> str:
+    """
+    generate_answer behind the semantic answer cache (sync: the
+    query embedding is an LRU hit, the LLM call blocks).
+    `context` receives {"cached": bool} plus, when the LLM ran, the
+    context packing numbers (tokens before / after, ratio).
+    """
+    if context is None:
+        context = {}
+    embedding = encode_queries([question], model)[0]
+    answer = ANSWER_CACHE.get(question, sources, embedding)
+    context["cached"] = answer is not None
+    if answer is not None:
+        return answer
+
+    answer = generate_answer(question, sources, context)
+    if answer != LLM_UNAVAILABLE_MESSAGE:
+        ANSWER_CACHE.put(question, sources, answer, embedding)
+    return answer
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+async def _sse_answer(question: str, sources: list):
+    """
+    event: sources -> where the answer comes from (sent immediately)
+    event: token   -> {"text": cleaned delta}, as Gemini produces it
+    event: done    -> {"cached": bool, "context": packing numbers}
+                      (or event: error mid-stream)
+    """
+    yield _sse("sources", [
+        {"doc_name": s["doc_name"], "page": s["page"], "chunk_id": s["chunk_id"]}
+        for s in sources
+    ])
+
+    # 🗄 Same question (or a near-duplicate) over the same context
+    embedding = (await run_in_threadpool(encode_queries, [question], model))[0]
+    cached = ANSWER_CACHE.get(question, sources, embedding)
+    if cached is not None:
+        yield _sse("token", {"text": cached})
+        yield _sse("done", {"cached": True})
+        return
+
+    parts = []
+    context = {}
+    deltas = stream_answer(question, sources, context)
+    try:
+        # ✅ Each blocking next() of the SDK stream runs in the threadpool
+        async for delta in iterate_in_threadpool(deltas):
+            parts.append(delta)
+            yield _sse("token", {"text": delta})
+    except Exception:
+        yield _sse("error", {"error": LLM_UNAVAILABLE_MESSAGE})
+        return
+    finally:
+        deltas.close()   # client gone mid-answer: stop the LLM stream now, not at GC
+
+    answer = "".join(parts)
+    if answer != LLM_UNAVAILABLE_MESSAGE:
+        ANSWER_CACHE.put(question, sources, answer, embedding)
+    yield _sse("done", {"cached": False, "context": context})
+
+
+def _retrieve_and_answer(payload: QuestionRequest, context: dict) -> str:
+    retrieved = _retrieve(
+        payload.question, payload.mode, payload.rerank_budget_ms,
+        payload.candidates, payload.hybrid, _resolve_filters(payload)
+    )
+    return _cached_answer(payload.question, retrieved[:5], context)
+
 
 @app.post("/ask")
-async def ask(payload: QuestionRequest):
-    retrieved = search_chunks(payload.question, model, VECTOR_INDEX, ALL_CHUNKS)
-    answer = generate_answer(payload.question, retrieved[:5])
-    return {"answer": answer}
+async def ask(payload: QuestionRequest, profile: bool = Query(False)):
+    """
+    "context" in the response: answer-cache hit or not, and how much
+    the retrieved chunks were packed (raw vs packed tokens).
+    ?profile=true (non-streaming only) adds a cProfile / pyinstrument
+    report of retrieval + answer generation to the response.
+    """
+    _sync_from_store()
+
+    context = {}
+    if profile and not payload.stream:
+        answer, report = await run_in_threadpool(
+            metrics.profile_call, _retrieve_and_answer, payload, context
+        )
+        return {"answer": answer, "context": context, "profile": report}
+
+    retrieved = await run_in_threadpool(
+        _retrieve, payload.question, payload.mode,
+        payload.rerank_budget_ms, payload.candidates, payload.hybrid,
+        _resolve_filters(payload)
+    )
+
+    if payload.stream:
+        return StreamingResponse(
+            _sse_answer(payload.question, retrieved[:5]),
+            media_type="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+    # ✅ Off the event loop (the Gemini call blocks for the whole answer)
+    answer = await run_in_threadpool(_cached_answer, payload.question, retrieved[:5], context)
+    return {"answer": answer, "context": context}
 
 # =====================================================
-# 📊 Due Diligence Summary
+# 📋 Ask a Checklist (batched)
 # =====================================================
-@app.get("/due-diligence/summary")
-def due_diligence_summary():
-    global DD_SUMMARY_CACHE
+class BatchQuestionRequest(BaseModel):
+    questions: List[str]
+    mode: Literal["dense", "rerank"] = "dense"
+    rerank_budget_ms: float = Field(RERANK_BUDGET_MS, ge=0)
+    candidates: int = Field(RERANK_CANDIDATES, ge=1, le=MAX_RERANK_CANDIDATES)
+    hybrid: bool = True
+    doc_ids: Optional[List[int]] = None
+    doc_names: Optional[List[str]] = None
+    doc_types: Optional[List[str]] = None
+    page_min: Optional[int] = None
+    page_max: Optional[int] = None
+
+# Max Gemini calls in flight for one batch request
+BATCH_LLM_CONCURRENCY = 8
+
+@app.post("/ask/batch")
+async def ask_batch(payload: BatchQuestionRequest):
+    _sync_from_store()
+
+    # ✅ One encode pass + one FAISS search for the whole checklist
+    top_k = payload.candidates if payload.mode == "rerank" else 5
+    retrieved = await run_in_threadpool(
+        search_chunks_batch, payload.questions, model, VECTOR_INDEX, ALL_CHUNKS, top_k,
+        BM25_INDEX if payload.hybrid else None, _resolve_filters(payload)
+    )
 
-    if not DOCUMENTS:
-        return {"status": "empty", "documents": {}}
+    semaphore = asyncio.Semaphore(BATCH_LLM_CONCURRENCY)
 
-    aggregated = aggregate_risks(DOCUMENT_RISKS, DOCUMENTS)
+    async def _answer(question, sources):
+        async with semaphore:
+            if payload.mode == "rerank":
+                sources = await run_in_threadpool(
+                    rerank_within_budget, question, sources, 5, payload.rerank_budget_ms
+                )
+            return await run_in_threadpool(_cached_answer, question, sources[:5])
 
-    # ✅ ALWAYS refresh cache here
-    DD_SUMMARY_CACHE = {
-        "documents": aggregated["documents"],
-        "heat_map": aggregated["heat_map"]
-    }
+    answers = await asyncio.gather(*[
+        _answer(q, r) for q, r in zip(payload.questions, retrieved)
+    ])
 
     return {
-        "status": "success",
-        "documents": aggregated["documents"],
-        "heat_map": aggregated["heat_map"]
+        "answers": [
+            {"question": q, "answer": a}
+            for q, a in zip(payload.questions, answers)
+        ]
     }
 
+# =====================================================
+# 📊 Due Diligence Summary
+# =====================================================
+def _etag_matches(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    tags = {t.strip() for t in header.split(",")}
+    return "*" in tags or etag in tags or etag.removeprefix("W/") in tags
+
+
+@app.get("/due-diligence/summary")
+def due_diligence_summary(request: Request, include_heat_map: bool = True):
+    _sync_from_store()
+
+    # ✅ Unchanged corpus -> 304 before touching any aggregate
+    etag = RISK_AGG.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    if not len(RISK_AGG):
+        return JSONResponse({"status": "empty", "documents": {}}, headers=headers)
+
+    # heat map can be large -> clients may page it via /due-diligence/heatmap
+    etag, body = RISK_AGG.summary_json(include_heat_map)
+    headers["ETag"] = etag
+    return Response(content=body, media_type="application/json", headers=headers)
+
+# =====================================================
+# 🗺 Heat Map (paginated)
+# =====================================================
+@app.get("/due-diligence/heatmap")
+def due_diligence_heatmap(
+    request: Request,
+    limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    sort: str = DEFAULT_SORT,
+    order: str = "asc",
+    severity: Optional[List[str]] = Query(None),
+    doc_type: Optional[List[str]] = Query(None),
+    risk_type: Optional[List[str]] = Query(None),
+    document: Optional[List[str]] = Query(None)
+):
+    """
+    Keyset-paginated heat map: pass `next_cursor` back as `cursor`.
+    Filters repeat (?severity=High&severity=Medium) and are AND-ed.
+    """
+    _sync_from_store()
+
+    etag = RISK_AGG.etag
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        page = RISK_AGG.heat_index.page(
+            limit=limit, cursor=cursor, sort=sort, order=order,
+            filters={
+                "severity": severity,
+                "doc_type": [t.upper() for t in doc_type] if doc_type else None,
+                "risk_type": risk_type,
+                "document": document,
+            }
+        )
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    return JSONResponse({"status": "success", **page}, headers=headers)
+
 # =====================================================
 # 📄 Download DD Report (FIXED)
 # =====================================================
-@app.get("/due-diligence/report")
-def download_dd_report():
-    global DD_SUMMARY_CACHE
-
-    # 🔥 SAFETY NET: auto-generate if cache missing
-    if not DD_SUMMARY_CACHE:
-        if not DOCUMENTS:
-            return JSONResponse(
-                status_code=400,
-                content={"error": "No documents uploaded"}
-            )
-
-        aggregated = aggregate_risks(DOCUMENT_RISKS, DOCUMENTS)
-        DD_SUMMARY_CACHE = {
-            "documents": aggregated["documents"],
-            "heat_map": aggregated["heat_map"]
-        }
+REPORT_FILENAME = "Due_Diligence_Report.docx"
+DOCX_MEDIA_TYPE = "application/vnd.openxmlformats-officedocument.wordprocessingml.document"
 
-    output_file = "Due_Diligence_Report.docx"
-    generate_dd_report(DD_SUMMARY_CACHE, output_file)
+# Rendered in memory once per aggregation version (the summary ETag);
+# concurrent downloads share it instead of racing on a file
+_REPORT_LOCK = threading.Lock()
+_REPORT_CACHE = {"etag": None, "body": None}
 
-    return FileResponse(
-        path=output_file,
-        media_type="application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-        filename=output_file
-    )
+
+def _report_bytes() -> tuple:
+    with _REPORT_LOCK:
+        # etag read BEFORE the snapshot: at worst newer content under an
+        # older tag, which is never requested again
+        etag = RISK_AGG.etag
+        if _REPORT_CACHE["etag"] != etag:
+            _REPORT_CACHE["body"] = render_dd_report(RISK_AGG.snapshot())
+            _REPORT_CACHE["etag"] = etag
+        return _REPORT_CACHE["etag"], _REPORT_CACHE["body"]
+
+
+@app.get("/due-diligence/report")
+def download_dd_report(request: Request):
+    _sync_from_store()
+
+    if not len(RISK_AGG):
+        return JSONResponse(
+            status_code=400,
+            content={"error": "No documents uploaded"}
+        )
+
+    etag = RISK_AGG.etag
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "no-cache",
+        "Content-Disposition": f'attachment; filename="{REPORT_FILENAME}"'
+    }
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+
+    etag, body = _report_bytes()
+    headers["ETag"] = etag
+    return Response(content=body, media_type=DOCX_MEDIA_TYPE, headers=headers)
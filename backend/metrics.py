@@ -0,0 +1,262 @@
+# metrics.py
+# -------------------------------------------------
+# Stage latency histograms + counters for /metrics
+# (prometheus_client when installed, else a minimal built-in
+# registry writing the same text exposition format)
+# -------------------------------------------------
+
+import cProfile
+import io
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import prometheus_client
+    from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+except ImportError:
+    prometheus_client = None
+
+try:
+    from pyinstrument import Profiler   # optional: nicer call trees than cProfile
+except ImportError:
+    Profiler = None
+
+# 1 ms .. 2 min: a FAISS lookup and a 500-page OCR share one histogram
+STAGE_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+    1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0
+)
+
+PROFILE_TOP_FUNCTIONS = 40
+
+
+# =====================================================
+# 🪶 Built-in fallback (same API subset as prometheus_client)
+# =====================================================
+def _labels_text(names, values, extra: str = "") -> str:
+    pairs = [f'{n}="{v}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children = {}
+        if not self.labelnames:
+            self.labels()   # exported as 0 before the first event
+        _REGISTRY.append(self)
+
+    def labels(self, *values):
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, self._new_child())
+        return child
+
+    def _header(self) -> list:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1):
+        self.value += amount   # GIL-atomic enough for a counter
+
+
+class _Counter(_Metric):
+    kind = "counter"
+    _new_child = _CounterChild
+
+    def inc(self, amount: float = 1):
+        self.labels().inc(amount)
+
+    def render(self) -> list:
+        lines = self._header()
+        for values, child in list(self._children.items()):
+            lines.append(f"{self.name}_total{_labels_text(self.labelnames, values)} {child.value}")
+        return lines
+
+
+class _HistogramChild:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self.count += 1
+            self.sum += value
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+
+
+class _Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=STAGE_BUCKETS):
+        self.buckets = tuple(buckets)
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self.labels().observe(value)
+
+    def render(self) -> list:
+        lines = self._header()
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, count, total = list(child.counts), child.count, child.sum
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = _labels_text(self.labelnames, values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _labels_text(self.labelnames, values, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            lines.append(f"{self.name}_sum{_labels_text(self.labelnames, values)} {total}")
+            lines.append(f"{self.name}_count{_labels_text(self.labelnames, values)} {count}")
+        return lines
+
+
+class _Callback:
+    """
+    Value(s) read at scrape time: fn() -> {label values tuple: value}.
+    """
+
+    def __init__(self, kind, name, documentation, labelnames, fn):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.fn = fn
+
+    def render(self) -> list:
+        suffix = "_total" if self.kind == "counter" else ""
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, value in self.fn().items():
+            lines.append(f"{self.name}{suffix}{_labels_text(self.labelnames, values)} {value}")
+        return lines
+
+
+_REGISTRY = []
+
+
+# =====================================================
+# 📈 Metrics
+# =====================================================
+if prometheus_client is not None:
+    STAGE_SECONDS = prometheus_client.Histogram(
+        "dd_stage_seconds", "Wall time of one pipeline stage", ["stage"], buckets=STAGE_BUCKETS
+    )
+    REQUEST_SECONDS = prometheus_client.Histogram(
+        "dd_request_seconds", "HTTP request latency", ["method", "route"], buckets=STAGE_BUCKETS
+    )
+    OCR_PAGES = prometheus_client.Counter("dd_ocr_pages", "Pages OCR'd")
+    CHUNKS_EMBEDDED = prometheus_client.Counter("dd_chunks_embedded", "Chunks embedded")
+else:
+    STAGE_SECONDS = _Histogram("dd_stage_seconds", "Wall time of one pipeline stage", ["stage"])
+    REQUEST_SECONDS = _Histogram("dd_request_seconds", "HTTP request latency", ["method", "route"])
+    OCR_PAGES = _Counter("dd_ocr_pages", "Pages OCR'd")
+    CHUNKS_EMBEDDED = _Counter("dd_chunks_embedded", "Chunks embedded")
+
+
+def register_callback(kind: str, name: str, documentation: str, labelnames, fn):
+    """
+    A counter / gauge computed at scrape time (index size, cache stats
+    already counted elsewhere) - nothing on the hot path.
+    `fn() -> {(label values...): value}`.
+    """
+    if prometheus_client is None:
+        _REGISTRY.append(_Callback(kind, name, documentation, labelnames, fn))
+        return
+
+    family = CounterMetricFamily if kind == "counter" else GaugeMetricFamily
+
+    class _Collector:
+        def describe(self):
+            # lets the registry check names without calling fn() at import
+            return [family(name, documentation, labels=list(labelnames))]
+
+        def collect(self):
+            metric = family(name, documentation, labels=list(labelnames))
+            for values, value in fn().items():
+                metric.add_metric([str(v) for v in values], value)
+            yield metric
+
+    prometheus_client.REGISTRY.register(_Collector())
+
+
+def observe(stage: str, seconds: float):
+    STAGE_SECONDS.labels(stage).observe(seconds)
+
+
+@contextmanager
+def span(stage: str):
+    """
+    with span("vector_search"): ...  -> one dd_stage_seconds sample
+    (recorded on errors too).
+    """
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - t0)
+
+
+def render() -> tuple:
+    """
+    (body bytes, content type) for GET /metrics.
+    """
+    if prometheus_client is not None:
+        return prometheus_client.generate_latest(), prometheus_client.CONTENT_TYPE_LATEST
+    lines = []
+    for metric in _REGISTRY:
+        lines.extend(metric.render())
+    return ("\n".join(lines) + "\n").encode("utf-8"), "text/plain; version=0.0.4; charset=utf-8"
+
+
+# =====================================================
+# 🔬 Opt-in per-request profile
+# =====================================================
+def profile_call(fn, *args, **kwargs) -> tuple:
+    """
+    Runs fn in THIS thread under pyinstrument (if installed) or
+    cProfile. Returns (result, text report).
+    """
+    if Profiler is not None:
+        profiler = Profiler()
+        profiler.start()
+        try:
+            result = fn(*args, **kwargs)
+        finally:
+            profiler.stop()
+        return result, profiler.output_text(unicode=False, color=False)
+
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        result = fn(*args, **kwargs)
+    finally:
+        profiler.disable()
+    out = io.StringIO()
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+    return result, out.getvalue()
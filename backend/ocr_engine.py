@@ -0,0 +1,147 @@
+# ocr_engine.py
+# -------------------------------------------------
+# Parallel, page-level OCR with streaming rasterization
+# -------------------------------------------------
+
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from typing import Iterable, Iterator, Optional
+
+import pytesseract
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+from text_cleaner import clean_text
+import metrics
+
+# Empty POPPLER_PATH -> find pdftoppm / pdfinfo on PATH (Linux, macOS)
+POPPLER_PATH = os.getenv(
+    "POPPLER_PATH", r"C:\Users\narik\Downloads\Release-25.12.0-0\poppler-25.12.0\Library\bin"
+) or None
+
+OCR_DPI = 300
+OCR_BATCH_SIZE = 4          # pages rasterized per task
+OCR_MAX_WORKERS = os.cpu_count() or 1
+
+# Pool workers (OCR here, parse / chunk / risks in ingestion_jobs) start
+# from a clean interpreter: forking a process that already holds torch /
+# OpenMP threads can deadlock the child. spawn where forkserver is missing.
+POOL_START_METHOD = os.getenv("POOL_START_METHOD") or (
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+MP_CONTEXT = multiprocessing.get_context(POOL_START_METHOD)
+
+_POOL = None
+
+
+def _init_worker():
+    # One Tesseract thread per process – the pool already uses every core
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    if _POOL is None:
+        _POOL = ProcessPoolExecutor(
+            max_workers=OCR_MAX_WORKERS, mp_context=MP_CONTEXT, initializer=_init_worker
+        )
+    return _POOL
+
+
+def _ocr_page_range(pdf_path: str, first: int, last: int, dpi: int) -> tuple:
+    """
+    Worker: rasterizes ONLY pages first..last and OCRs them.
+    Images never leave the worker process.
+    Returns (pages, poppler seconds, tesseract seconds).
+    """
+    t0 = time.perf_counter()
+    images = convert_from_path(
+        pdf_path, dpi=dpi, first_page=first, last_page=last,
+        poppler_path=POPPLER_PATH
+    )
+    rasterize_s = time.perf_counter() - t0
+
+    results = []
+    t0 = time.perf_counter()
+    for offset, image in enumerate(images):
+        text = pytesseract.image_to_string(image)
+        image.close()
+        results.append({"page": first + offset, "text": clean_text(text)})
+
+    return results, rasterize_s, time.perf_counter() - t0
+
+
+def _batches(page_numbers: list, batch_size: int) -> Iterator[tuple]:
+    """
+    Groups sorted page numbers into contiguous (first, last) runs
+    no longer than batch_size.
+    """
+    start = prev = None
+    for p in page_numbers:
+        if start is None:
+            start = prev = p
+        elif p == prev + 1 and p - start < batch_size:
+            prev = p
+        else:
+            yield start, prev
+            start = prev = p
+    if start is not None:
+        yield start, prev
+
+
+def count_pages(pdf_path: str) -> int:
+    return int(pdfinfo_from_path(pdf_path, poppler_path=POPPLER_PATH)["Pages"])
+
+
+def ocr_pages(
+    pdf_path: str,
+    page_numbers: Optional[Iterable[int]] = None,
+    dpi: int = OCR_DPI,
+    batch_size: int = OCR_BATCH_SIZE,
+) -> Iterator[dict]:
+    """
+    Yields {"page": n, "text": "..."} as soon as each batch finishes
+    (completion order, NOT page order). Pages with no text are yielded
+    with text == "" so callers can track progress.
+
+    At most 2 × workers batches are in flight, so peak memory is
+    bounded by the batch size rather than the page count.
+    """
+    if page_numbers is None:
+        page_numbers = range(1, count_pages(pdf_path) + 1)
+
+    pending_batches = _batches(sorted(set(page_numbers)), max(1, batch_size))
+    pool = _get_pool()
+    max_in_flight = 2 * OCR_MAX_WORKERS
+    in_flight = set()
+
+    def _fill():
+        for first, last in pending_batches:
+            in_flight.add(pool.submit(_ocr_page_range, pdf_path, first, last, dpi))
+            if len(in_flight) >= max_in_flight:
+                break
+
+    _fill()
+    try:
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                in_flight.discard(future)
+                pages, rasterize_s, tesseract_s = future.result()
+                # workers can't reach this process' registry: timed there, recorded here
+                metrics.observe("ocr_rasterize", rasterize_s)
+                metrics.observe("ocr_tesseract", tesseract_s)
+                metrics.OCR_PAGES.inc(len(pages))
+                yield from pages
+            _fill()
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def shutdown():
+    global _POOL
+    if _POOL is not None:
+        _POOL.shutdown(wait=False, cancel_futures=True)
+        _POOL = None
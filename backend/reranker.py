@@ -1,13 +1,40 @@
-from sentence_transformers import CrossEncoder
+import threading
+import time
+from collections import OrderedDict
+
+RERANK_MODEL_NAME = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+
+RERANK_BATCH_SIZE = 16
+RERANK_BUDGET_MS = 300          # default latency budget for stage 2
+RERANK_CANDIDATES = 50          # default first-stage over-fetch
+MAX_RERANK_CANDIDATES = 200     # request cap (each one is a cross-encoder pair)
+
+# (question, chunk uid, text hash) -> cross-encoder score
+RERANK_CACHE_SIZE = 50_000
+_SCORE_CACHE = OrderedDict()
+_SCORE_CACHE_LOCK = threading.Lock()
+
+# Loaded on the first rerank, so dense-only servers never load it
+_RERANKER = None
+_RERANKER_LOCK = threading.Lock()
+
+
+def get_reranker():
+    global _RERANKER
+    if _RERANKER is None:
+        with _RERANKER_LOCK:
+            if _RERANKER is None:
+                from sentence_transformers import CrossEncoder
+                _RERANKER = CrossEncoder(RERANK_MODEL_NAME)
+    return _RERANKER
 
-reranker = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
 
 def rerank_chunks(question: str, retrieved_chunks: list[dict], top_k: int = 3):
     """
     Cross-encoder reranking for precision
     """
     pairs = [(question, item["text"]) for item in retrieved_chunks]
-    scores = reranker.predict(pairs)
+    scores = get_reranker().predict(pairs)
 
     for item, score in zip(retrieved_chunks, scores):
         item["rerank_score"] = float(score)
@@ -19,3 +46,74 @@ def rerank_chunks(question: str, retrieved_chunks: list[dict], top_k: int = 3):
     )
 
     return reranked[:top_k]
+
+
+def _cache_key(question: str, item: dict) -> tuple:
+    return (
+        " ".join(question.lower().split()),
+        item.get("uid", item.get("chunk_id")),
+        hash(item["text"]),
+    )
+
+
+def rerank_within_budget(
+    question: str,
+    candidates: list[dict],
+    top_k: int = 5,
+    budget_ms: float = RERANK_BUDGET_MS,
+    batch_size: int = RERANK_BATCH_SIZE,
+):
+    """
+    Stage 2 of two-stage retrieval.
+
+    Scores `candidates` (first-stage order) with the cross-encoder in
+    batches until `budget_ms` would be exceeded (the first batch always
+    runs). Cached scores are free.
+    Scored chunks are ranked by rerank_score; any chunk the budget did
+    not reach keeps its first-stage position after them.
+    """
+    start = time.perf_counter()
+    scores = {}
+
+    with _SCORE_CACHE_LOCK:
+        for i, item in enumerate(candidates):
+            key = _cache_key(question, item)
+            if key in _SCORE_CACHE:
+                _SCORE_CACHE.move_to_end(key)
+                scores[i] = _SCORE_CACHE[key]
+
+    pending = [i for i in range(len(candidates)) if i not in scores]
+    last_batch_ms = 0.0
+
+    for b in range(0, len(pending), batch_size):
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        # Stop BEFORE a batch that would blow the budget
+        if b and elapsed_ms + last_batch_ms > budget_ms:
+            break
+
+        batch = pending[b:b + batch_size]
+        t0 = time.perf_counter()
+        batch_scores = get_reranker().predict(
+            [(question, candidates[i]["text"]) for i in batch],
+            batch_size=batch_size
+        )
+        last_batch_ms = (time.perf_counter() - t0) * 1000
+
+        with _SCORE_CACHE_LOCK:
+            for i, score in zip(batch, batch_scores):
+                scores[i] = float(score)
+                _SCORE_CACHE[_cache_key(question, candidates[i])] = scores[i]
+            while len(_SCORE_CACHE) > RERANK_CACHE_SIZE:
+                _SCORE_CACHE.popitem(last=False)
+
+    scored = sorted(scores, key=lambda i: scores[i], reverse=True)
+    unscored = [i for i in range(len(candidates)) if i not in scores]
+
+    reranked = []
+    for i in scored + unscored:
+        item = dict(candidates[i])
+        if i in scores:
+            item["rerank_score"] = round(scores[i], 4)
+        reranked.append(item)
+
+    return reranked[:top_k]
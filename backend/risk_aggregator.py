@@ -1,22 +1,11 @@
 # risk_aggregator.py
 
-# --------------------------------------------
-# Flag rules (simple keyword-based mapping)
-# --------------------------------------------
-FLAG_RULES = {
-    "Hidden liabilities": [
-        "penalty", "indemnity", "liquidated damages"
-    ],
-    "Pending litigation": [
-        "litigation", "dispute", "arbitration", "lawsuit"
-    ],
-    "IP risk": [
-        "intellectual property", "ip ownership", "license"
-    ],
-    "Ownership contradictions": [
-        "shareholding", "ownership", "control", "assignment"
-    ]
-}
+import json
+import threading
+import uuid
+
+from heatmap_index import HeatMapIndex
+from risk_detector import get_engine
 
 
 def derive_flags(risks: list) -> list:
@@ -24,6 +13,7 @@ def derive_flags(risks: list) -> list:
     Derives document-level flags from detected risks.
     Does NOT affect risk counts or severity.
     """
+    engine = get_engine()
     flags = set()
 
     for r in risks:
@@ -34,15 +24,79 @@ def derive_flags(risks: list) -> list:
         snippet = (r.get("snippet") or "").lower()
 
         combined_text = f"{risk_type} {snippet}"
-
-        for flag, keywords in FLAG_RULES.items():
-            for kw in keywords:
-                if kw in combined_text:
-                    flags.add(flag)
+        flags |= engine.flags_for(combined_text)
 
     return list(flags)
 
 
+def summarize_document(doc_meta: dict, risks: list) -> tuple:
+    """
+    One document's DD summary + its heat-map rows.
+    Returns (summary, heat_rows).
+    """
+
+    doc_name = doc_meta["doc_name"]
+    doc_type = doc_meta["doc_type"]
+
+    # Initialize summary (UNCHANGED KEYS)
+    summary = {
+        "doc_type": doc_type,
+        "overall_risk": "No Risk",
+        "risk_counts": {
+            "High": 0,
+            "Medium": 0,
+            "Low": 0
+        },
+        "total_risks": 0,
+        "flags": []   # ✅ NEW (optional, FE-safe)
+    }
+    heat_rows = []
+
+    # If no risks detected
+    if not risks:
+        return summary, heat_rows
+
+    for r in risks:
+        if not isinstance(r, dict):
+            continue
+
+        severity = r.get("severity", "Low")
+        if severity not in ["High", "Medium", "Low"]:
+            severity = "Low"
+
+        summary["risk_counts"][severity] += 1
+        summary["total_risks"] += 1
+
+        # Heat map entry (UNCHANGED)
+        heat_rows.append({
+            "document": doc_name,
+            "doc_type": doc_type,
+            "page": r.get("page"),
+            "severity": severity,
+            "risk_type": r.get("risk_type"),
+            "snippet": r.get("snippet")
+        })
+
+    # Determine overall risk (UNCHANGED)
+    if summary["risk_counts"]["High"] > 0:
+        summary["overall_risk"] = "High"
+    elif summary["risk_counts"]["Medium"] > 0:
+        summary["overall_risk"] = "Medium"
+    elif summary["risk_counts"]["Low"] > 0:
+        summary["overall_risk"] = "Low"
+
+    # ✅ Derive flags AFTER processing all risks
+    summary["flags"] = derive_flags(risks)
+
+    # --- Acquisition Risk Index calculation --
+    high = summary["risk_counts"]["High"]
+    medium = summary["risk_counts"]["Medium"]
+    low = summary["risk_counts"]["Low"]
+    summary["acquisition_risk_index"] = high * 3 + medium * 2 + low * 1
+
+    return summary, heat_rows
+
+
 def aggregate_risks(document_risks: dict, documents: dict) -> dict:
     """
     Aggregates detected risks into:
@@ -60,68 +114,128 @@ def aggregate_risks(document_risks: dict, documents: dict) -> dict:
         if not doc_meta:
             continue
 
-        doc_name = doc_meta["doc_name"]
-        doc_type = doc_meta["doc_type"]
-
-        # Initialize summary (UNCHANGED KEYS)
-        documents_summary[doc_name] = {
-            "doc_type": doc_type,
-            "overall_risk": "No Risk",
-            "risk_counts": {
-                "High": 0,
-                "Medium": 0,
-                "Low": 0
-            },
-            "total_risks": 0,
-            "flags": []   # ✅ NEW (optional, FE-safe)
-        }
-
-        # If no risks detected
-        if not risks:
-            continue
-
-        for r in risks:
-            if not isinstance(r, dict):
-                continue
-
-            severity = r.get("severity", "Low")
-            if severity not in ["High", "Medium", "Low"]:
-                severity = "Low"
-
-            documents_summary[doc_name]["risk_counts"][severity] += 1
-            documents_summary[doc_name]["total_risks"] += 1
-
-            # Heat map entry (UNCHANGED)
-            heat_map.append({
-                "document": doc_name,
-                "doc_type": doc_type,
-                "page": r.get("page"),
-                "severity": severity,
-                "risk_type": r.get("risk_type"),
-                "snippet": r.get("snippet")
-            })
-
-        # Determine overall risk (UNCHANGED)
-        if documents_summary[doc_name]["risk_counts"]["High"] > 0:
-            documents_summary[doc_name]["overall_risk"] = "High"
-        elif documents_summary[doc_name]["risk_counts"]["Medium"] > 0:
-            documents_summary[doc_name]["overall_risk"] = "Medium"
-        elif documents_summary[doc_name]["risk_counts"]["Low"] > 0:
-            documents_summary[doc_name]["overall_risk"] = "Low"
-
-        # ✅ Derive flags AFTER processing all risks
-        documents_summary[doc_name]["flags"] = derive_flags(risks)
-        
-        # --- Acquisition Risk Index calculation --
-        high = documents_summary[doc_name]["risk_counts"]["High"]
-        medium = documents_summary[doc_name]["risk_counts"]["Medium"]
-        low = documents_summary[doc_name]["risk_counts"]["Low"]
-        documents_summary[doc_name]["acquisition_risk_index"] = (
-        high * 3 + medium * 2 + low * 1
-)
-
+        summary, heat_rows = summarize_document(doc_meta, risks)
+        documents_summary[doc_meta["doc_name"]] = summary
+        heat_map.extend(heat_rows)
 
     return {
         "documents": documents_summary,
         "heat_map": heat_map
     }
+
+
+# =====================================================
+# ⚡ Incremental aggregation (updated per document)
+# =====================================================
+class RiskAggregator:
+    """
+    Running per-document summaries + an append-only heat map, so a
+    summary request never re-aggregates the corpus.
+
+    `version` bumps on every change; together with a per-process id it
+    is the summary ETag. The serialized summary is cached per version,
+    so unchanged polls cost nothing beyond the 304.
+
+    `heat_index` mirrors the heat map for paginated reads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._instance = uuid.uuid4().hex[:8]
+        self.version = 0
+        self.heat_index = HeatMapIndex()
+        self._clear()
+
+    def _clear(self):
+        self._summaries = {}      # doc_id -> (doc_name, summary)
+        self._rows = {}           # doc_id -> heat rows
+        self._heat_map = []       # append-only, doc_id order
+        self._heat_dirty = False  # a document was replaced -> rebuild once
+        self._last_doc_id = -1
+        self._bodies = {}         # include_heat_map -> (version, serialized summary)
+        self.heat_index.clear()
+
+    @property
+    def etag(self) -> str:
+        return f'W/"{self._instance}-{self.version}"'
+
+    def __len__(self) -> int:
+        return len(self._summaries)
+
+    # -------------------------------------------------
+    # ✍ Updates
+    # -------------------------------------------------
+    def add_document(self, doc_id: int, doc_meta: dict, risks: list):
+        """
+        Adds or replaces one document (a new upload appends its rows,
+        a re-scan replaces them).
+        """
+        summary, heat_rows = summarize_document(doc_meta, risks)
+        with self._lock:
+            if doc_id in self._rows or doc_id < self._last_doc_id:
+                self._heat_dirty = True   # not an append
+            else:
+                self._heat_map.extend(heat_rows)
+                self._last_doc_id = doc_id
+            self._summaries[doc_id] = (doc_meta["doc_name"], summary)
+            self._rows[doc_id] = heat_rows
+            self.heat_index.replace_document(doc_id, heat_rows)
+            self.version += 1
+
+    def rebuild(self, document_risks: dict, documents: dict):
+        with self._lock:
+            self._clear()
+        for doc_id in sorted(document_risks):
+            if doc_id in documents:
+                self.add_document(doc_id, documents[doc_id], document_risks[doc_id])
+        with self._lock:
+            self.version += 1
+
+    def reset(self):
+        with self._lock:
+            self._clear()
+            self.version += 1
+
+    # -------------------------------------------------
+    # 📖 Reads
+    # -------------------------------------------------
+    def _heat(self) -> list:
+        if self._heat_dirty:
+            self._heat_map = [row for d in sorted(self._rows) for row in self._rows[d]]
+            self._heat_dirty = False
+        return self._heat_map
+
+    def snapshot(self) -> dict:
+        """
+        Same shape as aggregate_risks().
+        """
+        with self._lock:
+            return {
+                "documents": {
+                    name: summary
+                    for _, (name, summary) in sorted(self._summaries.items())
+                },
+                "heat_map": list(self._heat())
+            }
+
+    def summary_json(self, include_heat_map: bool = True) -> tuple:
+        """
+        (etag, serialized summary response), serialized once per version.
+        Without the heat map the payload is O(documents), not O(risks).
+        """
+        with self._lock:
+            cached = self._bodies.get(include_heat_map)
+            if cached is None or cached[0] != self.version:
+                payload = {
+                    "status": "success",
+                    "documents": {
+                        name: summary
+                        for _, (name, summary) in sorted(self._summaries.items())
+                    }
+                }
+                if include_heat_map:
+                    payload["heat_map"] = self._heat()
+                cached = self._bodies[include_heat_map] = (
+                    self.version, json.dumps(payload).encode("utf-8")
+                )
+            return self.etag, cached[1]
@@ -1,8 +1,24 @@
 # risk_detector.py
 
-from risk_rules import RISK_RULES
+from risk_rules import current_ruleset
+from risk_matcher import RuleEngine, ScannedText
 import re
 
+# ✅ Compiled ONCE per rule-set version (worker processes receive the
+# rule set with each call, so a hot reload reaches them too)
+_ENGINES = {}
+_MAX_ENGINES = 4
+
+
+def get_engine(ruleset: dict = None) -> RuleEngine:
+    ruleset = ruleset or current_ruleset()
+    engine = _ENGINES.get(ruleset["version"])
+    if engine is None:
+        if len(_ENGINES) >= _MAX_ENGINES:
+            _ENGINES.clear()
+        engine = _ENGINES[ruleset["version"]] = RuleEngine(ruleset)
+    return engine
+
 def extract_clean_sentence(text: str, keyword: str) -> str:
     """
     Extracts a clean, complete sentence containing the keyword.
@@ -24,30 +40,38 @@ def extract_clean_sentence(text: str, keyword: str) -> str:
     return clean_text[:250].rsplit(" ", 1)[0]
 
 
-def detect_risks(chunks: list) -> list:
+def detect_risks(chunks: list, ruleset: dict = None) -> list:
     """
-    Detect risks from text chunks using keyword-based rules.
+    Detect risks from text chunks using the loaded rule set
+    (current_ruleset() unless `ruleset` is given).
     Returns structured risk objects (schema unchanged).
+
+    Each chunk is normalized and scanned ONCE; the snippet is the
+    sentence around the rule's first hit.
     """
 
+    engine = get_engine(ruleset)
     detected = []
 
     for chunk in chunks:
-        text = chunk["text"]
-
-        for rule in RISK_RULES:
-            for kw in rule["keywords"]:
-                if kw.lower() in text.lower():
-
-                    # 🔥 CLEAN SENTENCE EXTRACTION
-                    snippet = extract_clean_sentence(text, kw)
-
-                    detected.append({
-                        "risk_type": rule["risk_type"],
-                        "severity": rule["severity"],
-                        "page": chunk.get("page"),
-                        "snippet": snippet
-                    })
-                    break  # avoid duplicate risks per rule
+        scanned = ScannedText(chunk["text"])
+        hits = engine.matcher.offsets(scanned.lower)
+        if not hits and not engine.has_patterns:
+            continue
+
+        for rule in engine.rules:
+            offset = engine.match_rule(rule, scanned.lower, hits)
+            if offset is None:
+                continue
+
+            # 🔥 CLEAN SENTENCE EXTRACTION
+            snippet = scanned.sentence_at(offset)
+
+            detected.append({
+                "risk_type": rule.risk_type,
+                "severity": rule.severity,
+                "page": chunk.get("page"),
+                "snippet": snippet
+            })
 
     return detected
@@ -0,0 +1,265 @@
+# risk_matcher.py
+# -------------------------------------------------
+# Compiled multi-keyword matcher shared by risk detection
+# and flag derivation (one scan per text, all keywords)
+# -------------------------------------------------
+
+import re
+
+try:
+    import ahocorasick   # optional C accelerator (pyahocorasick)
+except ImportError:
+    ahocorasick = None
+
+
+def _trie_pattern(words: list) -> str:
+    """
+    Builds one regex from a character trie of `words`, e.g.
+    ["terminate", "termination"] -> "terminat(?:e|ion)".
+    Only one branch is tried per position, and at each position the
+    LONGEST keyword wins (optional groups are greedy).
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        ends_here = "" in node
+        branches = [
+            re.escape(ch) + build(child)
+            for ch, child in sorted(node.items()) if ch
+        ]
+        if not branches:
+            return ""
+        body = "|".join(branches)
+        if ends_here:
+            return f"(?:{body})?"
+        return body if len(branches) == 1 else f"(?:{body})"
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Finds every offset of every keyword in ONE pass over the text.
+
+    Uses an Aho-Corasick automaton when pyahocorasick is installed
+    (~2x faster), otherwise one compiled trie regex. The regex scan
+    resumes one character after each hit (not after the match), so
+    keywords overlapping or inside another keyword are still found;
+    keywords that are prefixes of the hit at the same offset are
+    credited from a precomputed table.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = sorted({k.lower() for k in keywords if k})
+        self._pattern = re.compile(_trie_pattern(self.keywords)) if self.keywords else None
+        self._prefixes = {
+            k: [p for p in self.keywords if p != k and k.startswith(p)]
+            for k in self.keywords
+        }
+
+        self._automaton = None
+        if ahocorasick is not None and self.keywords:
+            self._automaton = ahocorasick.Automaton()
+            for k in self.keywords:
+                self._automaton.add_word(k, (k, len(k) - 1))
+            self._automaton.make_automaton()
+
+    def offsets(self, text_lower: str) -> dict:
+        """
+        keyword -> ascending offsets of EVERY occurrence in `text_lower`.
+        """
+        found = {}
+        if self._pattern is None:
+            return found
+
+        if self._automaton is not None:
+            # same keyword => same length, so end order is start order
+            for end, (kw, span) in self._automaton.iter(text_lower):
+                found.setdefault(kw, []).append(end - span)
+            return found
+
+        search = self._pattern.search
+        m = search(text_lower)
+        while m is not None:
+            start = m.start()
+            found.setdefault(m.group(), []).append(start)
+            for prefix in self._prefixes[m.group()]:
+                found.setdefault(prefix, []).append(start)
+            m = search(text_lower, start + 1)
+
+        return found
+
+
+class ScannedText:
+    """
+    A chunk normalized once (whitespace collapsed, like
+    risk_detector.extract_clean_sentence). Sentence boundaries are
+    located on demand around a match instead of splitting everything.
+    """
+    __slots__ = ("text", "lower")
+
+    def __init__(self, text: str):
+        # Chunks from clean_text are usually normalized already; the only
+        # printable whitespace is " ", so this check is exact and cheap.
+        if text.isprintable() and "  " not in text and text == text.strip():
+            self.text = text
+        else:
+            self.text = " ".join(text.split())
+        self.lower = self.text.lower()
+
+    def sentence_at(self, offset: int) -> str:
+        text = self.text
+        # After normalization a sentence break is always "<.!?> "
+        start = max(text.rfind(p, 0, offset) for p in (". ", "! ", "? "))
+        start = 0 if start == -1 else start + 2
+
+        ends = [e for e in (text.find(p, offset) for p in (". ", "! ", "? ")) if e != -1]
+        end = min(ends) + 1 if ends else len(text)
+
+        return text[start:end].strip()
+
+
+# =====================================================
+# ⚖ Rule engine (word boundaries, negation, proximity)
+# =====================================================
+_WORD_RE = re.compile(r"[a-z0-9']+")
+_SENTENCE_BREAKS = (". ", "! ", "? ")
+
+
+def _keyword(spec: str) -> tuple:
+    """
+    "indemnif*" -> ("indemnif", True); "exit" -> ("exit", False)
+    """
+    spec = " ".join(spec.lower().split())
+    if spec.endswith("*"):
+        return spec[:-1], True
+    return spec, False
+
+
+def _is_word(text: str, start: int, end: int, prefix: bool) -> bool:
+    if start > 0 and text[start - 1].isalnum():
+        return False
+    return prefix or end >= len(text) or not text[end].isalnum()
+
+
+class _Rule:
+    __slots__ = ("risk_type", "severity", "keywords", "patterns", "near",
+                 "negations", "negation_window")
+
+    def __init__(self, rule: dict):
+        self.risk_type = rule["risk_type"]
+        self.severity = rule["severity"]
+        self.keywords = [_keyword(k) for k in rule.get("keywords", []) if k.strip("* ")]
+        self.patterns = [re.compile(p) for p in rule.get("patterns", [])]
+        self.near = [
+            ([_keyword(t) for t in spec["terms"]], int(spec["within"]))
+            for spec in rule.get("near", [])
+        ]
+        self.negations = [" ".join(_WORD_RE.findall(n.lower())) for n in rule.get("negations", [])]
+        self.negation_window = int(rule.get("negation_window", 4))
+
+
+class RuleEngine:
+    """
+    A rule set compiled ONCE: every keyword / proximity term / flag
+    keyword goes into one KeywordMatcher, so a text is scanned once and
+    rules only post-filter the hits (word boundary, negation, distance).
+    """
+
+    def __init__(self, ruleset: dict):
+        self.version = ruleset["version"]
+        self.rules = [_Rule(r) for r in ruleset["risk_rules"]]
+        self.flags = {
+            flag: [_keyword(k) for k in keywords]
+            for flag, keywords in ruleset.get("flag_rules", {}).items()
+        }
+
+        terms = set()
+        for rule in self.rules:
+            terms.update(kw for kw, _ in rule.keywords)
+            for near_terms, _ in rule.near:
+                terms.update(kw for kw, _ in near_terms)
+        for keywords in self.flags.values():
+            terms.update(kw for kw, _ in keywords)
+        self.matcher = KeywordMatcher(terms)
+        self.has_patterns = any(rule.patterns for rule in self.rules)
+
+    # -------------------------------------------------
+    # 🔎 Hit filters
+    # -------------------------------------------------
+    def _word_hits(self, text: str, hits: dict, keyword: tuple) -> list:
+        kw, prefix = keyword
+        return [
+            s for s in hits.get(kw, ())
+            if _is_word(text, s, s + len(kw), prefix)
+        ]
+
+    @staticmethod
+    def _negated(rule: _Rule, text: str, start: int) -> bool:
+        if not rule.negations:
+            return False
+        window = text[max(0, start - 20 * rule.negation_window):start]
+        # never look back across a sentence break
+        cut = max(window.rfind(p) for p in _SENTENCE_BREAKS)
+        if cut != -1:
+            window = window[cut + 2:]
+        words = " " + " ".join(_WORD_RE.findall(window)[-rule.negation_window:]) + " "
+        return any(f" {n} " in words for n in rule.negations)
+
+    def _near_hit(self, text: str, hits: dict, terms: list, within: int):
+        """
+        Offset of the first occurrence of terms[0] that has every other
+        term within `within` words, else None.
+        """
+        positions = [self._word_hits(text, hits, t) for t in terms]
+        if not all(positions):
+            return None
+
+        word_at = lambda offset: text.count(" ", 0, offset)   # noqa: E731
+        others = [[word_at(s) for s in p] for p in positions[1:]]
+
+        for start in positions[0]:
+            w = word_at(start)
+            if all(any(abs(o - w) <= within for o in other) for other in others):
+                return start
+        return None
+
+    def match_rule(self, rule: _Rule, text: str, hits: dict):
+        """
+        Offset of the rule's first hit in `text` (lower-cased,
+        normalized), checking keywords in order, then patterns,
+        then proximity terms. None if the rule does not fire.
+        """
+        for keyword in rule.keywords:
+            for start in self._word_hits(text, hits, keyword):
+                if not self._negated(rule, text, start):
+                    return start
+
+        for pattern in rule.patterns:
+            for m in pattern.finditer(text):
+                if not self._negated(rule, text, m.start()):
+                    return m.start()
+
+        for terms, within in rule.near:
+            start = self._near_hit(text, hits, terms, within)
+            if start is not None and not self._negated(rule, text, start):
+                return start
+
+        return None
+
+    # -------------------------------------------------
+    # 🚩 Flags
+    # -------------------------------------------------
+    def flags_for(self, text_lower: str) -> set:
+        hits = self.matcher.offsets(text_lower)
+        if not hits:
+            return set()
+        return {
+            flag for flag, keywords in self.flags.items()
+            if any(self._word_hits(text_lower, hits, k) for k in keywords)
+        }
@@ -1,24 +1,124 @@
 # risk_rules.py
+# -------------------------------------------------
+# Versioned risk / flag rule set, loaded from a file
+# (RISK_RULES_PATH, JSON or YAML) and hot-reloadable
+# -------------------------------------------------
+#
+# Risk rule fields:
+#   risk_type, severity    copied onto every detected risk
+#   keywords               whole-word phrases; "indemnif*" = prefix
+#   patterns               raw regexes (matched on lower-cased text)
+#   near                   [{"terms": [...], "within": N}] -> every term
+#                          within N words of the first one
+#   negations              phrases that cancel a hit when they appear
+#   negation_window        ... in the N words before it (default 4)
+#
+# Flag rules: {flag: [keywords]} with the same keyword syntax.
 
-RISK_RULES = [
-    {
-        "risk_type": "Termination",
-        "severity": "High",
-        "keywords": ["terminate", "termination", "exit"],
-    },
-    {
-        "risk_type": "Penalty",
-        "severity": "Medium",
-        "keywords": ["penalty", "liquidated damages", "fine"],
-    },
-    {
-        "risk_type": "Indemnity",
-        "severity": "High",
-        "keywords": ["indemnify", "indemnification"],
-    },
-    {
-        "risk_type": "Governing Law",
-        "severity": "Low",
-        "keywords": ["governing law", "jurisdiction"],
-    },
-]
+import hashlib
+import json
+import os
+import re
+import threading
+
+try:
+    import yaml   # optional: only needed for .yaml / .yml rule files
+except ImportError:
+    yaml = None
+
+RULES_PATH = os.getenv(
+    "RISK_RULES_PATH", os.path.join(os.path.dirname(__file__), "risk_rules.json")
+)
+
+_SEVERITIES = ("High", "Medium", "Low")
+
+
+def _parse(raw: bytes, path: str) -> dict:
+    if path.endswith((".yaml", ".yml")):
+        if yaml is None:
+            raise RuntimeError("PyYAML is required for YAML rule files")
+        return yaml.safe_load(raw) or {}
+    return json.loads(raw)
+
+
+def _validate(data: dict) -> dict:
+    risk_rules = data.get("risk_rules")
+    if not isinstance(risk_rules, list):
+        raise ValueError("risk_rules must be a list")
+
+    for rule in risk_rules:
+        if not rule.get("risk_type"):
+            raise ValueError("every risk rule needs a risk_type")
+        if rule.get("severity") not in _SEVERITIES:
+            raise ValueError(f"{rule['risk_type']}: severity must be one of {_SEVERITIES}")
+        if not (rule.get("keywords") or rule.get("patterns") or rule.get("near")):
+            raise ValueError(f"{rule['risk_type']}: needs keywords, patterns or near")
+        for pattern in rule.get("patterns", []):
+            re.compile(pattern)   # fail on load, not on the first chunk
+        for spec in rule.get("near", []):
+            if len(spec.get("terms", [])) < 2 or int(spec.get("within", 0)) < 1:
+                raise ValueError(f"{rule['risk_type']}: near needs 2+ terms and within >= 1")
+
+    flag_rules = data.get("flag_rules", {})
+    if not isinstance(flag_rules, dict):
+        raise ValueError("flag_rules must be a mapping")
+
+    return {"risk_rules": risk_rules, "flag_rules": flag_rules}
+
+
+def load_ruleset(path: str = RULES_PATH) -> dict:
+    """
+    Reads and validates a rule file.
+    version = hash of the canonical rules, so formatting-only edits
+    keep the same version (and do not trigger a re-scan).
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    rules = _validate(_parse(raw, path))
+    version = hashlib.sha256(
+        json.dumps(rules, sort_keys=True).encode("utf-8")
+    ).hexdigest()[:16]
+
+    return {
+        **rules,
+        "version": version,
+        "path": path,
+        "mtime": os.stat(path).st_mtime_ns,
+    }
+
+
+# =====================================================
+# 🔄 Current rule set (hot-reloadable)
+# =====================================================
+_LOCK = threading.Lock()
+RULESET = load_ruleset()
+
+# Kept for existing importers; prefer current_ruleset() (reload-safe)
+RISK_RULES = RULESET["risk_rules"]
+FLAG_RULES = RULESET["flag_rules"]
+RULESET_VERSION = RULESET["version"]
+
+
+def current_ruleset() -> dict:
+    return RULESET
+
+
+def reload_ruleset(force: bool = False) -> tuple:
+    """
+    Re-reads the rule file if its mtime changed (or `force`).
+    Returns (ruleset, changed) where changed means a NEW version.
+    An invalid file raises and leaves the current rules in place.
+    """
+    global RULESET, RISK_RULES, FLAG_RULES, RULESET_VERSION
+
+    with _LOCK:
+        if not force and os.stat(RULESET["path"]).st_mtime_ns == RULESET["mtime"]:
+            return RULESET, False
+
+        ruleset = load_ruleset(RULESET["path"])
+        changed = ruleset["version"] != RULESET["version"]
+        RULESET = ruleset
+        RISK_RULES = ruleset["risk_rules"]
+        FLAG_RULES = ruleset["flag_rules"]
+        RULESET_VERSION = ruleset["version"]
+        return ruleset, changed
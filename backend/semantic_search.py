@@ -1,19 +1,71 @@
+import threading
+from collections import OrderedDict
+
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
-def search_chunks(query, model, index, chunks, top_k=5):
-    query_embedding = model.encode([query], convert_to_numpy=True)
+from metrics import span
+
+# =====================================================
+# 🧠 Query embedding cache (LRU)
+# =====================================================
+# Checklists re-send the same standard questions for every deal.
+# MiniLM is uncased, so case / whitespace normalization is lossless.
+QUERY_CACHE_SIZE = 2048
+
+_QUERY_CACHE = OrderedDict()
+_QUERY_CACHE_LOCK = threading.Lock()
+QUERY_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def _normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+def encode_queries(queries: list, model) -> np.ndarray:
+    """
+    Returns one embedding row per query. Cached queries are served
+    from the LRU; all misses are encoded in a SINGLE forward pass.
+    """
+    keys = [_normalize_query(q) for q in queries]
+    rows = [None] * len(keys)
+    missing = {}
+
+    with _QUERY_CACHE_LOCK:
+        for i, key in enumerate(keys):
+            if key in _QUERY_CACHE:
+                _QUERY_CACHE.move_to_end(key)
+                rows[i] = _QUERY_CACHE[key]
+                QUERY_CACHE_STATS["hits"] += 1
+            else:
+                missing.setdefault(key, []).append(i)
+                QUERY_CACHE_STATS["misses"] += 1
+
+    if missing:
+        texts = list(missing)
+        with span("query_encode"):
+            embeddings = model.encode(texts, convert_to_numpy=True).astype("float32", copy=False)
+
+        with _QUERY_CACHE_LOCK:
+            for key, emb in zip(texts, embeddings):
+                _QUERY_CACHE[key] = emb
+                _QUERY_CACHE.move_to_end(key)
+                for i in missing[key]:
+                    rows[i] = emb
+            while len(_QUERY_CACHE) > QUERY_CACHE_SIZE:
+                _QUERY_CACHE.popitem(last=False)
+
+    return np.vstack(rows)
 
-    distances, indices = index.search(query_embedding, top_k)
 
+def _build_results(distances, indices, chunks):
     results = []
     max_score = None
 
-    for rank, idx in enumerate(indices[0]):
+    for rank, idx in enumerate(indices):
         if idx == -1:
             continue
 
-        score = 1 - distances[0][rank]  # ✅ convert L2 → similarity
+        score = 1 - distances[rank]  # ✅ convert L2 → similarity
 
         if max_score is None:
             max_score = score
@@ -22,6 +74,8 @@ def search_chunks(query, model, index, chunks, top_k=5):
 
         results.append({
             "rank": rank + 1,
+            "uid": int(idx),
+            "doc_id": chunk.get("doc_id"),
             "chunk_id": chunk["chunk_id"],
             "doc_name": chunk["doc_name"],
             "page": chunk["page"],
@@ -31,3 +85,110 @@ def search_chunks(query, model, index, chunks, top_k=5):
         })
 
     return results
+
+
+# =====================================================
+# 🔀 Hybrid (dense + BM25) with reciprocal rank fusion
+# =====================================================
+RRF_K = 60
+HYBRID_OVERFETCH = 4   # each retriever returns top_k * this before fusion
+
+
+def fuse_rrf(ranked_lists: list, k: int = RRF_K) -> list:
+    """
+    Reciprocal rank fusion: score(uid) = sum 1 / (k + rank).
+    Returns [(uid, rrf_score), ...] best first.
+    """
+    fused = {}
+    for ranked in ranked_lists:
+        for rank, uid in enumerate(ranked):
+            fused[uid] = fused.get(uid, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
+
+
+def _hybrid_results(query, distances, indices, chunks, bm25, top_k, allowed=None):
+    dense = [int(i) for i in indices if i != -1]
+    dense_scores = {int(i): float(d) for d, i in zip(distances, indices) if i != -1}
+    with span("bm25_search"):
+        sparse = bm25.search(query, top_k * HYBRID_OVERFETCH, allowed=allowed)
+    sparse_scores = dict(sparse)
+
+    results = []
+    for rank, (uid, rrf) in enumerate(fuse_rrf([dense, [u for u, _ in sparse]])[:top_k]):
+        chunk = chunks[uid]
+        # Dense similarity is only known for chunks the dense side returned
+        score = 1 - dense_scores[uid] if uid in dense_scores else 0.0
+
+        results.append({
+            "rank": rank + 1,
+            "uid": uid,
+            "doc_id": chunk.get("doc_id"),
+            "chunk_id": chunk["chunk_id"],
+            "doc_name": chunk["doc_name"],
+            "page": chunk["page"],
+            "text": chunk["text"],
+            "score": round(score, 3),
+            "confidence_pct": round(score * 100, 1),
+            "bm25_score": round(sparse_scores.get(uid, 0.0), 3),
+            "rrf_score": round(rrf, 5)
+        })
+
+    return results
+
+
+# =====================================================
+# 🎯 Metadata filters
+# =====================================================
+def _scope(index, filters):
+    """
+    filters = {"doc_ids": [...], "page_min": n, "page_max": n}
+    Returns (rows for the vector index, sorted uids for BM25),
+    or (None, None) when the query is unscoped.
+    """
+    if not filters:
+        return None, None
+    rows = index.select_rows(**filters)
+    if rows is None:
+        return None, None
+    return rows, np.sort(index.chunk_ids_for_rows(rows)).astype("uint32")
+
+
+def search_chunks(query, model, index, chunks, top_k=5, bm25=None, filters=None):
+    query_embedding = encode_queries([query], model)
+    rows, allowed = _scope(index, filters)
+
+    with span("vector_search"):
+        distances, indices = index.search(
+            query_embedding, top_k if bm25 is None else top_k * HYBRID_OVERFETCH, rows=rows
+        )
+
+    if bm25 is None:
+        return _build_results(distances[0], indices[0], chunks)
+    return _hybrid_results(query, distances[0], indices[0], chunks, bm25, top_k, allowed)
+
+
+def search_chunks_batch(queries, model, index, chunks, top_k=5, bm25=None, filters=None):
+    """
+    Batched search_chunks: one encode pass + one index.search
+    over the whole query matrix. Returns one result list per query.
+    """
+    if not queries:
+        return []
+
+    query_embeddings = encode_queries(queries, model)
+    rows, allowed = _scope(index, filters)
+
+    with span("vector_search"):
+        distances, indices = index.search(
+            query_embeddings, top_k if bm25 is None else top_k * HYBRID_OVERFETCH, rows=rows
+        )
+
+    if bm25 is None:
+        return [
+            _build_results(distances[i], indices[i], chunks)
+            for i in range(len(queries))
+        ]
+    return [
+        _hybrid_results(q, distances[i], indices[i], chunks, bm25, top_k, allowed)
+        for i, q in enumerate(queries)
+    ]
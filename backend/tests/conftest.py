@@ -0,0 +1,9 @@
+# conftest.py
+# -------------------------------------------------
+# Backend modules import each other by bare name (run from backend/)
+# -------------------------------------------------
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,85 @@
+# test_restart.py
+# -------------------------------------------------
+# The corpus survives a process restart: ingest in one process,
+# /ask (unfiltered + filtered) in a fresh one over the same DD_STORE_DIR
+# -------------------------------------------------
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+# main.py needs the full backend stack (and a locally cached embedding model)
+for _module in ("sentence_transformers", "pytesseract", "pdf2image"):
+    pytest.importorskip(_module)
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+_INGEST = """
+import json, sys
+sys.path.insert(0, "benchmarks")
+from fastapi.testclient import TestClient
+from synthetic_docs import corpus
+import main
+
+files = [("files", (name, data, "application/pdf")) for name, data in corpus(3, 4)]
+with TestClient(main.app) as client:
+    print(json.dumps(client.post("/ingest/bulk", files=files).json()["indexed"]))
+"""
+
+_ASK = """
+import json
+from fastapi.testclient import TestClient
+import main
+
+def sources(client, **payload):
+    body = client.post("/ask", json=dict(payload, stream=True)).text
+    event = body.split("event: sources\\ndata: ", 1)[1].split("\\n", 1)[0]
+    return [s["doc_name"] for s in json.loads(event)]
+
+question = "Who must indemnify the purchaser against third party claims?"
+with TestClient(main.app) as client:
+    print(json.dumps({
+        "documents": len(main.DOCUMENTS),
+        "vectors": main.VECTOR_INDEX.ntotal,
+        "dimension": main.VECTOR_INDEX.index.d,
+        "answer": client.post("/ask", json={"question": question}).json()["answer"],
+        "unfiltered": sources(client, question=question),
+        "dense": sources(client, question=question, hybrid=False),
+        "filtered": sources(client, question=question, doc_names=["text_0001.pdf"]),
+        "paged": sources(client, question=question, doc_ids=[3], page_min=2, page_max=3),
+    }))
+"""
+
+
+def _run(script: str, store_dir) -> dict:
+    env = dict(
+        os.environ,
+        DD_STORE_DIR=str(store_dir / "store"),
+        DOC_CACHE_DIR=str(store_dir / "doc_cache"),
+        LLM_BACKEND="stub",
+        LLM_STUB_LATENCY_MS="0",
+        HF_HUB_OFFLINE="1",
+    )
+    done = subprocess.run(
+        [sys.executable, "-c", script], cwd=BACKEND_DIR, env=env,
+        capture_output=True, text=True, timeout=600
+    )
+    assert done.returncode == 0, done.stderr
+    return json.loads(done.stdout.strip().splitlines()[-1])
+
+
+def test_corpus_survives_restart(tmp_path):
+    assert _run(_INGEST, tmp_path) == 3
+
+    after = _run(_ASK, tmp_path)   # new process, same store
+    assert after["documents"] == 3
+    assert after["vectors"] > 0
+    assert after["dimension"] > 0
+    assert after["answer"]
+    assert len(after["unfiltered"]) == 5
+    assert len(after["dense"]) == 5
+    assert after["filtered"] and set(after["filtered"]) == {"text_0001.pdf"}
+    assert after["paged"] and set(after["paged"]) == {"text_0002.pdf"}
@@ -0,0 +1,115 @@
+# test_risk_rules.py
+# -------------------------------------------------
+# RuleEngine: word boundaries, negation, proximity, hot reload
+# -------------------------------------------------
+
+import json
+import os
+
+import pytest
+
+import risk_rules
+from risk_detector import detect_risks
+from risk_matcher import RuleEngine
+
+
+def _engine(**rule) -> RuleEngine:
+    return RuleEngine({
+        "version": "test",
+        "risk_rules": [{"risk_type": "Test", "severity": "High", **rule}],
+        "flag_rules": {},
+    })
+
+
+def _fires(engine: RuleEngine, text: str) -> bool:
+    text = " ".join(text.lower().split())
+    return engine.match_rule(engine.rules[0], text, engine.matcher.offsets(text)) is not None
+
+
+def test_whole_words_only():
+    engine = _engine(keywords=["exit", "fine"])
+    assert _fires(engine, "Either party may exit the venture.")
+    assert not _fires(engine, "Existing obligations survive the defined term.")
+    assert not _fires(engine, "Refined terms apply.")
+
+
+def test_prefix_keywords():
+    engine = _engine(keywords=["terminat*"])
+    for text in ("The lessor may terminate.", "Termination fee applies.", "Terminated on notice."):
+        assert _fires(engine, text)
+    assert not _fires(engine, "The determination is final.")
+
+
+def test_negation_window():
+    engine = _engine(keywords=["terminat*"], negations=["not", "may not"], negation_window=3)
+    assert _fires(engine, "Either party may terminate this agreement.")
+    assert not _fires(engine, "The supplier shall not terminate this agreement.")
+    assert not _fires(engine, "The lessee may not terminate early.")
+    # negation further back than the window, or in an earlier sentence
+    assert _fires(engine, "Not withstanding the schedule above either party may terminate.")
+    assert _fires(engine, "Fees are not refundable. Either party may terminate.")
+
+
+def test_proximity_window():
+    engine = _engine(near=[{"terms": ["liquidated", "damage*"], "within": 3}])
+    assert _fires(engine, "Liquidated damages apply to delays.")
+    assert _fires(engine, "Liquidated and agreed damages apply.")
+    assert not _fires(engine, "Liquidated stock is sold and the purchaser bears any damage.")
+    assert not _fires(engine, "The purchaser bears any damage.")
+
+
+def _write(path, rules: dict):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rules, f)
+
+
+@pytest.fixture
+def rules_file(tmp_path, monkeypatch):
+    path = str(tmp_path / "rules.json")
+    _write(path, {
+        "risk_rules": [{"risk_type": "Termination", "severity": "High", "keywords": ["terminat*"]}],
+        "flag_rules": {},
+    })
+    # reload_ruleset rebinds these module globals; restore them afterwards
+    monkeypatch.setattr(risk_rules, "RULESET", risk_rules.load_ruleset(path))
+    for name in ("RISK_RULES", "FLAG_RULES", "RULESET_VERSION"):
+        monkeypatch.setattr(risk_rules, name, getattr(risk_rules, name))
+    return path
+
+
+def test_reload_changes_version(rules_file):
+    chunks = [{"page": 1, "text": "The indemnity survives. Either party may terminate."}]
+    before = risk_rules.current_ruleset()
+    assert [r["risk_type"] for r in detect_risks(chunks, before)] == ["Termination"]
+
+    # unchanged mtime -> no re-read
+    assert risk_rules.reload_ruleset() == (before, False)
+
+    # formatting-only edit -> same version
+    with open(rules_file, encoding="utf-8") as f:
+        rules = json.load(f)
+    with open(rules_file, "w", encoding="utf-8") as f:
+        json.dump(rules, f, indent=4)
+    os.utime(rules_file, ns=(before["mtime"] + 1, before["mtime"] + 1))
+    ruleset, changed = risk_rules.reload_ruleset()
+    assert not changed and ruleset["version"] == before["version"]
+
+    _write(rules_file, {
+        "risk_rules": [
+            {"risk_type": "Termination", "severity": "High", "keywords": ["terminat*"]},
+            {"risk_type": "Indemnity", "severity": "High", "keywords": ["indemn*"]},
+        ],
+        "flag_rules": {},
+    })
+    ruleset, changed = risk_rules.reload_ruleset(force=True)
+    assert changed and ruleset["version"] != before["version"]
+    assert risk_rules.current_ruleset() is ruleset
+    assert {r["risk_type"] for r in detect_risks(chunks)} == {"Termination", "Indemnity"}
+
+
+def test_invalid_reload_keeps_rules(rules_file):
+    before = risk_rules.current_ruleset()
+    _write(rules_file, {"risk_rules": [{"risk_type": "Broken", "severity": "Extreme", "keywords": ["x"]}]})
+    with pytest.raises(ValueError):
+        risk_rules.reload_ruleset(force=True)
+    assert risk_rules.current_ruleset() is before
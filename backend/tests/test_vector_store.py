@@ -0,0 +1,137 @@
+# test_vector_store.py
+# -------------------------------------------------
+# Save -> reload in a fresh store -> search (FAISS and BM25)
+# -------------------------------------------------
+
+import gc
+
+import numpy as np
+import pytest
+
+from bm25_index import BM25Index
+from vector_index import IncrementalIndex
+from vector_store import VectorStore
+
+DIM = 16
+N = 400
+
+
+def _vectors(n: int = N, seed: int = 0) -> np.ndarray:
+    x = np.random.default_rng(seed).standard_normal((n, DIM)).astype("float32")
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+@pytest.mark.parametrize("backend", ["flat", "flat_fp16", "hnsw", "ivfpq"])
+def test_index_survives_reload(tmp_path, backend):
+    vectors = _vectors()
+    index = IncrementalIndex(backend=backend, train_threshold=N)
+    # two documents, chunk ids offset from row numbers
+    index.add_embeddings(vectors[:250], np.arange(250) + 1000, doc_ids=1, pages=np.arange(250) % 10)
+    index.add_embeddings(vectors[250:], np.arange(250, N) + 1000, doc_ids=2, pages=np.arange(150) % 10)
+    VectorStore(str(tmp_path)).save_index(index)
+    del index
+
+    loaded = IncrementalIndex(backend=backend, train_threshold=N)
+    assert VectorStore(str(tmp_path)).load_index(loaded)
+    gc.collect()
+    _churn = [np.ones(4096) for _ in range(2000)]   # reuse any freed memory
+
+    assert loaded.ntotal == N
+    assert loaded.index.d == DIM
+
+    queries = vectors[[3, 260]]
+    _, found = loaded.search(queries, 5)
+    if backend in ("flat", "flat_fp16"):
+        assert found[:, 0].tolist() == [1003, 1260]
+    assert (found >= 1000).all()
+
+    rows = loaded.select_rows(doc_ids=[2], page_min=2, page_max=4)
+    assert rows.size and (loaded.row_doc_id[rows] == 2).all()
+    _, found = loaded.search(queries, 5, rows=rows)
+    assert set(found.ravel()) <= set(loaded.chunk_ids_for_rows(rows))
+
+
+def test_reader_maps_saved_index(tmp_path):
+    vectors = _vectors()
+    index = IncrementalIndex()
+    index.add_embeddings(vectors, np.arange(N), doc_ids=7)
+    VectorStore(str(tmp_path)).save_index(index)
+
+    reader = IncrementalIndex()
+    assert VectorStore(str(tmp_path), read_only=True).load_index(reader)
+    gc.collect()
+
+    _, found = reader.search(vectors[:4], 1)
+    assert found[:, 0].tolist() == [0, 1, 2, 3]
+    _, found = reader.search(vectors[:4], 1, rows=reader.select_rows(doc_ids=[7]))
+    assert found[:, 0].tolist() == [0, 1, 2, 3]
+
+
+
+def test_reader_not_stale_after_reset(tmp_path):
+    index = IncrementalIndex()
+    index.add_embeddings(_vectors(), np.arange(N), doc_ids=7)
+    writer = VectorStore(str(tmp_path))
+    writer.save_index(index)
+
+    reader_store = VectorStore(str(tmp_path), read_only=True)
+    reader = IncrementalIndex()
+    assert reader_store.load_index(reader)
+    assert not reader_store.is_stale()
+
+    writer.reset()
+    assert reader_store.is_stale()
+    assert not reader_store.load_index(reader)
+    assert reader.ntotal == 0 and not reader_store.is_stale()
+
+
+def _clauses(n: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    words = ["indemnify", "terminate", "clause", "14.2", "lessee", "notice", "penalty", "co-op"]
+    return [{"text": " ".join(rng.choice(words, size=12))} for _ in range(n)]
+
+
+def test_bm25_survives_reload(tmp_path):
+    bm25 = BM25Index()
+    bm25.add_chunks(_clauses(300, seed=0), 0)
+    VectorStore(str(tmp_path)).save_bm25(bm25)
+
+    loaded = BM25Index()
+    assert VectorStore(str(tmp_path), read_only=True).load_bm25(loaded, max_chunks=300)
+    assert len(loaded) == 300
+    for query in ("indemnify lessee", "clause 14.2", "co-op notice"):
+        assert loaded.search(query, 10) == bm25.search(query, 10)
+
+    # still append-only after a restore
+    more = _clauses(50, seed=1)
+    bm25.add_chunks(more, 300)
+    loaded.add_chunks(more, 300)
+    allowed = np.arange(250, 350, dtype="uint32")
+    assert loaded.search("penalty terminate", 10, allowed) == bm25.search("penalty terminate", 10, allowed)
+
+    # saved postings newer than the corpus (it was reset) are ignored
+    assert not VectorStore(str(tmp_path)).load_bm25(BM25Index(), max_chunks=100)
+
+
+@pytest.mark.parametrize("exact_rows", [20000, 0], ids=["exact", "widened"])
+@pytest.mark.parametrize("backend", ["hnsw", "ivfpq"])
+def test_narrow_scope_recall(monkeypatch, backend, exact_rows):
+    monkeypatch.setattr("vector_index.EXACT_SCOPE_ROWS", exact_rows)
+    n, per_doc, top_k = 20000, 200, 5
+    vectors = _vectors(n)
+    index = IncrementalIndex(backend=backend, train_threshold=n)
+    for doc in range(n // per_doc):
+        first = doc * per_doc
+        index.add_embeddings(vectors[first:first + per_doc], np.arange(first, first + per_doc), doc_ids=doc)
+    assert index.is_trained_backend
+
+    rows = index.select_rows(doc_ids=[37])
+    queries = _vectors(50, seed=1)
+    _, found = index.search(queries, top_k, rows=rows)
+    assert (found >= 0).all()
+    assert set(found.ravel()) <= set(index.chunk_ids_for_rows(rows))
+
+    # against exact scores over the same scope
+    truth = np.argsort(-(queries @ vectors[rows].T), axis=1)[:, :top_k] + 37 * per_doc
+    recall = np.mean([len(set(f) & set(t)) / top_k for f, t in zip(found, truth)])
+    assert recall >= (0.9 if backend == "hnsw" else 0.5)
@@ -1,6 +1,18 @@
+import os
 import re
+from bisect import bisect_right
 from typing import List, Dict
 
+# "sentence" = chunk_text (per page) | "structure" = chunk_text_structured
+CHUNKER_MODE = os.getenv("CHUNKER_MODE", "sentence")
+
+# Bump whenever chunk boundaries change (invalidates the document cache)
+_MODE_VERSIONS = {"sentence": "1", "structure": "structure-1"}
+if CHUNKER_MODE not in _MODE_VERSIONS:
+    raise ValueError(f"CHUNKER_MODE must be one of {sorted(_MODE_VERSIONS)}")
+CHUNKER_VERSION = _MODE_VERSIONS[CHUNKER_MODE]
+
+
 def chunk_text(
     pages: List[Dict],
     doc_name: str,
@@ -45,3 +57,108 @@ def chunk_text(
             chunk_id += 1
 
     return chunks
+
+
+# =====================================================
+# 🏛 Structure-aware chunking (clauses may cross pages)
+# =====================================================
+# Pages arrive whitespace-collapsed (text_cleaner), so headings are
+# found inline after a sentence end; a unit starts at match.end().
+# (Leading with the literal class, not a lookbehind, is ~3x faster.)
+_UNIT_START = re.compile(
+    r"[.:;!?] (?="
+    r"(?:ARTICLE|Article|SECTION|Section|CLAUSE|Clause|SCHEDULE|Schedule"
+    r"|ANNEXURE|Annexure|ANNEX|Annex|EXHIBIT|Exhibit|APPENDIX|Appendix)"
+    r"\s+[0-9IVXLC]+[A-Z]?\b"
+    r"|\d{1,3}(?:\.\d{1,3}){0,3}\.?\s+[A-Z(\"]"
+    r")"
+)
+
+
+def _cut(stream: str, start: int, limit: int) -> int:
+    """
+    Best end for a piece of an oversized unit starting at `start`:
+    the last sentence end, else the last space, before `limit`.
+    """
+    end = max(stream.rfind(p, start + 1, limit + 1) for p in (". ", "! ", "? "))
+    if end != -1:
+        return end + 1
+    space = stream.rfind(" ", start + 1, limit)
+    return space if space > start else limit
+
+
+def chunk_text_structured(
+    pages: List[Dict],
+    doc_name: str,
+    max_chars: int = 800,
+    overlap: int = 150
+) -> List[Dict]:
+    """
+    Splits the WHOLE document on legal structure (Article / Section /
+    Clause / Schedule headings and numbered clauses like "12.3"), then
+    packs consecutive units into chunks of at most `max_chars`.
+
+    Chunks are (start, end) spans of one joined string, so building
+    them is a single slice each (no repeated concatenation). A unit
+    longer than `max_chars` is cut at sentence (else word) boundaries,
+    carrying `overlap` chars into the next piece; clean unit
+    boundaries need no overlap. `page` is where a chunk starts,
+    `page_end` where it ends.
+    """
+    page_starts, page_nums = [], []
+    offset = 0
+    for page in pages:
+        page_starts.append(offset)
+        page_nums.append(page["page"])
+        offset += len(page["text"]) + 1
+    stream = " ".join(page["text"] for page in pages)
+    if not stream.strip():
+        return []
+
+    units = [0] + [m.end() for m in _UNIT_START.finditer(stream)] + [len(stream)]
+
+    spans = []
+    start = end = 0
+    for unit_end in units[1:]:
+        if unit_end - start <= max_chars:
+            end = unit_end
+            continue
+        if end > start:
+            spans.append((start, end))
+            start = end
+        # oversized unit: sentence-sized pieces with overlap
+        while unit_end - start > max_chars:
+            cut = _cut(stream, start, start + max_chars)
+            spans.append((start, cut))
+            if cut - start <= 2 * overlap:
+                start = cut   # tiny piece: overlapping would barely advance
+                continue
+            space = stream.find(" ", cut - overlap, cut)
+            start = space + 1 if space != -1 else cut
+        end = unit_end
+    if end > start:
+        spans.append((start, end))
+
+    chunks = []
+    for start, end in spans:
+        text = stream[start:end].strip()
+        if not text:
+            continue
+        chunks.append({
+            "chunk_id": len(chunks),
+            "doc_name": doc_name,
+            "page": page_nums[bisect_right(page_starts, start) - 1],
+            "page_end": page_nums[bisect_right(page_starts, end - 1) - 1],
+            "text": text
+        })
+
+    return chunks
+
+
+def chunk_pages(pages: List[Dict], doc_name: str) -> List[Dict]:
+    """
+    Chunks with the configured CHUNKER_MODE.
+    """
+    if CHUNKER_MODE == "structure":
+        return chunk_text_structured(pages, doc_name)
+    return chunk_text(pages, doc_name)
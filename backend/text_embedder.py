@@ -1,18 +1,147 @@
 from sentence_transformers import SentenceTransformer
 import faiss
+import logging
 import numpy as np
+import os
+import threading
+import time
 
-# Load model once (good practice – keep this)
-model = SentenceTransformer("all-MiniLM-L6-v2")
+import metrics
 
-def embed_chunks(chunks: list[str]):
+logger = logging.getLogger("text_embedder")
+
+EMBEDDING_MODEL_NAME = "all-MiniLM-L6-v2"
+
+# torch (default) | onnx: int8-quantized ONNX export of the same model,
+# needs `pip install sentence-transformers[onnx]`
+EMBED_BACKEND = os.getenv("EMBED_BACKEND", "torch")
+EMBED_ONNX_FILE = os.getenv("EMBED_ONNX_FILE", "onnx/model_qint8_avx512_vnni.onnx")
+
+# Intra-op threads for the forward pass (0 = every core). Embedding runs
+# on ONE dedicated thread (ingestion_jobs), so it can take all of them.
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0")) or os.cpu_count() or 1
+
+# Activation memory one forward pass may use; batches are sized to it
+EMBED_MEMORY_MB = int(os.getenv("EMBED_MEMORY_MB", "256"))
+EMBED_MAX_BATCH = int(os.getenv("EMBED_MAX_BATCH", "256"))
+
+
+# =====================================================
+# 🧠 Model (loaded once)
+# =====================================================
+def _load_model():
     """
-    Converts text chunks into embeddings and stores them in FAISS.
+    Returns (model, backend actually in use).
+    """
+    if EMBED_BACKEND == "onnx":
+        try:
+            onnx_model = SentenceTransformer(
+                EMBEDDING_MODEL_NAME, backend="onnx",
+                model_kwargs={"file_name": EMBED_ONNX_FILE}
+            )
+            return onnx_model, "onnx"
+        except Exception as e:
+            logger.warning("ONNX embedding backend unavailable (%s); using torch", e)
 
-    FIXES:
-    - Skips empty / whitespace-only chunks
-    - Filters NaN embeddings (prevents cosine_similarity crash)
-    - Handles OCR noise safely
+    try:
+        import torch
+        torch.set_num_threads(EMBED_THREADS)
+    except ImportError:
+        pass
+    return SentenceTransformer(EMBEDDING_MODEL_NAME), "torch"
+
+
+model, EMBED_BACKEND_ACTIVE = _load_model()
+
+# Part of document-cache keys: int8 vectors are not interchangeable
+# with fp32 ones
+EMBEDDING_MODEL_ID = (
+    EMBEDDING_MODEL_NAME if EMBED_BACKEND_ACTIVE == "torch"
+    else f"{EMBEDDING_MODEL_NAME}+{os.path.basename(EMBED_ONNX_FILE)}"
+)
+
+
+# =====================================================
+# 📦 Length buckets sized to the memory budget
+# =====================================================
+# MiniLM-L6: hidden 384, FFN 1536, 12 heads. Per padded token a layer
+# holds ~(4 x 384 + 1536) floats, plus a (heads x seq_len) attention row.
+_HIDDEN_FLOATS_PER_TOKEN = 4 * 384 + 1536
+_ATTENTION_HEADS = 12
+
+EMBED_STATS = {
+    "backend": EMBED_BACKEND_ACTIVE,
+    "threads": EMBED_THREADS,
+    "chunks": 0,
+    "batches": 0,
+    "tokens": 0,
+    "padded_tokens": 0,
+    "seconds": 0.0,
+}
+_STATS_LOCK = threading.Lock()
+
+
+def _token_lengths(texts: list) -> list:
+    """
+    Token count per text (with [CLS]/[SEP]), capped at the model's
+    max_seq_length; chars / 4 when no fast tokenizer is available.
+    """
+    max_len = getattr(model, "max_seq_length", None) or 256
+    tokenizer = getattr(model, "tokenizer", None)
+    if tokenizer is not None:
+        try:
+            encoded = tokenizer(
+                texts, add_special_tokens=True, truncation=True,
+                max_length=max_len, return_length=True,
+                return_attention_mask=False, return_token_type_ids=False
+            )
+            return list(encoded["length"])
+        except Exception:
+            pass
+    return [min(max_len, len(t) // 4 + 2) for t in texts]
+
+
+def _batch_size(seq_len: int) -> int:
+    per_sequence = 4 * seq_len * (_HIDDEN_FLOATS_PER_TOKEN + _ATTENTION_HEADS * seq_len)
+    budget = EMBED_MEMORY_MB * 1024 * 1024
+    return max(1, min(EMBED_MAX_BATCH, budget // per_sequence))
+
+
+def plan_batches(lengths: list) -> list:
+    """
+    Sorts positions by token length (longest first) and cuts them into
+    batches whose padded size fits EMBED_MEMORY_MB. Similar lengths
+    share a batch, so little compute goes to padding, and short
+    chunks get much larger batches than long ones.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: -lengths[i])
+    batches, start = [], 0
+    while start < len(order):
+        size = _batch_size(lengths[order[start]])   # longest in the batch
+        batches.append(order[start:start + size])
+        start += size
+    return batches
+
+
+def embedding_stats() -> dict:
+    with _STATS_LOCK:
+        stats = dict(EMBED_STATS)
+    stats["chunks_per_sec"] = round(stats["chunks"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    stats["padding_ratio"] = (
+        round(stats["padded_tokens"] / stats["tokens"], 3) if stats["tokens"] else 1.0
+    )
+    stats["seconds"] = round(stats["seconds"], 3)
+    return stats
+
+
+def encode_texts(chunks: list[str]):
+    """
+    Encodes text chunks into normalized float32 embeddings.
+
+    Returns (embeddings, valid_indices) where valid_indices[i] is the
+    position in `chunks` that produced embeddings[i]. Empty chunks and
+    NaN / Inf rows are dropped, so callers MUST use valid_indices to map
+    rows back to chunks.
     """
 
     # ✅ 1. Clean + filter chunks BEFORE embedding
@@ -24,22 +153,63 @@ def embed_chunks(chunks: list[str]):
             clean_chunks.append(text.strip())
             valid_indices.append(i)
 
-    # ❌ Nothing valid to embed
     if not clean_chunks:
-        raise ValueError("No valid text chunks to embed")
+        return np.empty((0, 0), dtype="float32"), np.empty(0, dtype="int64")
+
+    # ✅ 2. Generate embeddings, one length bucket at a time
+    t0 = time.perf_counter()
+    lengths = _token_lengths(clean_chunks)
+    batches = plan_batches(lengths)
+    embeddings = None
+    for batch in batches:
+        vectors = model.encode(
+            [clean_chunks[i] for i in batch],
+            batch_size=len(batch),
+            convert_to_numpy=True,
+            normalize_embeddings=True,  # 🔥 improves cosine similarity stability
+            show_progress_bar=False
+        )
+        if embeddings is None:
+            embeddings = np.empty((len(clean_chunks), vectors.shape[1]), dtype="float32")
+        embeddings[batch] = vectors   # back to input order
+    elapsed = time.perf_counter() - t0
+    metrics.observe("embed_encode", elapsed)
+    metrics.CHUNKS_EMBEDDED.inc(len(clean_chunks))
 
-    # ✅ 2. Generate embeddings
-    embeddings = model.encode(
-        clean_chunks,
-        convert_to_numpy=True,
-        normalize_embeddings=True  # 🔥 improves cosine similarity stability
+    with _STATS_LOCK:
+        EMBED_STATS["chunks"] += len(clean_chunks)
+        EMBED_STATS["batches"] += len(batches)
+        EMBED_STATS["tokens"] += sum(lengths)
+        EMBED_STATS["padded_tokens"] += sum(lengths[b[0]] * len(b) for b in batches)
+        EMBED_STATS["seconds"] += elapsed
+    logger.info(
+        "embedded %d chunks in %d batches, %.1f chunks/s",
+        len(clean_chunks), len(batches), len(clean_chunks) / elapsed if elapsed else 0.0
     )
 
     # ✅ 3. Remove NaN / Inf embeddings (very important)
     mask = np.isfinite(embeddings).all(axis=1)
-    embeddings = embeddings[mask]
+    valid_indices = np.asarray(valid_indices, dtype="int64")[mask]
+
+    return embeddings[mask], valid_indices
 
-    if embeddings.shape[0] == 0:
+
+def embed_chunks(chunks: list[str]):
+    """
+    Converts text chunks into embeddings and stores them in FAISS.
+
+    FIXES:
+    - Skips empty / whitespace-only chunks
+    - Filters NaN embeddings (prevents cosine_similarity crash)
+    - Handles OCR noise safely
+    """
+
+    embeddings, valid_indices = encode_texts(chunks)
+
+    # ❌ Nothing valid to embed
+    if len(valid_indices) == 0:
+        if not any(isinstance(t, str) and t.strip() for t in chunks):
+            raise ValueError("No valid text chunks to embed")
         raise ValueError("All embeddings contained NaN or Inf")
 
     # ✅ 4. Build FAISS index
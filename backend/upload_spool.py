@@ -0,0 +1,91 @@
+# upload_spool.py
+# -------------------------------------------------
+# Streams uploads to disk in fixed-size chunks (hashing as they go),
+# so a 500 MB data-room bundle never sits in memory
+# -------------------------------------------------
+
+import hashlib
+import os
+import tempfile
+import zipfile
+
+from fastapi import UploadFile
+from fastapi.concurrency import run_in_threadpool
+
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None   # None = system temp dir
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+# ZIP bomb guard: total uncompressed bytes a bulk archive may expand to
+BULK_MAX_UNCOMPRESSED_BYTES = int(os.getenv("BULK_MAX_UNCOMPRESSED_BYTES", str(20 * 1024 ** 3)))
+
+
+async def spool_upload(file: UploadFile, suffix: str = ".pdf") -> tuple:
+    """
+    Copies the upload to a new temp file, UPLOAD_CHUNK_BYTES at a time.
+    Returns (path, sha256 hex, size). The CALLER owns the file and
+    must delete it.
+    """
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=UPLOAD_SPOOL_DIR)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                size += len(chunk)
+                await run_in_threadpool(out.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return path, digest.hexdigest(), size
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(UPLOAD_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def is_zip(path: str) -> bool:
+    return zipfile.is_zipfile(path)
+
+
+def expand_zip(zip_path: str) -> tuple:
+    """
+    Spools every PDF member of the archive to its own temp file.
+    Returns (pdfs, skipped): pdfs = [(name, path, sha256)] in archive
+    order, skipped = [(name, reason)]. Member paths are never used on
+    disk (only as document names), so "../" entries are harmless.
+    """
+    pdfs, skipped = [], []
+    with zipfile.ZipFile(zip_path) as archive:
+        members = [m for m in archive.infolist() if not m.is_dir()]
+        if sum(m.file_size for m in members) > BULK_MAX_UNCOMPRESSED_BYTES:
+            raise ValueError("Archive expands beyond BULK_MAX_UNCOMPRESSED_BYTES")
+
+        for member in members:
+            name = os.path.basename(member.filename)
+            if not name.lower().endswith(".pdf") or name.startswith("._"):
+                skipped.append((member.filename, "not a PDF"))
+                continue
+
+            fd, path = tempfile.mkstemp(suffix=".pdf", dir=UPLOAD_SPOOL_DIR)
+            digest = hashlib.sha256()
+            try:
+                with os.fdopen(fd, "wb") as out, archive.open(member) as src:
+                    for chunk in iter(lambda: src.read(UPLOAD_CHUNK_BYTES), b""):
+                        digest.update(chunk)
+                        out.write(chunk)
+            except Exception as e:
+                os.remove(path)
+                skipped.append((member.filename, str(e) or e.__class__.__name__))
+                continue
+            pdfs.append((name, path, digest.hexdigest()))
+
+    return pdfs, skipped
@@ -0,0 +1,353 @@
+# vector_index.py
+# -------------------------------------------------
+# Incremental FAISS index over the global chunk list
+# -------------------------------------------------
+
+import math
+import os
+import threading
+
+import faiss
+import numpy as np
+
+# -------------------------------------------------
+# ⚙ Index backend (see benchmarks/bench_index.py)
+# -------------------------------------------------
+#   flat       exact float32 scan (default)
+#   flat_fp16  exact scan over float16 codes (2x smaller)
+#   ivfpq      IVF + product quantization (~32x smaller, approximate)
+#   hnsw       HNSW graph over float16 vectors (fast, approximate)
+#
+# ivfpq / hnsw start as an exact flat index and are trained + rebuilt
+# automatically once the corpus reaches INDEX_TRAIN_THRESHOLD vectors.
+INDEX_BACKEND = os.getenv("INDEX_BACKEND", "flat")
+INDEX_TRAIN_THRESHOLD = int(os.getenv("INDEX_TRAIN_THRESHOLD", "50000"))
+
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", "16"))
+PQ_M = int(os.getenv("PQ_M", "48"))                 # must divide the dimension
+HNSW_M = int(os.getenv("HNSW_M", "32"))
+HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", "64"))
+
+# Filtered ANN search over a narrow scope finds few of its rows, so
+# scopes up to this many rows are scored exactly instead
+EXACT_SCOPE_ROWS = int(os.getenv("EXACT_SCOPE_ROWS", "20000"))
+
+BACKENDS = ("flat", "flat_fp16", "ivfpq", "hnsw")
+
+
+def create_index(backend: str, dimension: int, train_vectors: np.ndarray = None):
+    """
+    Builds an EMPTY, trained FAISS index for `backend`
+    (inner product on normalized vectors = cosine similarity).
+    """
+    ip = faiss.METRIC_INNER_PRODUCT
+
+    if backend == "flat":
+        return faiss.IndexFlatIP(dimension)
+
+    if backend == "flat_fp16":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, ip)
+
+    if backend == "hnsw":
+        index = faiss.IndexHNSWSQ(dimension, faiss.ScalarQuantizer.QT_fp16, HNSW_M, ip)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        index.hnsw.efSearch = HNSW_EF_SEARCH
+        index.train(train_vectors[:1])   # fp16 needs no statistics
+        return index
+
+    if backend == "ivfpq":
+        n = train_vectors.shape[0]
+        nlist = max(1, min(int(4 * math.sqrt(n)), n // 39))
+        m = PQ_M if dimension % PQ_M == 0 else dimension // 8
+        quantizer = faiss.IndexFlatIP(dimension)
+        index = faiss.IndexIVFPQ(quantizer, dimension, nlist, m, 8, ip)
+        # ~256 points per centroid is plenty for k-means
+        sample = train_vectors
+        if n > nlist * 256:
+            pick = np.random.default_rng(0).choice(n, nlist * 256, replace=False)
+            sample = train_vectors[np.sort(pick)]
+        index.train(sample)
+        index.nprobe = IVF_NPROBE
+        return index
+
+    raise ValueError(f"Unknown index backend: {backend}")
+
+
+class IncrementalIndex:
+    """
+    Append-only vector index that embeds ONLY new chunks.
+
+    Every vector row remembers the global chunk id (position in
+    ALL_CHUNKS) that produced it, so rows dropped by the embedder
+    (empty text, NaN / Inf) never shift the mapping.
+
+    `search()` keeps the FAISS signature but returns chunk ids
+    instead of raw row numbers, so it can be handed straight to
+    `semantic_search.search_chunks`.
+    """
+
+    def __init__(self, backend: str = INDEX_BACKEND, train_threshold: int = INDEX_TRAIN_THRESHOLD):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown index backend: {backend}")
+        self._lock = threading.Lock()
+        self.backend = backend
+        self.train_threshold = train_threshold
+        self.nprobe = IVF_NPROBE
+        self.ef_search = HNSW_EF_SEARCH
+        self.index = None
+        self._clear_rows()
+
+    def _clear_rows(self):
+        # Per-row metadata for filtered search (same order as the vectors)
+        self.row_to_chunk = np.empty(0, dtype="int64")
+        self.row_doc_id = np.empty(0, dtype="int64")
+        self.row_page = np.empty(0, dtype="int32")
+        self._doc_ranges = {}   # doc_id -> [(first_row, end_row), ...]
+
+    def _index_ranges(self, first_row: int, doc_ids: np.ndarray):
+        """
+        Records the contiguous row runs of every doc_id in a new block.
+        """
+        if doc_ids.size == 0:
+            return
+        starts = np.concatenate([[0], np.flatnonzero(np.diff(doc_ids)) + 1])
+        ends = np.concatenate([starts[1:], [doc_ids.size]])
+        for start, end in zip(starts, ends):
+            self._doc_ranges.setdefault(int(doc_ids[start]), []).append(
+                (first_row + int(start), first_row + int(end))
+            )
+
+    @property
+    def is_trained_backend(self) -> bool:
+        """
+        True once the index is the configured ANN structure
+        (False while an ivfpq / hnsw corpus is still below threshold).
+        """
+        if self.index is None:
+            return False
+        if self.backend in ("flat", "flat_fp16"):
+            return True
+        return not isinstance(self.index, faiss.IndexFlat)
+
+    # -------------------------------------------------
+    # 📏 Size
+    # -------------------------------------------------
+    @property
+    def ntotal(self) -> int:
+        return 0 if self.index is None else self.index.ntotal
+
+    def __len__(self) -> int:
+        return self.ntotal
+
+    # -------------------------------------------------
+    # ➕ Append
+    # -------------------------------------------------
+    def add_chunks(self, chunks: list, first_chunk_id: int) -> int:
+        """
+        Embeds `chunks` (dicts with "text") whose global ids start at
+        `first_chunk_id` and appends them. Returns rows added.
+        """
+        from text_embedder import encode_texts   # loads the model; keep lazy
+
+        embeddings, valid = encode_texts([c.get("text", "") for c in chunks])
+        return self.add_embeddings(
+            embeddings, valid + first_chunk_id,
+            doc_ids=[chunks[i].get("doc_id", -1) for i in valid],
+            pages=[chunks[i].get("page") or 0 for i in valid],
+        )
+
+    def add_embeddings(self, embeddings: np.ndarray, chunk_ids, doc_ids=None, pages=None) -> int:
+        """
+        Appends precomputed, normalized embeddings for `chunk_ids`.
+        `doc_ids` (scalar or per row) and `pages` (per row) enable
+        filtered search.
+        """
+        chunk_ids = np.asarray(chunk_ids, dtype="int64")
+        if chunk_ids.size == 0:
+            return 0
+
+        embeddings = np.ascontiguousarray(embeddings, dtype="float32")
+        if embeddings.shape[0] != chunk_ids.size:
+            raise ValueError("Embedding rows and chunk ids are misaligned")
+
+        doc_ids = np.broadcast_to(
+            np.asarray(-1 if doc_ids is None else doc_ids, dtype="int64"), chunk_ids.shape
+        )
+        pages = np.broadcast_to(
+            np.asarray(0 if pages is None else pages, dtype="int32"), chunk_ids.shape
+        )
+
+        with self._lock:
+            if self.index is None:
+                backend = self.backend if self.backend in ("flat", "flat_fp16") else "flat"
+                self.index = create_index(backend, embeddings.shape[1])
+            first_row = self.index.ntotal
+            self.index.add(embeddings)
+            self.row_to_chunk = np.concatenate([self.row_to_chunk, chunk_ids])
+            self.row_doc_id = np.concatenate([self.row_doc_id, doc_ids])
+            self.row_page = np.concatenate([self.row_page, pages])
+            self._index_ranges(first_row, doc_ids)
+
+            if not self.is_trained_backend and self.index.ntotal >= self.train_threshold:
+                self._train_and_rebuild()
+
+        return int(chunk_ids.size)
+
+    def _train_and_rebuild(self):
+        """
+        One-off flat -> ivfpq / hnsw migration. Rows keep their order,
+        so row_to_chunk stays valid. Caller holds the lock.
+        """
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        index = create_index(self.backend, vectors.shape[1], vectors)
+        index.add(vectors)
+        self.index = index
+
+    def _search_params(self, widen: float = 1.0):
+        """
+        `widen` (ntotal / selected rows) scales nprobe / efSearch up,
+        so a filtered search still visits enough matching rows.
+        """
+        if isinstance(self.index, faiss.IndexIVF):
+            nprobe = min(self.index.nlist, math.ceil(self.nprobe * widen))
+            return faiss.SearchParametersIVF(nprobe=nprobe)
+        if isinstance(self.index, faiss.IndexHNSW):
+            ef_search = min(self.index.ntotal, math.ceil(self.ef_search * widen))
+            return faiss.SearchParametersHNSW(efSearch=max(ef_search, self.ef_search))
+        return None
+
+    # -------------------------------------------------
+    # 🎯 Filters -> candidate rows
+    # -------------------------------------------------
+    def select_rows(self, doc_ids=None, page_min: int = None, page_max: int = None):
+        """
+        Rows matching the filters (sorted), or None when unfiltered.
+        Cost is proportional to the selected documents, not the corpus.
+        """
+        if doc_ids is None and page_min is None and page_max is None:
+            return None
+
+        with self._lock:
+            if doc_ids is None:
+                rows = np.arange(self.row_to_chunk.size, dtype="int64")
+            else:
+                spans = [
+                    np.arange(start, end, dtype="int64")
+                    for d in sorted(set(doc_ids))
+                    for start, end in self._doc_ranges.get(int(d), [])
+                ]
+                rows = np.concatenate(spans) if spans else np.empty(0, dtype="int64")
+
+            if rows.size and (page_min is not None or page_max is not None):
+                pages = self.row_page[rows]
+                keep = np.ones(rows.size, dtype=bool)
+                if page_min is not None:
+                    keep &= pages >= page_min
+                if page_max is not None:
+                    keep &= pages <= page_max
+                rows = rows[keep]
+
+        return rows
+
+    def chunk_ids_for_rows(self, rows: np.ndarray) -> np.ndarray:
+        return self.row_to_chunk[rows]
+
+    # -------------------------------------------------
+    # 🔍 Search (returns chunk ids, not rows)
+    # -------------------------------------------------
+    def search(self, query_embeddings: np.ndarray, top_k: int, rows: np.ndarray = None):
+        """
+        `rows` (from select_rows) restricts the search BEFORE scoring:
+        exact scoring over just those vectors for flat / fp16 indexes
+        and for IVF / HNSW scopes up to EXACT_SCOPE_ROWS, otherwise a
+        FAISS ID selector with nprobe / efSearch widened to the scope.
+        """
+        query_embeddings = np.ascontiguousarray(query_embeddings, dtype="float32")
+        n_queries = query_embeddings.shape[0]
+        empty = (
+            np.zeros((n_queries, top_k), dtype="float32"),
+            np.full((n_queries, top_k), -1, dtype="int64"),
+        )
+
+        if self.ntotal == 0 or (rows is not None and rows.size == 0):
+            return empty
+
+        with self._lock:
+            if rows is None:
+                distances, found = self.index.search(
+                    query_embeddings, top_k, params=self._search_params()
+                )
+            elif (isinstance(self.index, (faiss.IndexFlat, faiss.IndexScalarQuantizer))
+                  or rows.size <= EXACT_SCOPE_ROWS):
+                distances, found = self._search_subset(query_embeddings, top_k, rows)
+            else:
+                params = self._search_params(widen=self.index.ntotal / rows.size)
+                params.sel = faiss.IDSelectorBatch(rows)
+                distances, found = self.index.search(query_embeddings, top_k, params=params)
+
+            chunk_ids = np.where(found >= 0, self.row_to_chunk[np.maximum(found, 0)], -1)
+        return distances, chunk_ids
+
+    def _search_subset(self, queries: np.ndarray, top_k: int, rows: np.ndarray):
+        """
+        Exact inner product over the selected rows only. Caller holds the lock.
+        """
+        if isinstance(self.index, faiss.IndexFlat):
+            xb = faiss.rev_swig_ptr(self.index.get_xb(), self.index.ntotal * self.index.d)
+            vectors = xb.reshape(self.index.ntotal, self.index.d)[rows]
+        else:
+            if isinstance(self.index, faiss.IndexIVF) and self.index.direct_map.type == faiss.DirectMap.NoMap:
+                self.index.make_direct_map()   # row -> list entry, for reconstruct
+            vectors = self.index.reconstruct_batch(rows)
+
+        scores = queries @ vectors.T
+        k = min(top_k, rows.size)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+
+        distances = np.zeros((queries.shape[0], top_k), dtype="float32")
+        found = np.full((queries.shape[0], top_k), -1, dtype="int64")
+        distances[:, :k] = np.take_along_axis(top_scores, order, axis=1)
+        found[:, :k] = rows[np.take_along_axis(top, order, axis=1)]
+        return distances, found
+
+    # -------------------------------------------------
+    # 💾 Persistence hooks (see vector_store.py)
+    # -------------------------------------------------
+    def write(self, path: str) -> dict:
+        """
+        Writes the FAISS index to `path` and returns the per-row arrays,
+        both taken under the same lock so they always agree.
+        """
+        with self._lock:
+            faiss.write_index(self.index, path)
+            return {
+                "chunk": self.row_to_chunk.copy(),
+                "doc_id": self.row_doc_id.copy(),
+                "page": self.row_page.copy(),
+            }
+
+    def load(self, index, rows: dict):
+        n = index.ntotal
+        # downcast_index returns a proxy that does NOT own the C++ index;
+        # move ownership to it, or the index dies with `index`
+        typed = faiss.downcast_index(index)
+        index.this.disown()
+        typed.this.acquire()
+        with self._lock:
+            self.index = typed
+            self._clear_rows()
+            self.row_to_chunk = np.asarray(rows["chunk"][:n], dtype="int64")
+            self.row_doc_id = np.asarray(rows["doc_id"][:n], dtype="int64")
+            self.row_page = np.asarray(rows["page"][:n], dtype="int32")
+            self._index_ranges(0, self.row_doc_id)
+
+    # -------------------------------------------------
+    # ♻ Reset
+    # -------------------------------------------------
+    def reset(self):
+        with self._lock:
+            self.index = None
+            self._clear_rows()
@@ -0,0 +1,312 @@
+# vector_store.py
+# -------------------------------------------------
+# On-disk corpus: FAISS index + SQLite chunk metadata
+# -------------------------------------------------
+#
+# Layout: <store_dir>/
+#   index.faiss    vectors (memory-mapped by read-only workers)
+#   rows.npz       vector row -> chunk uid, doc_id, page
+#   bm25.npz       BM25 postings (restarts load them, no re-tokenizing)
+#   corpus.sqlite  chunks, documents, risks, counters
+#
+# One process writes (DD_STORE_MODE=writer, the default); any number
+# of read-only workers open the same files, so N uvicorn workers share
+# one copy of the index through the OS page cache.
+
+import json
+import os
+import sqlite3
+import threading
+from typing import Optional
+
+import faiss
+import numpy as np
+
+from bm25_index import BM25Index
+from vector_index import IncrementalIndex
+
+STORE_DIR = os.getenv("DD_STORE_DIR", os.path.join(os.path.dirname(__file__), ".dd_store"))
+STORE_MODE = os.getenv("DD_STORE_MODE", "writer")   # writer | reader
+
+_MMAP_FLAGS = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS chunks (
+    uid       INTEGER PRIMARY KEY,
+    doc_id    INTEGER NOT NULL,
+    chunk_id  INTEGER,
+    doc_name  TEXT,
+    doc_type  TEXT,
+    page      INTEGER,
+    text      TEXT
+);
+CREATE TABLE IF NOT EXISTS documents (
+    doc_id    INTEGER PRIMARY KEY,
+    meta      TEXT NOT NULL,
+    risks     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key       TEXT PRIMARY KEY,
+    value     TEXT
+);
+"""
+
+_CHUNK_COLUMNS = ("uid", "doc_id", "chunk_id", "doc_name", "doc_type", "page", "text")
+
+
+class ChunkStore:
+    """
+    List-like view of every chunk, backed by SQLite.
+
+    Supports the operations main.py uses on ALL_CHUNKS
+    (len, [uid], extend, clear) without holding the corpus in memory.
+    """
+
+    def __init__(self, store: "VectorStore"):
+        self._store = store
+        self._len = store.count_chunks()
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __getitem__(self, uid):
+        if isinstance(uid, slice):
+            return [self[i] for i in range(*uid.indices(self._len))]
+        uid = int(uid)
+        if uid < 0:
+            uid += self._len
+        row = self._store.conn().execute(
+            "SELECT uid, doc_id, chunk_id, doc_name, doc_type, page, text FROM chunks WHERE uid = ?",
+            (uid,)
+        ).fetchone()
+        if row is None:
+            raise IndexError(uid)
+        return dict(zip(_CHUNK_COLUMNS, row))
+
+    def __iter__(self):
+        return self.iter_from(0)
+
+    def iter_from(self, start: int):
+        cur = self._store.conn().execute(
+            "SELECT uid, doc_id, chunk_id, doc_name, doc_type, page, text FROM chunks"
+            " WHERE uid >= ? ORDER BY uid",
+            (start,)
+        )
+        for row in cur:
+            yield dict(zip(_CHUNK_COLUMNS, row))
+
+    def extend(self, chunks: list):
+        self._store.append_chunks(chunks)
+        self._len += len(chunks)
+
+    def clear(self):
+        self._len = 0
+
+    def refresh(self):
+        self._len = self._store.count_chunks()
+
+
+class VectorStore:
+    def __init__(self, store_dir: str = STORE_DIR, read_only: bool = STORE_MODE == "reader"):
+        self.store_dir = store_dir
+        self.read_only = read_only
+        self.index_path = os.path.join(store_dir, "index.faiss")
+        self.rows_path = os.path.join(store_dir, "rows.npz")
+        self.bm25_path = os.path.join(store_dir, "bm25.npz")
+        self.db_path = os.path.join(store_dir, "corpus.sqlite")
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._loaded_mtime = None
+
+        os.makedirs(store_dir, exist_ok=True)
+        if not read_only:
+            with self.conn() as c:
+                c.execute("PRAGMA journal_mode=WAL")
+                c.executescript(_SCHEMA)
+
+    # -------------------------------------------------
+    # 🔌 One SQLite connection per thread
+    # -------------------------------------------------
+    def conn(self) -> sqlite3.Connection:
+        c = getattr(self._local, "conn", None)
+        if c is None:
+            if self.read_only:
+                c = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True)
+            else:
+                c = sqlite3.connect(self.db_path)
+            self._local.conn = c
+        return c
+
+    # -------------------------------------------------
+    # 📖 Load
+    # -------------------------------------------------
+    def count_chunks(self) -> int:
+        if not os.path.exists(self.db_path):
+            return 0
+        return self.conn().execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def load_documents(self) -> tuple:
+        """
+        Returns (documents, document_risks, doc_counter).
+        """
+        documents, document_risks = {}, {}
+        if not os.path.exists(self.db_path):
+            return documents, document_risks, 0
+
+        for doc_id, meta, risks in self.conn().execute(
+            "SELECT doc_id, meta, risks FROM documents ORDER BY doc_id"
+        ):
+            documents[doc_id] = json.loads(meta)
+            document_risks[doc_id] = json.loads(risks)
+
+        doc_counter = self.get_meta("doc_counter")
+        doc_counter = int(doc_counter) if doc_counter else max(documents, default=0)
+        return documents, document_risks, doc_counter
+
+    def get_meta(self, key: str) -> Optional[str]:
+        if not os.path.exists(self.db_path):
+            return None
+        row = self.conn().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def load_index(self, vector_index: IncrementalIndex) -> bool:
+        """
+        Fills `vector_index` from disk. Readers memory-map the file,
+        the writer loads it into RAM so it can keep appending.
+        """
+        if not (os.path.exists(self.index_path) and os.path.exists(self.rows_path)):
+            vector_index.reset()
+            self._loaded_mtime = None   # nothing on disk is what we now hold
+            return False
+
+        mtime = os.stat(self.index_path).st_mtime_ns
+        if self.read_only:
+            index = faiss.read_index(self.index_path, _MMAP_FLAGS)
+        else:
+            index = faiss.read_index(self.index_path)
+        with np.load(self.rows_path) as npz:
+            rows = {name: npz[name] for name in npz.files}
+
+        # rows.npz is written first, so it may be longer than the index
+        vector_index.load(index, rows)
+        self._loaded_mtime = mtime
+        return True
+
+    def load_bm25(self, bm25: BM25Index, max_chunks: int) -> bool:
+        """
+        Fills `bm25` from the saved postings unless they cover more
+        than `max_chunks` chunks (the corpus was reset since).
+        """
+        try:
+            with np.load(self.bm25_path) as npz:
+                arrays = {name: npz[name] for name in npz.files}
+        except (FileNotFoundError, ValueError, OSError):
+            return False
+        if int(arrays["totals"][0]) > max_chunks:
+            return False
+        bm25.restore(arrays)
+        return True
+
+    def is_stale(self) -> bool:
+        """
+        True when another process has saved a newer index.
+        """
+        try:
+            return os.stat(self.index_path).st_mtime_ns != self._loaded_mtime
+        except FileNotFoundError:
+            return self._loaded_mtime is not None
+
+    # -------------------------------------------------
+    # ✍ Write
+    # -------------------------------------------------
+    def append_chunks(self, chunks: list):
+        if self.read_only:
+            raise RuntimeError("Vector store is read-only in this worker")
+        with self._write_lock, self.conn() as c:
+            c.executemany(
+                "INSERT OR REPLACE INTO chunks VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [tuple(ch.get(k) for k in _CHUNK_COLUMNS) for ch in chunks]
+            )
+
+    def save_document(self, doc_meta: dict, risks: list, doc_counter: int,
+                      rules_version: Optional[str] = None):
+        if self.read_only:
+            raise RuntimeError("Vector store is read-only in this worker")
+        with self._write_lock, self.conn() as c:
+            c.execute(
+                "INSERT OR REPLACE INTO documents VALUES (?, ?, ?)",
+                (doc_meta["doc_id"], json.dumps(doc_meta), json.dumps(risks))
+            )
+            c.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('doc_counter', ?)",
+                (str(doc_counter),)
+            )
+            if rules_version is not None:
+                c.execute(
+                    "INSERT OR REPLACE INTO meta VALUES ('rules_version', ?)",
+                    (rules_version,)
+                )
+
+    def save_risks(self, document_risks: dict, rules_version: str):
+        """
+        Replaces the risks of many documents in ONE transaction
+        (rule-set re-scan) and records the rule-set version.
+        """
+        if self.read_only:
+            raise RuntimeError("Vector store is read-only in this worker")
+        with self._write_lock, self.conn() as c:
+            c.executemany(
+                "UPDATE documents SET risks = ? WHERE doc_id = ?",
+                [(json.dumps(risks), doc_id) for doc_id, risks in document_risks.items()]
+            )
+            c.execute(
+                "INSERT OR REPLACE INTO meta VALUES ('rules_version', ?)",
+                (rules_version,)
+            )
+
+    def save_index(self, vector_index: IncrementalIndex, bm25: Optional[BM25Index] = None):
+        """
+        Atomically replaces the on-disk index (and the BM25 postings,
+        when given). Readers that still map the old file keep a valid
+        view until they reload.
+        """
+        if self.read_only:
+            raise RuntimeError("Vector store is read-only in this worker")
+
+        if bm25 is not None:
+            self.save_bm25(bm25)
+
+        if vector_index.ntotal == 0:
+            for p in (self.index_path, self.rows_path):
+                if os.path.exists(p):
+                    os.remove(p)
+            return
+
+        tmp_index = self.index_path + ".tmp"
+        tmp_rows = self.rows_path + ".tmp.npz"
+        rows = vector_index.write(tmp_index)
+
+        np.savez(tmp_rows, **rows)
+        # rows first: a reader seeing the new index must see its rows
+        os.replace(tmp_rows, self.rows_path)
+        os.replace(tmp_index, self.index_path)
+        self._loaded_mtime = os.stat(self.index_path).st_mtime_ns
+
+    def save_bm25(self, bm25: BM25Index):
+        if self.read_only:
+            raise RuntimeError("Vector store is read-only in this worker")
+        tmp_bm25 = self.bm25_path + ".tmp.npz"
+        np.savez(tmp_bm25, **bm25.snapshot())
+        os.replace(tmp_bm25, self.bm25_path)
+
+    def reset(self):
+        if self.read_only:
+            raise RuntimeError("Vector store is read-only in this worker")
+        with self._write_lock, self.conn() as c:
+            c.execute("DELETE FROM chunks")
+            c.execute("DELETE FROM documents")
+            c.execute("DELETE FROM meta")
+        for p in (self.index_path, self.rows_path, self.bm25_path):
+            if os.path.exists(p):
+                os.remove(p)
+        self._loaded_mtime = None
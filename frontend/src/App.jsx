@@ -4,6 +4,7 @@ export default function App() {
   const [files, setFiles] = useState([]);
   const [question, setQuestion] = useState("");
   const [answer, setAnswer] = useState("");
+  const [answerError, setAnswerError] = useState("");
 
   const [uploadStatus, setUploadStatus] = useState("");
   const [isUploading, setIsUploading] = useState(false);
@@ -17,12 +18,17 @@ export default function App() {
 
   const [isLoadingDD, setIsLoadingDD] = useState(false);
 
+  // Heat map is paged from the server (can be tens of thousands of rows)
+  const [heatRows, setHeatRows] = useState([]);
+  const [heatCursor, setHeatCursor] = useState(null);
+  const [flags, setFlags] = useState([]);
+
   // ===============================
   // Upload PDFs
   // ===============================
   const uploadFiles = async () => {
     if (!files.length) {
-      setUploadStatus("Please select at least one PDF");
+      setUploadStatus("Please select at least one PDF or ZIP");
       return;
     }
 
@@ -30,18 +36,23 @@ export default function App() {
     setUploadStatus("Processing documents…");
 
     try {
-      for (let i = 0; i < files.length; i++) {
-        const formData = new FormData();
-        formData.append("file", files[i]);
+      // One request for the whole batch: processed in parallel,
+      // embedded and indexed together, answered with a manifest
+      const formData = new FormData();
+      for (const file of files) formData.append("files", file);
 
-        const resetFlag = i === 0 ? "&reset=true" : "";
+      const res = await fetch(
+        "http://127.0.0.1:8000/ingest/bulk?use_ocr=false&reset=true",
+        { method: "POST", body: formData }
+      );
+      const data = await res.json();
+      if (!res.ok) throw new Error(data.error);
 
-        await fetch(
-          `http://127.0.0.1:8000/extract_pdf_text/?use_ocr=false${resetFlag}`,
-          { method: "POST", body: formData }
-        );
-      }
-      setUploadStatus("Uploaded & indexed successfully");
+      setUploadStatus(
+        data.failed
+          ? `Indexed ${data.indexed} document(s), ${data.failed} failed`
+          : `Uploaded & indexed ${data.indexed} document(s) successfully`
+      );
     } catch {
       setUploadStatus("Upload failed. Please try again.");
     } finally {
@@ -57,17 +68,47 @@ export default function App() {
 
     setIsAsking(true);
     setAnswer("");
+    setAnswerError("");
 
     try {
+      // Answer streams in over SSE (POST, so fetch + reader, not EventSource)
       const res = await fetch("http://127.0.0.1:8000/ask", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
-        body: JSON.stringify({ question }),
+        body: JSON.stringify({ question, stream: true }),
       });
-      const data = await res.json();
-      setAnswer(data.answer || "");
+      if (!res.ok) throw new Error(`HTTP ${res.status}`);
+
+      const reader = res.body.getReader();
+      const decoder = new TextDecoder();
+      let buffer = "";
+      let ended = false;   // "done" or "error" seen
+
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        const events = buffer.split("\n\n");
+        buffer = events.pop();
+        for (const evt of events) {
+          const type = evt.match(/^event: (.*)$/m)?.[1];
+          const data = evt.match(/^data: (.*)$/m)?.[1];
+          if (type === "token" && data) {
+            const { text } = JSON.parse(data);
+            setAnswer((prev) => prev + text);
+          } else if (type === "done") {
+            ended = true;
+          } else if (type === "error") {
+            ended = true;
+            const { error } = data ? JSON.parse(data) : {};
+            setAnswerError(error || "The answer stream failed.");
+          }
+        }
+      }
+      if (!ended) setAnswerError("The connection closed before the answer finished.");
     } catch {
-      setAnswer("Unable to generate answer.");
+      setAnswerError("Unable to generate answer.");
     } finally {
       setIsAsking(false);
     }
@@ -79,9 +120,19 @@ export default function App() {
   const loadDDSummary = async () => {
     setIsLoadingDD(true);
     try {
-      const res = await fetch("http://127.0.0.1:8000/due-diligence/summary");
+      const res = await fetch(
+        "http://127.0.0.1:8000/due-diligence/summary?include_heat_map=false"
+      );
       const data = await res.json();
-      setDdSummary(data);
+      setDdSummary({ heat_map: [], ...data });
+
+      const [heat, high] = await Promise.all([
+        fetchHeatMapPage(),
+        fetchHeatMapPage(null, "&severity=High"),
+      ]);
+      setHeatRows(heat.items || []);
+      setHeatCursor(heat.next_cursor || null);
+      setFlags(high.items || []);
     } catch {
       alert("Failed to load DD summary");
     } finally {
@@ -89,6 +140,24 @@ export default function App() {
     }
   };
 
+  const fetchHeatMapPage = async (cursor = null, extra = "") => {
+    let url = "http://127.0.0.1:8000/due-diligence/heatmap?limit=100" + extra;
+    if (cursor) url += `&cursor=${encodeURIComponent(cursor)}`;
+    const res = await fetch(url);
+    return res.json();
+  };
+
+  const loadMoreHeatMap = async () => {
+    if (!heatCursor) return;
+    try {
+      const page = await fetchHeatMapPage(heatCursor);
+      setHeatRows((rows) => [...rows, ...(page.items || [])]);
+      setHeatCursor(page.next_cursor || null);
+    } catch {
+      alert("Failed to load more risks");
+    }
+  };
+
   const downloadDDReport = () => {
     window.location.href = "http://127.0.0.1:8000/due-diligence/report";
   };
@@ -102,8 +171,6 @@ export default function App() {
     return "bg-green-50 border-green-400";
   };
 
-  const flags = ddSummary.heat_map.filter((r) => r.severity === "High");
-
   return (
     <div className="min-h-screen bg-slate-50 px-6 py-10 space-y-10">
 
@@ -119,7 +186,7 @@ export default function App() {
           <input
             type="file"
             multiple
-            accept="application/pdf"
+            accept="application/pdf,.zip,application/zip"
             onChange={(e) => setFiles(e.target.files)}
             className="text-sm"
           />
@@ -156,6 +223,12 @@ export default function App() {
             {answer}
           </div>
         )}
+
+        {answerError && (
+          <div className="bg-red-50 border border-red-200 text-red-700 rounded-md p-4 text-sm">
+            ⚠ {answerError}{answer && " (the answer above is incomplete)"}
+          </div>
+        )}
       </div>
 
       {/* ================= ACTION BUTTONS ================= */}
@@ -210,7 +283,7 @@ export default function App() {
 
       {/* ================= HEAT MAP ================= */}
       <div className="max-w-5xl mx-auto space-y-3">
-        {ddSummary.heat_map.map((risk, i) => (
+        {heatRows.map((risk, i) => (
           <div
             key={i}
             className={`border-l-4 p-4 rounded-md ${severityColor(
@@ -225,6 +298,14 @@ export default function App() {
             </p>
           </div>
         ))}
+        {heatCursor && (
+          <button
+            onClick={loadMoreHeatMap}
+            className="w-full py-2 rounded-md border border-indigo-300 text-indigo-700 hover:bg-indigo-50"
+          >
+            Load more risks
+          </button>
+        )}
       </div>
 
       {/* ================= FLAGS ================= */}